@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Per-action cost: string-keyed dict lookups vs the compiled id tables.
+
+    python benchmarks/bench_turn_cost.py [--iterations N]
+
+The "dict" column re-implements the pre-compilation hot path (rescan the
+NPC's move list with MOVES.get on every action, then look the move up again
+for damage and status procs); "compiled" is what simulate_battle runs now.
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.battle_engine import (GAME_DATA, MOVES, NPCS, apply_move_status, build_combatant,  # noqa: E402
+                                  choose_move_id, roll_damage, simulate_battle)
+
+
+def dict_action(attacker, defender, rng):
+    moves = NPCS[attacker.key]["moves"]
+    best = moves[0]
+    best_power = -1
+    for m in moves:
+        info = MOVES.get(m, {})
+        power = info.get("power", 0)
+        if info.get("category") in ("Physical", "Special") and power > best_power:
+            best_power = power
+            best = m
+    move = MOVES.get(best, {})
+    if not move or move.get("category") == "Status" or move.get("power", 0) == 0:
+        dmg = 0
+    else:
+        atk_stat = attacker.sp_attack if move.get("category") == "Special" else attacker.attack
+        def_stat = defender.sp_defense if move.get("category") == "Special" else defender.defense
+        base = (((2 * attacker.level) / 5) + 2) * move.get("power", 1) * atk_stat / max(1, def_stat) / 50 + 2
+        dmg = max(1, int(base * rng.uniform(0.85, 1.0)))
+    # same status rules as apply_move_status: only a Healthy defender is rolled against
+    for field, name, turns in (("burn_chance", "Burn", 3), ("poison_chance", "Poison", 5),
+                               ("stun_chance", "Stunned", 1)):
+        if move.get(field) and defender.status.name == "Healthy" and rng.random() < move[field]:
+            defender.status.name = name
+            defender.status.turns = turns
+    # both arms clear the status so every call starts from a Healthy defender
+    defender.status.name = "Healthy"
+    return dmg
+
+
+def compiled_action(attacker, defender, rng, moves=GAME_DATA.moves):
+    move = moves[choose_move_id(attacker)]
+    dmg = roll_damage(attacker, defender, move, rng)
+    apply_move_status(defender, move, rng)
+    # both arms clear the status so every call starts from a Healthy defender
+    defender.status.name = "Healthy"
+    return dmg
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    attacker = build_combatant("embermage")
+    defender = build_combatant("ironknight")
+    rng = random.Random(0)
+    dict_ns = min(timeit.repeat(lambda: dict_action(attacker, defender, rng), number=n, repeat=3)) / n * 1e9
+    comp_ns = min(timeit.repeat(lambda: compiled_action(attacker, defender, rng), number=n, repeat=3)) / n * 1e9
+    print(f"per action   dict: {dict_ns:8.1f} ns   compiled: {comp_ns:8.1f} ns   ({dict_ns / comp_ns:.2f}x)")
+
+    battles = max(1, n // 100)
+    turns = sum(simulate_battle("embermage", "embermage", seed=s, log_level="none")["turns"] for s in range(battles))
+    elapsed = min(timeit.repeat(
+        lambda: [simulate_battle("embermage", "embermage", seed=s, log_level="none") for s in range(battles)],
+        number=1, repeat=3))
+    print(f"simulate_battle(log_level='none'): {elapsed / turns * 1e9:8.1f} ns/turn over {turns} turns")
+
+
+if __name__ == "__main__":
+    main()
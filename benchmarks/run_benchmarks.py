@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""Benchmark suite for the battle engine and the server endpoints.
+
+    python benchmarks/run_benchmarks.py [--quick] [--output results.json] [--compare baseline.json]
+
+Emits one JSON document so runs can be diffed across releases. Layers:
+  engine.*    single battles/sec through simulate_battle
+  per_call.*  ns per calc_damage / choose_move_auto / apply_status_effects call
+  batch.*     simulate_battles_batch throughput
+  http.*      in-process /battle/simulate (uncached and cached) and /ai/query latency (TestClient)
+  mcp.*       in-process MCP call_tool latency (in-memory client session)
+  startup.*   fresh-interpreter import of server.mcp_server and stdio time-to-initialize
+Groq is stubbed, so no network access or API key is needed.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.battle_engine import (apply_status_effects, build_combatant, calc_damage,  # noqa: E402
+                                  choose_move_auto, simulate_battle)
+
+MATCHUP = ("embermage", "ironknight")
+
+
+def _percentiles(samples_s):
+    ordered = sorted(samples_s)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000  # noqa: E731
+    return {"p50_ms": pick(0.50), "p99_ms": pick(0.99), "mean_ms": statistics.fmean(ordered) * 1000}
+
+
+def bench_engine(n):
+    out = {}
+    for log_level in ("full", "none"):
+        start = time.perf_counter()
+        turns = sum(simulate_battle(*MATCHUP, seed=s, log_level=log_level)["turns"] for s in range(n))
+        elapsed = time.perf_counter() - start
+        out[f"battles_per_sec_{log_level}"] = n / elapsed
+        out[f"turns_per_sec_{log_level}"] = turns / elapsed
+    return out
+
+
+def bench_per_call(n):
+    attacker = build_combatant(MATCHUP[0])
+    defender = build_combatant(MATCHUP[1])
+    burned = build_combatant(MATCHUP[1])
+    burned.status.name = "Burn"
+    rng = random.Random(0)
+    move = choose_move_auto(attacker)
+
+    def tick():
+        burned.hp = burned.max_hp
+        apply_status_effects(burned)
+
+    timings = {
+        "calc_damage_ns": lambda: calc_damage(attacker, defender, move, rng),
+        "choose_move_auto_ns": lambda: choose_move_auto(attacker),
+        "apply_status_effects_ns": tick,
+    }
+    return {name: min(timeit.repeat(fn, number=n, repeat=3)) / n * 1e9 for name, fn in timings.items()}
+
+
+def bench_batch(n):
+    try:
+        from server.batch_engine import simulate_battles_batch
+    except ImportError:
+        return {"skipped": "numpy not installed"}
+    start = time.perf_counter()
+    simulate_battles_batch(*MATCHUP, n=n, seed=0)
+    elapsed = time.perf_counter() - start
+    return {"matches": n, "matches_per_sec": n / elapsed}
+
+
+def bench_server(requests):
+    from fastapi.testclient import TestClient
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    from server import http_app, mcp_server
+    from server.analytics import AnalyticsStore
+    from server.cache import LRUCache, TieredCache
+    from server.sim_pool import SimulationPool
+
+    # per-request INFO logs would dominate the timings
+    logging.disable(logging.INFO)
+
+    async def fake_groq(prompt, model=None):
+        return "stubbed narration"
+
+    http_app.aquery_groq = fake_groq
+    mcp_server.sim_pool = SimulationPool(kind="thread", workers=4, max_queue=requests)
+    mcp_server.analytics = AnalyticsStore(":memory:")
+    # a zero-size LRU disables the seeded-result cache, so the plain figures keep measuring simulation
+    mcp_server.result_cache = TieredCache(LRUCache(0))
+    client = TestClient(mcp_server.app)
+    payload = {"npc_a": MATCHUP[0], "npc_b": MATCHUP[1], "seed": 1}
+
+    def timed(fn):
+        samples = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+        return _percentiles(samples)
+
+    out = {
+        "http.battle_simulate": timed(lambda: client.post("/battle/simulate", json=payload).raise_for_status()),
+        "http.ai_query": timed(lambda: client.post("/ai/query", params={"question": "hi"}).raise_for_status()),
+    }
+    mcp_server.result_cache = TieredCache(LRUCache())
+    out["http.battle_simulate_cached"] = timed(lambda: client.post("/battle/simulate", json=payload).raise_for_status())
+    mcp_server.result_cache = TieredCache(LRUCache(0))
+
+    async def mcp_latency():
+        samples = []
+        async with create_connected_server_and_client_session(mcp_server.mcp_server) as session:
+            for _ in range(requests):
+                start = time.perf_counter()
+                await session.call_tool("simulate_battle_tool", payload)
+                samples.append(time.perf_counter() - start)
+        return _percentiles(samples)
+
+    out["mcp.simulate_battle_tool"] = asyncio.run(mcp_latency())
+    mcp_server.sim_pool.shutdown()
+    return out
+
+
+INITIALIZE = json.dumps({"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+    "protocolVersion": "2025-06-18", "capabilities": {}, "clientInfo": {"name": "bench", "version": "0"}}})
+
+
+def bench_startup(runs):
+    """Best of ``runs`` cold starts, each in a new interpreter (what an MCP host pays per session)."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def best(fn):
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+        return min(samples) * 1000
+
+    def run(*args):
+        subprocess.run([sys.executable, *args], cwd=root, check=True, capture_output=True)
+
+    def initialize():
+        proc = subprocess.Popen([sys.executable, "-m", "server.mcp_server", "stdio"], cwd=root, text=True,
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        proc.stdin.write(INITIALIZE + "\n")
+        proc.stdin.flush()
+        reply = json.loads(proc.stdout.readline())
+        proc.stdin.close()
+        proc.wait(timeout=10)
+        assert reply["id"] == 1 and "result" in reply, reply
+
+    return {
+        "python_ms": best(lambda: run("-c", "pass")),
+        "import_ms": best(lambda: run("-c", "import server.mcp_server")),
+        "stdio_initialize_ms": best(initialize),
+    }
+
+
+def _flatten(tree, prefix=""):
+    flat = {}
+    for key, value in tree.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(results, baseline, threshold):
+    """Return the metrics that regressed by more than ``threshold`` against ``baseline``."""
+    new_flat = _flatten(results)
+    regressions = []
+    for metric, old in _flatten(baseline.get("results", {})).items():
+        new = new_flat.get(metric)
+        if new is None or not old or metric.endswith("matches"):
+            continue
+        # throughput should not drop; latency and per-call cost should not grow
+        change = (old - new) / old if "per_sec" in metric else (new - old) / old
+        if change > threshold:
+            regressions.append(f"{metric}: {old:.4g} -> {new:.4g}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quick", action="store_true", help="fewer iterations (smoke run)")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed regression (fraction)")
+    parser.add_argument("--skip-server", action="store_true")
+    parser.add_argument("--startup-budget-ms", type=float, default=0,
+                        help="exit 1 if stdio time-to-initialize exceeds this (0: off)")
+    args = parser.parse_args()
+    scale = 10 if args.quick else 1
+
+    results = {
+        "engine": bench_engine(2000 // scale),
+        "per_call": bench_per_call(100_000 // scale),
+        "batch": bench_batch(100_000 // scale),
+    }
+    if not args.skip_server:
+        results["server"] = bench_server(200 // scale)
+    results["startup"] = bench_startup(3 if args.quick else 10)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    failed = False
+    startup_ms = results["startup"]["stdio_initialize_ms"]
+    if args.startup_budget_ms and startup_ms > args.startup_budget_ms:
+        print(f"BUDGET startup.stdio_initialize_ms: {startup_ms:.0f} > {args.startup_budget_ms:.0f}", file=sys.stderr)
+        failed = True
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print("REGRESSION", line, file=sys.stderr)
+        failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
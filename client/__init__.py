@@ -0,0 +1,3 @@
+# client/__init__.py
+from .arena_client import (ArenaClient, AsyncArenaClient, ConnectionLost, ToolError, http_connector, parse_result,
+                           stdio_connector)
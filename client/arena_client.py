@@ -0,0 +1,293 @@
+# client/arena_client.py
+"""Reusable MCP client for the battle arena.
+
+Opening an MCP connection costs a transport setup plus the ``initialize``
+handshake, which dominates small simulations. ``AsyncArenaClient`` keeps a
+small pool of long-lived sessions instead:
+
+* each call borrows the least busy live session. One session carries many
+  requests at once (MCP matches replies by request id), so ``call_tools``
+  pipelines a batch instead of waiting for every reply in turn; a new session
+  is only opened while all existing ones are busy, up to ``pool_size``;
+* a session whose transport fails is dropped and a fresh one is opened, and
+  the call is retried (``retries`` times) — the arena's tools are safe to
+  repeat, and seeded battles return the same result;
+* sessions are opened lazily and closed by ``aclose()``.
+
+``ArenaClient`` is the same client for synchronous code (Streamlit, scripts):
+it runs an ``AsyncArenaClient`` on a private event-loop thread, so sessions
+outlive the individual calls.
+"""
+import asyncio
+import json
+import sys
+import threading
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import Any, AsyncContextManager, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import anyio
+from mcp import ClientSession, McpError, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+from mcp.types import CONNECTION_CLOSED, CallToolResult
+
+# connector(message_handler) -> async context manager yielding an initialized ClientSession
+Connector = Callable[[Callable], AsyncContextManager[ClientSession]]
+ToolCall = Tuple[str, Dict[str, Any]]
+
+
+class ToolError(RuntimeError):
+    """The server ran the tool and reported an error."""
+
+
+class ConnectionLost(ConnectionError):
+    """The session's transport failed while a call was in flight."""
+
+
+def http_connector(url: str, timeout: float = 30.0) -> Connector:
+    @asynccontextmanager
+    async def connect(message_handler):
+        async with streamablehttp_client(url, timeout=timeout) as (read, write, _):
+            async with ClientSession(read, write, message_handler=message_handler) as session:
+                await session.initialize()
+                yield session
+    return connect
+
+
+def stdio_connector(command: str = sys.executable, args: Sequence[str] = ("-m", "server.mcp_server", "stdio"),
+                    env: Optional[Dict[str, str]] = None, cwd: Optional[str] = None) -> Connector:
+    params = StdioServerParameters(command=command, args=list(args), env=env, cwd=cwd)
+
+    @asynccontextmanager
+    async def connect(message_handler):
+        async with stdio_client(params) as (read, write):
+            async with ClientSession(read, write, message_handler=message_handler) as session:
+                await session.initialize()
+                yield session
+    return connect
+
+
+def _retryable(exc: BaseException) -> bool:
+    if isinstance(exc, McpError):
+        return exc.error.code == CONNECTION_CLOSED
+    return isinstance(exc, (ConnectionError, OSError, anyio.ClosedResourceError, anyio.BrokenResourceError,
+                            anyio.EndOfStream)) or type(exc).__module__.startswith("httpx")
+
+
+def parse_result(result: CallToolResult) -> Any:
+    """Tool results are JSON text; return the decoded value (or the text if it is not JSON)."""
+    text = result.content[0].text if result.content and hasattr(result.content[0], "text") else ""
+    if result.isError:
+        raise ToolError(text or "tool call failed")
+    if result.structuredContent is not None:
+        return result.structuredContent
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+class _Connection:
+    """One long-lived session, owned by a task so its transport is entered and exited in the same task."""
+
+    def __init__(self, connector: Connector):
+        self.connector = connector
+        self.session: Optional[ClientSession] = None
+        self.in_flight = 0
+        self.error: Optional[BaseException] = None
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self.dead = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and not self.dead.is_set()
+
+    async def open(self):
+        self._task = asyncio.create_task(self._own())
+        await self._ready.wait()
+        if self.session is None:
+            raise self.error or ConnectionLost("session closed during initialize")
+
+    async def _on_message(self, message):
+        # transports report failures (e.g. a refused POST) as exceptions on the read stream
+        if isinstance(message, Exception):
+            self.error = message
+            self.dead.set()
+
+    async def _own(self):
+        try:
+            async with self.connector(self._on_message) as session:
+                self.session = session
+                self._ready.set()
+                waiters = {asyncio.ensure_future(self._closing.wait()), asyncio.ensure_future(self.dead.wait())}
+                try:
+                    await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    for waiter in waiters:
+                        waiter.cancel()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.dead.set()
+            self._ready.set()
+
+    async def call(self, name: str, arguments: Dict[str, Any], timeout: Optional[timedelta],
+                   progress_callback=None) -> CallToolResult:
+        call = asyncio.ensure_future(self.session.call_tool(name, arguments, timeout, progress_callback))
+        lost = asyncio.ensure_future(self.dead.wait())
+        try:
+            await asyncio.wait({call, lost}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            lost.cancel()
+        if call.done():
+            return call.result()
+        call.cancel()
+        raise ConnectionLost(f"session lost during {name}: {self.error}")
+
+    async def close(self):
+        self._closing.set()
+        if self._task is not None:
+            # the transport may raise while shutting down; the connection is gone either way
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+class AsyncArenaClient:
+    def __init__(self, connector: Connector, pool_size: int = 2, retries: int = 1, timeout: Optional[float] = 120.0):
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        self.connector = connector
+        self.pool_size = pool_size
+        self.retries = retries
+        self.timeout = timedelta(seconds=timeout) if timeout else None
+        self.opened = 0
+        self.reconnects = 0
+        self.calls = 0
+        self._conns: List[_Connection] = []
+        self._lock: Optional[asyncio.Lock] = None
+        self._closed = False
+
+    @classmethod
+    def http(cls, url: str, **kwargs) -> "AsyncArenaClient":
+        return cls(http_connector(url), **kwargs)
+
+    @classmethod
+    def stdio(cls, **kwargs) -> "AsyncArenaClient":
+        return cls(stdio_connector(), **kwargs)
+
+    async def _acquire(self) -> _Connection:
+        if self._closed:
+            raise RuntimeError("client is closed")
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            dropped = [c for c in self._conns if not c.alive]
+            if dropped:
+                self.reconnects += len(dropped)
+                self._conns = [c for c in self._conns if c.alive]
+                for conn in dropped:
+                    await conn.close()
+            best = min(self._conns, key=lambda c: c.in_flight, default=None)
+            if best is None or (best.in_flight and len(self._conns) < self.pool_size):
+                best = _Connection(self.connector)
+                await best.open()
+                self._conns.append(best)
+                self.opened += 1
+            # counted under the lock so concurrent callers see the session as busy
+            best.in_flight += 1
+            return best
+
+    async def call_tool_raw(self, name: str, arguments: Optional[Dict[str, Any]] = None,
+                            progress_callback=None) -> CallToolResult:
+        self.calls += 1
+        attempt = 0
+        while True:
+            conn = await self._acquire()
+            try:
+                return await conn.call(name, arguments or {}, self.timeout, progress_callback)
+            except Exception as e:
+                if not _retryable(e) or attempt >= self.retries:
+                    raise
+                attempt += 1
+                conn.dead.set()
+            finally:
+                conn.in_flight -= 1
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None, progress_callback=None) -> Any:
+        """Call a tool and return its decoded JSON result; raises ``ToolError`` if the tool failed."""
+        return parse_result(await self.call_tool_raw(name, arguments, progress_callback))
+
+    async def call_tools(self, calls: Iterable[ToolCall], return_exceptions: bool = False) -> List[Any]:
+        """Pipeline a batch of (name, arguments) calls over the pool; results come back in order."""
+        return await asyncio.gather(*(self.call_tool(name, args) for name, args in calls),
+                                    return_exceptions=return_exceptions)
+
+    async def list_tools(self) -> List[str]:
+        conn = await self._acquire()
+        try:
+            return [t.name for t in (await conn.session.list_tools()).tools]
+        finally:
+            conn.in_flight -= 1
+
+    def stats(self) -> Dict:
+        return {"sessions": sum(c.alive for c in self._conns), "opened": self.opened, "reconnects": self.reconnects,
+                "calls": self.calls}
+
+    async def aclose(self):
+        self._closed = True
+        conns, self._conns = self._conns, []
+        for conn in conns:
+            await conn.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+
+class ArenaClient:
+    """Blocking facade over ``AsyncArenaClient``; safe to share between threads."""
+
+    def __init__(self, connector: Connector, **kwargs):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="arena-client", daemon=True)
+        self._thread.start()
+        self.client = AsyncArenaClient(connector, **kwargs)
+
+    @classmethod
+    def http(cls, url: str, **kwargs) -> "ArenaClient":
+        return cls(http_connector(url), **kwargs)
+
+    @classmethod
+    def stdio(cls, **kwargs) -> "ArenaClient":
+        return cls(stdio_connector(), **kwargs)
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> Any:
+        return self._run(self.client.call_tool(name, arguments))
+
+    def call_tools(self, calls: Iterable[ToolCall], return_exceptions: bool = False) -> List[Any]:
+        return self._run(self.client.call_tools(list(calls), return_exceptions))
+
+    def list_tools(self) -> List[str]:
+        return self._run(self.client.list_tools())
+
+    def stats(self) -> Dict:
+        return self.client.stats()
+
+    def close(self):
+        if self._loop.is_running():
+            self._run(self.client.aclose())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
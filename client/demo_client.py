@@ -1,51 +1,53 @@
 #!/usr/bin/env python3
 import asyncio
 import os
-import json
-from mcp.client.stdio import stdio_client
-from mcp import ClientSession
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from client import AsyncArenaClient, ToolError
 
 async def run_demo():
-    # Use stdio client instead of HTTP for proper MCP communication
-    async with stdio_client("python", "-m", "server.mcp_server", "stdio") as (read, write):
-        async with ClientSession(read, write) as session:
-            # Initialize the session
-            await session.initialize()
-            
-            # List available tools
-            tools = await session.list_tools()
-            print("Available tools:", [t.name for t in tools.tools])
-            
-            # Simulate a battle
-            battle_result = await session.call_tool(
-                "simulate_battle_tool", 
-                arguments={
-                    "npc_a": "embermage", 
-                    "npc_b": "windblade", 
-                    "level": 50, 
-                    "seed": 123
+    # One stdio server process and one session for the whole demo
+    async with AsyncArenaClient.stdio(pool_size=1) as client:
+        # List available tools
+        print("Available tools:", await client.list_tools())
+
+        # Simulate a battle
+        battle_data = await client.call_tool(
+            "simulate_battle_tool",
+            {
+                "npc_a": "embermage",
+                "npc_b": "windblade",
+                "level": 50,
+                "seed": 123
+            }
+        )
+        print("Winner:", battle_data["winner"])
+        print("Battle log (first 10 lines):")
+        for line in battle_data["log"][:10]:
+            print("  ", line)
+
+        # A batch of battles, pipelined over the same session
+        batch = await client.call_tools(
+            ("simulate_battle_tool", {"npc_a": "embermage", "npc_b": "windblade", "seed": seed, "log_level": "none"})
+            for seed in range(10)
+        )
+        print("Winners for seeds 0-9:", [r["winner"] for r in batch])
+
+        # Optional narration
+        try:
+            narration_data = await client.call_tool(
+                "narrate_battle_with_groq",
+                {
+                    "battle_log": battle_data["log"],
+                    "style": "sportscaster"
                 }
             )
-            
-            battle_data = json.loads(battle_result.content[0].text)
-            print("Winner:", battle_data["winner"])
-            print("Battle log (first 10 lines):")
-            for line in battle_data["log"][:10]:
-                print("  ", line)
-            
-            # Optional narration
-            try:
-                narration_result = await session.call_tool(
-                    "narrate_battle_with_groq", 
-                    arguments={
-                        "battle_log": battle_data["log"],
-                        "style": "sportscaster"
-                    }
-                )
-                narration_data = json.loads(narration_result.content[0].text)
-                print("\nNarration:\n", narration_data.get("narration", "")[:500])
-            except Exception as e:
-                print("Groq narration failed (check GROQ_API_KEY):", e)
+            print("\nNarration:\n", narration_data.get("narration", "")[:500])
+        except ToolError as e:
+            print("Groq narration failed (check GROQ_API_KEY):", e)
+
+        print("Sessions opened:", client.stats()["opened"])
 
 if __name__ == "__main__":
-    asyncio.run(run_demo())
\ No newline at end of file
+    asyncio.run(run_demo())
@@ -1,10 +1,18 @@
-import streamlit as st, os, asyncio
-from mcp.client.streamable_http import streamablehttp_client
-from mcp import ClientSession
+import streamlit as st, os, sys
+from collections import Counter
+
+# `streamlit run dashboard/app.py` only puts dashboard/ on the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from client import ArenaClient
 
 st.set_page_config(page_title="AI NPC Battle Arena", layout="wide")
 st.title("AI NPC Battle Arena")
 
+@st.cache_resource
+def get_client(url: str) -> ArenaClient:
+    # one pooled, long-lived MCP session set per URL, shared by every rerun and browser tab
+    return ArenaClient.http(url)
+
 MCP_URL = st.text_input("MCP URL", value=os.getenv("MCP_URL","http://127.0.0.1:8000/mcp"))
 npc_options = ["EmberMage","IronKnight","WindBlade","MistCaller"]
 col1, col2 = st.columns(2)
@@ -14,34 +22,39 @@ with col1:
 with col2:
     npc_b = st.selectbox("NPC B", npc_options, index=1)
     seed = st.number_input("Seed (for deterministic runs)", value=42, step=1)
+    runs = st.number_input("Battles (consecutive seeds)", value=1, min_value=1, max_value=500, step=1)
 
 if st.button("Simulate Battle"):
     st.info("Running simulation... make sure the MCP server is running (python server/mcp_server.py http)")
-    async def call_simulate():
-        async with streamablehttp_client(MCP_URL) as (r,w,_):
-            async with ClientSession(r,w) as sess:
-                await sess.initialize()
-                res = await sess.call_tool("simulate_battle_tool", arguments={"npc_a":npc_a,"npc_b":npc_b,"level":level,"seed":int(seed)})
-                return res.structuredContent
+    args = {"npc_a": npc_a, "npc_b": npc_b, "level": level}
     try:
-        result = asyncio.run(call_simulate())
-        st.subheader("Winner: " + result["winner"])
-        st.text_area("Battle Log", value="\\n".join(result["log"]), height=400)
-        if st.button("Generate Narration (Groq)"):
-            async def call_narrate():
-                async with streamablehttp_client(MCP_URL) as (r,w,_):
-                    async with ClientSession(r,w) as sess:
-                        await sess.initialize()
-                        narr = await sess.call_tool("narrate_battle_with_groq", arguments={"battle_log": result["log"], "style":"sportscaster"})
-                        return narr.structuredContent.get("narration","")
-            try:
-                narration = asyncio.run(call_narrate())
-                st.markdown("**Narration:**")
-                st.write(narration)
-            except Exception as e:
-                st.error("Narration failed. Ensure GROQ_API_KEY is set and groq installed. " + str(e))
+        client = get_client(MCP_URL)
+        if runs == 1:
+            st.session_state["result"] = client.call_tool("simulate_battle_tool", {**args, "seed": int(seed)})
+        else:
+            # one pipelined batch over the pooled sessions instead of a round trip per battle
+            results = client.call_tools([("simulate_battle_tool", {**args, "seed": int(seed) + i, "log_level": "none"})
+                                         for i in range(int(runs))])
+            st.session_state["result"] = None
+            st.subheader(f"Wins over {int(runs)} battles")
+            st.write(dict(Counter(r["winner"] for r in results)))
     except Exception as e:
+        st.session_state["result"] = None
         st.error("Simulation failed: " + str(e))
 
+result = st.session_state.get("result")
+if result:
+    st.subheader("Winner: " + result["winner"])
+    st.text_area("Battle Log", value="\n".join(result["log"]), height=400)
+    if st.button("Generate Narration (Groq)"):
+        try:
+            narr = get_client(MCP_URL).call_tool("narrate_battle_with_groq", {
+                "battle_log": result["log"], "actions": result["actions"], "winner": result["winner"],
+                "turns": result["turns"], "style": "sportscaster"})
+            st.markdown("**Narration:**")
+            st.write(narr.get("narration", ""))
+        except Exception as e:
+            st.error("Narration failed. Ensure GROQ_API_KEY is set and groq installed. " + str(e))
+
 st.markdown("---")
 st.markdown("**Quick start**: Run `python server/mcp_server.py http` in one terminal; open this Streamlit app (`streamlit run dashboard/app.py`) in another.")
@@ -0,0 +1,467 @@
+# server/analytics.py
+"""Battle analytics: outcomes and actions in SQLite, answered with SQL.
+
+Every battle the server simulates (``/battle/simulate``, ``simulate_battle_tool``)
+is recorded, and ``POST /analytics/ingest`` fills the store with a seeded sweep.
+Rows are NPC keys, not display names, so queries filter on ``embermage``.
+
+    battles(id, source, npc_a, npc_b, level, seed, a_won, turns, data_version, created_at)
+    actions(battle_id, turn, actor, target, move, damage, status_applied, stunned)
+
+Those raw rows keep every detail; the questions are answered from two rollup
+tables that every flush updates in the same transaction:
+
+    matchup_stats(npc_a, npc_b, level, data_version, battles, decided, wins_a, turns)
+    move_stats(actor, opponent, move, level, data_version, uses, damage, max_damage, burn, poison, stun)
+
+They hold one row per matchup or per (NPC, opponent, move) instead of one per
+battle or action, so the fixed ``QUERIES`` (``win_rate``, ``move_damage``,
+``status_procs``, ``summary``) stay in the low milliseconds however many
+battles are stored; their keys are indexed on npc, move and level. The answer
+comes from SQL and Groq is only asked to phrase it (``/ai/query``).
+
+Writes are buffered and handed to a background writer thread every
+``flush_every`` battles (queries and ``close`` flush first), so recording
+costs the request path a list append. A seeded battle is reproducible, so it
+carries a ``replay_key`` (its arguments and data version) and is stored once
+however often it is replayed; otherwise cache misses of popular seeds would
+inflate their matchups' counts. Raw ``battles`` / ``actions`` rows older than
+``retention_days`` are deleted, while the rollups keep their counts.
+``ARENA_ANALYTICS_RECORD=0`` (``--no-analytics``) stops recording simulate
+traffic; ``/analytics/ingest`` still works.
+"""
+import os
+import random
+import re
+import sqlite3
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .battle_cache import battle_key
+from .battle_engine import build_combatant, run_battle
+from .battle_log import EV_MOVE, EV_STUNNED
+from .datastore import current_data
+
+logger = logging.getLogger(__name__)
+
+# query kind -> filters it accepts; for move queries ``npc`` is the NPC using the move
+QUERY_FILTERS = {
+    "win_rate": ("npc", "npc_a", "npc_b", "level", "data_version"),
+    "move_damage": ("npc", "opponent", "move", "level", "data_version"),
+    "status_procs": ("npc", "opponent", "move", "level", "data_version"),
+    "summary": ("npc", "npc_a", "npc_b", "level", "data_version"),
+}
+QUERIES = tuple(QUERY_FILTERS)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS battles (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    npc_a TEXT NOT NULL,
+    npc_b TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    seed INTEGER,
+    a_won INTEGER,
+    turns INTEGER NOT NULL,
+    data_version TEXT,
+    created_at REAL NOT NULL,
+    replay_key TEXT
+);
+CREATE TABLE IF NOT EXISTS actions (
+    battle_id INTEGER NOT NULL REFERENCES battles(id),
+    turn INTEGER NOT NULL,
+    actor TEXT NOT NULL,
+    target TEXT,
+    move TEXT,
+    damage INTEGER NOT NULL,
+    status_applied TEXT,
+    stunned INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS matchup_stats (
+    npc_a TEXT NOT NULL,
+    npc_b TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    data_version TEXT NOT NULL,
+    battles INTEGER NOT NULL,
+    decided INTEGER NOT NULL,
+    wins_a INTEGER NOT NULL,
+    turns INTEGER NOT NULL,
+    PRIMARY KEY (npc_a, npc_b, level, data_version)
+);
+CREATE TABLE IF NOT EXISTS move_stats (
+    actor TEXT NOT NULL,
+    opponent TEXT NOT NULL,
+    move TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    data_version TEXT NOT NULL,
+    uses INTEGER NOT NULL,
+    damage INTEGER NOT NULL,
+    max_damage INTEGER NOT NULL,
+    burn INTEGER NOT NULL,
+    poison INTEGER NOT NULL,
+    stun INTEGER NOT NULL,
+    PRIMARY KEY (actor, opponent, move, level, data_version)
+);
+CREATE INDEX IF NOT EXISTS battles_matchup ON battles (npc_a, npc_b, level);
+CREATE INDEX IF NOT EXISTS battles_created ON battles (created_at);
+CREATE INDEX IF NOT EXISTS actions_battle ON actions (battle_id);
+CREATE INDEX IF NOT EXISTS actions_actor_move ON actions (actor, move);
+CREATE INDEX IF NOT EXISTS matchup_stats_npc_b ON matchup_stats (npc_b, level);
+CREATE INDEX IF NOT EXISTS matchup_stats_level ON matchup_stats (level);
+CREATE INDEX IF NOT EXISTS move_stats_move ON move_stats (move, level);
+CREATE INDEX IF NOT EXISTS move_stats_level ON move_stats (level);
+"""
+
+_UPSERT_MATCHUP = """
+INSERT INTO matchup_stats (npc_a, npc_b, level, data_version, battles, decided, wins_a, turns)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (npc_a, npc_b, level, data_version) DO UPDATE SET
+    battles = battles + excluded.battles, decided = decided + excluded.decided,
+    wins_a = wins_a + excluded.wins_a, turns = turns + excluded.turns
+"""
+
+_UPSERT_MOVE = """
+INSERT INTO move_stats (actor, opponent, move, level, data_version, uses, damage, max_damage, burn, poison, stun)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (actor, opponent, move, level, data_version) DO UPDATE SET
+    uses = uses + excluded.uses, damage = damage + excluded.damage,
+    max_damage = MAX(max_damage, excluded.max_damage), burn = burn + excluded.burn,
+    poison = poison + excluded.poison, stun = stun + excluded.stun
+"""
+
+# status -> slot in a move_stats accumulator [uses, damage, max_damage, burn, poison, stun]
+_PROC_SLOTS = {"Burn": 3, "Poison": 4, "Stunned": 5}
+
+# (battle row without id, [action rows without battle_id])
+Record = Tuple[tuple, List[tuple]]
+
+_BATTLE_COLUMNS = "source, npc_a, npc_b, level, seed, a_won, turns, data_version, created_at, replay_key"
+
+
+def replay_key(npc_a: str, npc_b: str, level: int, seed: Optional[int], max_turns: int, data_version: str,
+               **policy) -> Optional[str]:
+    """Identity of a reproducible battle (None when it is not), shared by simulate traffic and ingest."""
+    # the outcome does not depend on how much log was asked for
+    return battle_key("analytics", npc_a, npc_b, level, seed, max_turns, "-", data_version, **policy)
+
+
+def to_record(result: Dict, npc_a: str, npc_b: str, level: int, seed: Optional[int], source: str,
+              key: Optional[str] = None) -> Record:
+    """Turn a simulate_battle result into rows; actions are only present if the result has them.
+
+    Results name the winner, not its side, so a mirror match (same display name on
+    both sides) is stored with ``a_won`` NULL and left out of win rates. ``key``
+    (see ``replay_key``) marks a reproducible battle so it is stored only once.
+    """
+    data = current_data()
+    a_key, b_key = npc_a.lower(), npc_b.lower()
+    a_name, b_name = data.npc(a_key).name, data.npc(b_key).name
+    keys = {a_name: a_key, b_name: b_key}
+    a_won = None if a_name == b_name else int(result["winner"] == a_name)
+    battle = (source, a_key, b_key, level, seed, a_won, result["turns"], result.get("data_version"), time.time(),
+              key)
+    actions = []
+    for act in result.get("actions") or []:
+        stunned = act["action"] == "stunned"
+        actions.append((act["turn"], keys.get(act["actor"], act["actor"]), keys.get(act["target"], act["target"]),
+                        None if stunned else act["action"], act.get("damage") or 0,
+                        None if stunned else act.get("status_applied"), int(stunned)))
+    return battle, actions
+
+
+def simulate_records(npc_a: str, npc_b: str, level: int, seeds: Sequence[int], max_turns: int = 200,
+                     source: str = "ingest") -> List[Record]:
+    """Pool task: simulate seeded battles and return their analytics rows."""
+    data = current_data()
+    out = []
+    for seed in seeds:
+        a = build_combatant(npc_a, level, data)
+        b = build_combatant(npc_b, level, data)
+        events: List = []
+        turns = run_battle(a, b, random.Random(seed), max_turns, events)
+        keys = (a.key, b.key)
+        actions = []
+        for ev in events:
+            if ev[0] == EV_MOVE:
+                _, turn, _, move, _, dmg, _, _, status_applied, _, side = ev
+                actions.append((turn, keys[side], keys[1 - side], move, dmg, status_applied, 0))
+            elif ev[0] == EV_STUNNED:
+                actions.append((ev[1], keys[ev[3]], None, None, 0, None, 1))
+        key = replay_key(a.key, b.key, level, seed, max_turns, data.version)
+        out.append(((source, a.key, b.key, level, seed, int(a.hp > 0), turns, data.version, time.time(), key),
+                    actions))
+    return out
+
+
+def simulate_cells_records(specs: Sequence[Dict]) -> List[Record]:
+    """Pool task for ingest: matrix-style cells (npc_a, npc_b, level, seed, samples, max_turns)."""
+    out: List[Record] = []
+    for spec in specs:
+        seeds = range(spec["seed"], spec["seed"] + spec["samples"])
+        out.extend(simulate_records(spec["npc_a"], spec["npc_b"], spec["level"], seeds, spec["max_turns"]))
+    return out
+
+
+class AnalyticsStore:
+    """Buffered SQLite writer plus the rollup queries.
+
+    ``recording`` False makes ``record`` a no-op (explicit ``add`` still
+    stores); ``retention_days`` 0 keeps raw rows forever.
+    """
+
+    def __init__(self, path: str, flush_every: int = 200, recording: bool = True, retention_days: float = 30):
+        self.path = path
+        self.flush_every = flush_every
+        self.recording = recording
+        self.retention_days = retention_days
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending: List[Record] = []
+        # _lock guards the buffer and is only held for appends; _db_lock serializes SQLite work
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._pruned_at = 0.0
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # opened lazily so importing the server never creates the database file
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(battles)")}
+            if columns and "replay_key" not in columns:
+                # databases written before replay keys existed
+                self._conn.execute("ALTER TABLE battles ADD COLUMN replay_key TEXT")
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS battles_replay ON battles (replay_key) "
+                               "WHERE replay_key IS NOT NULL")
+        return self._conn
+
+    def record(self, result: Dict, npc_a: str, npc_b: str, level: int, seed: Optional[int] = None,
+               source: str = "simulate", key: Optional[str] = None):
+        if self.recording:
+            self.add([to_record(result, npc_a, npc_b, level, seed, source, key)])
+
+    def add(self, records: Iterable[Record]):
+        with self._lock:
+            self._pending.extend(records)
+            full = len(self._pending) >= self.flush_every
+        if full:
+            # the write happens on the writer thread, never on the caller's (the event loop's)
+            if self._writer is None:
+                self._stop = threading.Event()
+                self._writer = threading.Thread(target=self._write_loop, args=(self._stop,), name="analytics-writer",
+                                                daemon=True)
+                self._writer.start()
+            self._wake.set()
+
+    def _write_loop(self, stop: threading.Event):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if stop.is_set():
+                return
+            try:
+                self.flush()
+            except Exception:
+                # the batch went back into the buffer; the next flush retries it
+                logger.exception("Could not write analytics batch")
+
+    def flush(self):
+        with self._db_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
+            try:
+                self._write(pending)
+            except BaseException:
+                with self._lock:
+                    # keep the batch (ahead of anything added meanwhile) instead of dropping it
+                    self._pending[:0] = pending
+                raise
+            self._prune()
+
+    def _write(self, pending: List[Record]):
+        matchups: Dict[tuple, List[int]] = {}
+        moves: Dict[tuple, List[int]] = {}
+        conn = self.conn
+        conn.execute("BEGIN")
+        try:
+            for battle, actions in pending:
+                cur = conn.execute(f"INSERT OR IGNORE INTO battles ({_BATTLE_COLUMNS}) "
+                                   "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", battle)
+                if not cur.rowcount:
+                    # a replay of a seeded battle that is already stored
+                    continue
+                battle_id = cur.lastrowid
+                conn.executemany(
+                    "INSERT INTO actions (battle_id, turn, actor, target, move, damage, status_applied, stunned) "
+                    f"VALUES ({battle_id}, ?, ?, ?, ?, ?, ?, ?)", actions)
+                _, npc_a, npc_b, level, _, a_won, turns, version, _, _ = battle
+                version = version or ""
+                m = matchups.setdefault((npc_a, npc_b, level, version), [0, 0, 0, 0])
+                m[0] += 1
+                m[1] += a_won is not None
+                m[2] += a_won or 0
+                m[3] += turns
+                for _, actor, target, move, damage, status_applied, stunned in actions:
+                    if stunned:
+                        continue
+                    acc = moves.setdefault((actor, target, move, level, version), [0, 0, 0, 0, 0, 0])
+                    acc[0] += 1
+                    acc[1] += damage
+                    acc[2] = max(acc[2], damage)
+                    if status_applied in _PROC_SLOTS:
+                        acc[_PROC_SLOTS[status_applied]] += 1
+            conn.executemany(_UPSERT_MATCHUP, [(*k, *v) for k, v in matchups.items()])
+            conn.executemany(_UPSERT_MOVE, [(*k, *v) for k, v in moves.items()])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _prune(self, every: float = 3600):
+        """Delete raw rows past ``retention_days`` (at most once per ``every`` seconds); rollups are kept."""
+        now = time.time()
+        if not self.retention_days or now - self._pruned_at < every:
+            return
+        self._pruned_at = now
+        cutoff = now - self.retention_days * 86400
+        conn = self.conn
+        conn.execute("BEGIN")
+        try:
+            conn.execute("DELETE FROM actions WHERE battle_id IN (SELECT id FROM battles WHERE created_at < ?)",
+                         (cutoff,))
+            conn.execute("DELETE FROM battles WHERE created_at < ?", (cutoff,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def query(self, kind: str, limit: int = 50, **filters) -> Dict:
+        """Run one of ``QUERIES``; ``filters`` come from ``QUERY_FILTERS[kind]`` (None means unfiltered)."""
+        if kind not in QUERY_FILTERS:
+            raise ValueError(f"Unknown query {kind!r}; expected one of {QUERIES}")
+        filters = {k: v for k, v in filters.items() if v is not None}
+        unknown = set(filters) - set(QUERY_FILTERS[kind])
+        if unknown:
+            raise ValueError(f"{kind} does not filter on {sorted(unknown)}; use any of {QUERY_FILTERS[kind]}")
+        filters = {k: (v.lower() if k in ("npc", "npc_a", "npc_b", "opponent") else v) for k, v in filters.items()}
+        start = time.perf_counter()
+        self.flush()
+        sql, params = _SQL[kind](filters)
+        with self._db_lock:
+            cur = self.conn.execute(sql + " LIMIT ?", (*params, limit))
+            columns = [c[0] for c in cur.description]
+            rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+        return {"query": kind, "filters": filters, "rows": rows,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+    def close(self):
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            self._stop.set()
+            self._wake.set()
+            writer.join()
+        self.flush()
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def _where(f: Dict, columns: Dict[str, str]) -> Tuple[str, List]:
+    clauses, params = [], []
+    for name, value in f.items():
+        if name == "npc" and "npc" not in columns:
+            clauses.append("(npc_a = ? OR npc_b = ?)")
+            params += [value, value]
+        else:
+            clauses.append(f"{columns.get(name, name)} = ?")
+            params.append(value)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _win_rate_sql(f: Dict):
+    where, params = _where(f, {})
+    return ("SELECT npc_a, npc_b, level, SUM(battles) AS battles, SUM(wins_a) AS wins_a, "
+            "ROUND(CAST(SUM(wins_a) AS REAL) / NULLIF(SUM(decided), 0), 4) AS win_rate_a, "
+            "ROUND(CAST(SUM(turns) AS REAL) / SUM(battles), 2) AS mean_turns "
+            f"FROM matchup_stats{where} GROUP BY npc_a, npc_b, level ORDER BY battles DESC, npc_a, npc_b, level",
+            params)
+
+
+def _move_damage_sql(f: Dict):
+    where, params = _where(f, {"npc": "actor"})
+    return ("SELECT actor AS npc, move, SUM(uses) AS uses, ROUND(CAST(SUM(damage) AS REAL) / SUM(uses), 2) "
+            f"AS avg_damage, MAX(max_damage) AS max_damage FROM move_stats{where} GROUP BY actor, move "
+            "ORDER BY avg_damage DESC, actor, move", params)
+
+
+def _status_procs_sql(f: Dict):
+    where, params = _where(f, {"npc": "actor"})
+    return ("SELECT actor AS npc, move, SUM(uses) AS uses, SUM(burn + poison + stun) AS procs, SUM(burn) AS burn, "
+            "SUM(poison) AS poison, SUM(stun) AS stun, "
+            "ROUND(CAST(SUM(burn + poison + stun) AS REAL) / SUM(uses), 4) AS proc_rate "
+            f"FROM move_stats{where} GROUP BY actor, move HAVING procs > 0 ORDER BY proc_rate DESC, actor, move",
+            params)
+
+
+def _summary_sql(f: Dict):
+    where, params = _where(f, {})
+    return ("SELECT COALESCE(SUM(battles), 0) AS battles, COALESCE(SUM(turns), 0) AS turns, "
+            "COUNT(DISTINCT npc_a || '/' || npc_b) AS matchups, COUNT(DISTINCT data_version) AS data_versions "
+            f"FROM matchup_stats{where}", params)
+
+
+_SQL = {"win_rate": _win_rate_sql, "move_damage": _move_damage_sql, "status_procs": _status_procs_sql,
+        "summary": _summary_sql}
+
+_KIND_WORDS = (
+    ("status_procs", ("status", "proc", "burn", "poison", "stun", "inflict")),
+    ("move_damage", ("damage", "move", "hit", "strongest", "hardest")),
+    ("win_rate", ("win", "beat", "lose", "matchup", "versus", " vs")),
+)
+
+
+def parse_question(question: str) -> Dict:
+    """Best-effort mapping of a free-text question to a query kind plus NPC / move / level filters."""
+    text = question.lower()
+    kind = next((k for k, words in _KIND_WORDS if any(w in text for w in words)), "summary")
+    data = current_data()
+    npcs = [npc.key for npc in data.npcs if re.search(rf"\b{re.escape(npc.key)}\b", text)]
+    moves = [m.name for m in data.moves if re.search(rf"\b{re.escape(m.name.lower())}\b", text)]
+    filters: Dict = {}
+    # keep the order the question names them in
+    npcs.sort(key=text.index)
+    if len(npcs) >= 2 and kind == "win_rate":
+        filters.update(npc_a=npcs[0], npc_b=npcs[1])
+    elif len(npcs) >= 2 and kind != "summary":
+        filters.update(npc=npcs[0], opponent=npcs[1])
+    elif npcs:
+        filters["npc"] = npcs[0]
+    if moves and kind != "win_rate":
+        filters["move"] = moves[0]
+    level = re.search(r"\blevel\s+(\d+)", text)
+    if level:
+        filters["level"] = int(level.group(1))
+    # a name the chosen query cannot filter on (a move in a summary) is dropped rather than rejected
+    return {"kind": kind, **{k: v for k, v in filters.items() if k in QUERY_FILTERS[kind]}}
+
+
+def answer_prompt(question: str, result: Dict) -> str:
+    return ("Answer the question using only these query results from the battle database. Do not invent "
+            "numbers; if the rows are empty, say there is no data yet.\n\n"
+            f"Question: {question}\nQuery: {result['query']} {result['filters']}\nRows: {result['rows']}")
+
+
+def analytics_from_env() -> AnalyticsStore:
+    # main() exports --analytics-db / --no-analytics here so uvicorn's re-import of the app sees them
+    return AnalyticsStore(os.getenv("ARENA_ANALYTICS_DB", "arena_analytics.sqlite3"),
+                          recording=os.getenv("ARENA_ANALYTICS_RECORD", "1") != "0",
+                          retention_days=float(os.getenv("ARENA_ANALYTICS_RETENTION_DAYS", "30")))
@@ -0,0 +1,254 @@
+# server/backend.py
+"""Result store shared by every server process: a Redis client or a SQLite stand-in.
+
+With ``--workers N`` each uvicorn worker has its own memory caches, so
+results that should be computed once (seeded battles, matrix cells, sweep
+shards) go through a store all of them reach. The store speaks the small
+subset of the redis-py client API the server uses (``get``, ``set`` with
+``ex`` / ``nx``, ``incr``, ``delete``, ``expire``, ``hset``, ``hget``,
+``hgetall``), so ``ARENA_RESULT_BACKEND=redis://host:6379/0`` hands it a
+real ``redis.Redis`` (``pip install redis``) to share results across hosts,
+and ``sqlite:PATH`` (or a bare path) uses ``SQLiteBackend`` below, which
+needs nothing beyond the standard library and is safe to share between
+processes on one machine. Values come back as bytes, as from Redis. Cache
+entries and sweep shards are written with a TTL, so either store stays
+bounded.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL
+);
+CREATE TABLE IF NOT EXISTS hashes (
+    name TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value BLOB NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (name, field)
+);
+CREATE INDEX IF NOT EXISTS kv_expires ON kv (expires_at) WHERE expires_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS hashes_expires ON hashes (expires_at) WHERE expires_at IS NOT NULL;
+"""
+
+# expired rows are deleted after every this many writes
+PURGE_EVERY = 1000
+
+
+def _encode(value: Any) -> bytes:
+    # what redis-py sends for each Python type
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return repr(value).encode("ascii")
+    raise TypeError(f"cannot store {type(value).__name__}; encode it to bytes, str or a number first")
+
+
+def _field(key: Any) -> str:
+    return key.decode("utf-8") if isinstance(key, bytes) else str(key)
+
+
+class SQLiteBackend:
+    """Redis-compatible subset on one SQLite file (WAL), for one host's worker processes.
+
+    Each process opens its own connection; writes that read first (``incr``,
+    ``set(nx=True)``) run in ``BEGIN IMMEDIATE`` transactions so they are
+    atomic across processes. Expired keys read as missing; every
+    ``purge_every`` writes (and on ``purge()``) they are deleted, so a store
+    whose entries carry a TTL stays bounded.
+    """
+
+    def __init__(self, path: str, purge_every: int = PURGE_EVERY):
+        self.path = path
+        self.purge_every = purge_every
+        self._writes = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # opened lazily, and again in a forked child: a connection must not cross fork()
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._pid = os.getpid()
+        return self._conn
+
+    def _live(self, conn: sqlite3.Connection, name: str) -> Optional[bytes]:
+        row = conn.execute("SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                           (name, time.time())).fetchone()
+        return None if row is None else bytes(row[0])
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            return self._live(self.conn, name)
+
+    def _wrote(self):
+        # called after each committed write, with the lock held
+        self._writes += 1
+        if self.purge_every and self._writes % self.purge_every == 0:
+            self._purge_locked()
+
+    def _purge_locked(self) -> int:
+        now = time.time()
+        removed = self.conn.execute("DELETE FROM kv WHERE expires_at <= ?", (now,)).rowcount
+        return removed + self.conn.execute("DELETE FROM hashes WHERE expires_at <= ?", (now,)).rowcount
+
+    def purge(self) -> int:
+        """Delete expired keys and hash fields; returns how many rows went."""
+        with self._lock:
+            return self._purge_locked()
+
+    def set(self, name: str, value: Any, ex: Optional[float] = None, nx: bool = False) -> Optional[bool]:
+        """Store ``value`` (expiring after ``ex`` seconds); with ``nx`` only if ``name`` is unset. None when refused."""
+        expires_at = time.time() + ex if ex else None
+        with self._lock:
+            conn = self.conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if nx and self._live(conn, name) is not None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                             (name, _encode(value), expires_at))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._wrote()
+        return True
+
+    def incr(self, name: str, amount: int = 1) -> int:
+        with self._lock:
+            conn = self.conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                current = self._live(conn, name)
+                value = (int(current) if current is not None else 0) + amount
+                # like Redis, INCR keeps an existing key's expiry
+                conn.execute("INSERT INTO kv (key, value, expires_at) VALUES (?, ?, NULL) ON CONFLICT(key) DO "
+                             "UPDATE SET value = excluded.value, expires_at = CASE WHEN ? THEN kv.expires_at END",
+                             (name, _encode(value), current is not None))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._wrote()
+        return value
+
+    def delete(self, *names: str) -> int:
+        removed = 0
+        with self._lock:
+            conn = self.conn
+            for name in names:
+                live = self._live(conn, name) is not None
+                conn.execute("DELETE FROM kv WHERE key = ?", (name,))
+                hashed = conn.execute("DELETE FROM hashes WHERE name = ? AND (expires_at IS NULL OR expires_at > ?)",
+                                      (name, time.time())).rowcount
+                conn.execute("DELETE FROM hashes WHERE name = ?", (name,))
+                removed += live or hashed > 0
+        return removed
+
+    def expire(self, name: str, time_s: float) -> bool:
+        """Expire key or hash ``name`` ``time_s`` seconds from now; False when it does not exist."""
+        now = time.time()
+        with self._lock:
+            conn = self.conn
+            changed = conn.execute("UPDATE kv SET expires_at = ? WHERE key = ? AND (expires_at IS NULL OR "
+                                   "expires_at > ?)", (now + time_s, name, now)).rowcount
+            changed += conn.execute("UPDATE hashes SET expires_at = ? WHERE name = ? AND (expires_at IS NULL OR "
+                                    "expires_at > ?)", (now + time_s, name, now)).rowcount
+        return changed > 0
+
+    def hset(self, name: str, key: Any = None, value: Any = None, mapping: Optional[Dict] = None) -> int:
+        """Set fields of hash ``name``; returns how many fields are new."""
+        items = dict(mapping or {})
+        if key is not None:
+            items[key] = value
+        added = 0
+        now = time.time()
+        with self._lock:
+            conn = self.conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for field, val in items.items():
+                    field = _field(field)
+                    exists = conn.execute("SELECT 1 FROM hashes WHERE name = ? AND field = ? AND "
+                                          "(expires_at IS NULL OR expires_at > ?)", (name, field, now)).fetchone()
+                    # like Redis, the hash keeps its expiry when fields are set
+                    conn.execute("INSERT INTO hashes (name, field, value, expires_at) VALUES (?, ?, ?, (SELECT "
+                                 "MAX(expires_at) FROM hashes WHERE name = ? AND expires_at > ?)) "
+                                 "ON CONFLICT(name, field) DO UPDATE SET value = excluded.value, "
+                                 "expires_at = excluded.expires_at", (name, field, _encode(val), name, now))
+                    added += exists is None
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._wrote()
+        return added
+
+    def hget(self, name: str, key: Any) -> Optional[bytes]:
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM hashes WHERE name = ? AND field = ? AND "
+                                    "(expires_at IS NULL OR expires_at > ?)",
+                                    (name, _field(key), time.time())).fetchone()
+        return None if row is None else bytes(row[0])
+
+    def hgetall(self, name: str) -> Dict[bytes, bytes]:
+        with self._lock:
+            rows = self.conn.execute("SELECT field, value FROM hashes WHERE name = ? AND "
+                                     "(expires_at IS NULL OR expires_at > ?)", (name, time.time())).fetchall()
+        return {field.encode("utf-8"): bytes(value) for field, value in rows}
+
+    def close(self):
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+
+class BackendCache:
+    """Cache tier over a result backend, for ``TieredCache``'s second tier; entries expire after ``ttl`` seconds."""
+
+    def __init__(self, backend, prefix: str = "cache:", ttl: Optional[float] = 86400):
+        self.backend = backend
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.backend.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes):
+        self.backend.set(self.prefix + key, value, ex=self.ttl)
+
+
+def open_backend(url: str):
+    """``redis://`` / ``rediss://`` / ``unix://`` URLs open a Redis client; ``sqlite:PATH`` or a path, SQLite."""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError(f"ARENA_RESULT_BACKEND={url} needs the redis package (pip install redis)") from None
+        return redis.Redis.from_url(url)
+    if url.startswith("sqlite:"):
+        url = url[len("sqlite:"):]
+        # sqlite:///abs/path and sqlite:rel/path both work
+        if url.startswith("//"):
+            url = url[2:]
+    return SQLiteBackend(url)
+
+
+def backend_from_env():
+    # main() exports --result-backend here so every uvicorn worker opens the same store
+    url = os.getenv("ARENA_RESULT_BACKEND", "")
+    return open_backend(url) if url else None
@@ -0,0 +1,41 @@
+# server/battle_cache.py
+"""Memoized seeded battles.
+
+A seeded ``simulate_battle`` is a pure function of its arguments, the engine
+and the game data, so its serialized response can be cached under a key made
+of exactly those. Unseeded battles and search policies with a time budget are
+not reproducible and are never cached. The key doubles as the HTTP ETag: a
+client holding it already has the one body those arguments can produce.
+"""
+from typing import Any, Dict, Optional
+
+from .battle_engine import ENGINE_VERSION
+from .cache import make_key
+
+
+def battle_key(kind: str, npc_a: str, npc_b: str, level: int, seed: Optional[int], max_turns: int,
+               log_level: str, data_version: str, policy_a: str = "greedy", policy_b: str = "greedy",
+               depth: Optional[int] = None, budget_ms: Optional[float] = None) -> Optional[str]:
+    """Key for one battle's ``kind`` of serialized response, or None when it is not reproducible."""
+    if seed is None:
+        return None
+    args: Dict[str, Any] = {"npc_a": npc_a.lower(), "npc_b": npc_b.lower(), "level": level, "seed": seed,
+                            "max_turns": max_turns, "log_level": log_level}
+    if (policy_a, policy_b) != ("greedy", "greedy"):
+        # a search bounded by wall time reaches a machine-dependent depth
+        if budget_ms != 0:
+            return None
+        args.update(policy_a=policy_a, policy_b=policy_b, depth=depth)
+    return make_key("battle", kind, ENGINE_VERSION, data_version, args)
+
+
+def etag(key: str) -> str:
+    return f'"{key[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], tag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [t.strip() for t in if_none_match.split(",")]
+    # weak comparison (RFC 9110): W/"x" matches "x"
+    return "*" in candidates or tag in (t[2:] if t.startswith("W/") else t for t in candidates)
@@ -1,19 +1,28 @@
 # server/battle_engine.py
-import os
-import json
 import random
-from dataclasses import dataclass
-from typing import Dict, List
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence, Union
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
-NPCS_PATH = os.path.join(DATA_DIR, "npcs.json")
-MOVES_PATH = os.path.join(DATA_DIR, "moves.json")
+from .battle_log import (EV_FAINT, EV_MOVE, EV_START, EV_STUNNED, EV_TICK, EV_TURN, LOG_LEVELS, Event,
+                         events_to_actions, render_log)
+from .datastore import current_data
+from .gamedata import (CRIT_MULTIPLIER, DATA_DIR, ENGINE_VERSION, MOVES_PATH, NPCS_PATH, GameData,  # noqa: F401
+                       MoveInfo, damage_formula)
 
-with open(NPCS_PATH, "r", encoding="utf-8") as f:
-    NPCS = json.load(f)
+def __getattr__(name):
+    # GAME_DATA / NPCS / MOVES are live views of the current snapshot (see datastore.py);
+    # engine code itself reads the snapshot pinned on each Combatant instead
+    if name == "GAME_DATA":
+        return current_data()
+    if name == "NPCS":
+        return current_data().raw_npcs
+    if name == "MOVES":
+        return current_data().raw_moves
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-with open(MOVES_PATH, "r", encoding="utf-8") as f:
-    MOVES = json.load(f)
+# Anything with random()/uniform() works: random.Random, numpy.random.Generator,
+# or the random module itself.
+RNG = Union[random.Random, "numpy.random.Generator"]
 
 @dataclass
 class Status:
@@ -33,19 +42,17 @@ class Combatant:
     sp_defense: int
     speed: int
     status: Status
+    npc_id: int = -1
+    # snapshot the combatant was built from; None means the current one
+    data: Optional[GameData] = field(default=None, repr=False, compare=False)
 
-def build_combatant(key: str, level: int = 50) -> Combatant:
-    p = NPCS[key.lower()]
-    # basic level scaling
-    hp = int(p["hp"] * (1 + (level - p.get("level", 50)) / 100)) + 10
-    attack = int(p["attack"] * (1 + (level - p.get("level",50)) / 100))
-    defense = int(p["defense"] * (1 + (level - p.get("level",50)) / 100))
-    sp_attack = int(p["sp_attack"] * (1 + (level - p.get("level",50)) / 100))
-    sp_defense = int(p["sp_defense"] * (1 + (level - p.get("level",50)) / 100))
-    speed = int(p["speed"] * (1 + (level - p.get("level",50)) / 100))
+def build_combatant(key: str, level: int = 50, data: Optional[GameData] = None) -> Combatant:
+    data = data or current_data()
+    npc = data.npc(key)
+    hp, attack, defense, sp_attack, sp_defense, speed = npc.stats_at(level)
     return Combatant(
         key=key.lower(),
-        name=p["name"],
+        name=npc.name,
         level=level,
         max_hp=hp,
         hp=hp,
@@ -54,126 +61,236 @@ def build_combatant(key: str, level: int = 50) -> Combatant:
         sp_attack=sp_attack,
         sp_defense=sp_defense,
         speed=speed,
-        status=Status()
+        status=Status(),
+        npc_id=npc.id,
+        data=data
     )
 
+def choose_move_id(combatant: Combatant) -> int:
+    # highest power damaging move, resolved once when the tables were compiled
+    return (combatant.data or current_data()).npcs[combatant.npc_id].auto_move_id
+
 def choose_move_auto(combatant: Combatant) -> str:
-    # choose highest power damaging move by default
-    moves = NPCS[combatant.key]["moves"]
-    best = moves[0]
-    best_power = -1
-    for m in moves:
-        info = MOVES.get(m, {})
-        power = info.get("power", 0)
-        if info.get("category") in ("Physical", "Special") and power > best_power:
-            best_power = power
-            best = m
-    return best
-
-def apply_status_effects(combatant: Combatant, log: List[str]):
+    return (combatant.data or current_data()).moves[choose_move_id(combatant)].name
+
+def apply_status_effects(combatant: Combatant) -> int:
+    # returns the damage dealt by ongoing burn/poison this turn
     if combatant.status.name == "Burn":
         dmg = max(1, combatant.max_hp // 16)
-        combatant.hp = max(0, combatant.hp - dmg)
-        log.append(f"{combatant.name} takes {dmg} burn damage (HP: {combatant.hp}/{combatant.max_hp}).")
     elif combatant.status.name == "Poison":
         dmg = max(1, combatant.max_hp // 12)
-        combatant.hp = max(0, combatant.hp - dmg)
-        log.append(f"{combatant.name} takes {dmg} poison damage (HP: {combatant.hp}/{combatant.max_hp}).")
-    elif combatant.status.name == "Stunned":
+    else:
         # stun duration handled elsewhere
-        pass
+        return 0
+    combatant.hp = max(0, combatant.hp - dmg)
+    return dmg
 
-def calc_damage(attacker: Combatant, defender: Combatant, move_name: str) -> int:
-    move = MOVES.get(move_name, {})
-    if not move or move.get("category") == "Status" or move.get("power", 0) == 0:
+def move_base_damage(attacker: Combatant, defender: Combatant, move: MoveInfo) -> float:
+    # deterministic part of the damage (stats, power, type effectiveness); 0.0 for non-damaging moves
+    if not move.is_damaging:
+        return 0.0
+    data = attacker.data or current_data()
+    if attacker.level == defender.level:
+        base = data.damage.get(attacker.level, attacker.npc_id, move.id, defender.npc_id)
+        if base is not None:
+            return base
+    # hand-built combatants, mixed or untabulated levels
+    atk_stat = attacker.sp_attack if move.is_special else attacker.attack
+    def_stat = defender.sp_defense if move.is_special else defender.defense
+    defender_type = data.npcs[defender.npc_id].type if defender.npc_id >= 0 else None
+    return damage_formula(attacker.level, move.power, atk_stat, def_stat,
+                          data.type_multiplier(move.type, defender_type))
+
+def roll_damage(attacker: Combatant, defender: Combatant, move: MoveInfo, rng: RNG) -> int:
+    if not move.is_damaging:
         return 0
-    atk_stat = attacker.sp_attack if move.get("category") == "Special" else attacker.attack
-    def_stat = defender.sp_defense if move.get("category") == "Special" else defender.defense
-    base = (((2 * attacker.level) / 5) + 2) * move.get("power", 1) * atk_stat / max(1, def_stat) / 50 + 2
-    rand = random.uniform(0.85, 1.0)
-    damage = int(base * rand)
-    return max(1, damage)
-
-def simulate_battle(npc_a: str, npc_b: str, level: int = 50, seed: int = None, max_turns: int = 200) -> Dict:
-    if seed is not None:
-        random.seed(seed)
-    a = build_combatant(npc_a, level)
-    b = build_combatant(npc_b, level)
-
-    log: List[str] = []
-    actions: List[Dict] = []
-    log.append(f"Battle start: {a.name} (HP {a.hp}) vs {b.name} (HP {b.hp}), Level {level}")
+    damage = move_base_damage(attacker, defender, move) * rng.uniform(0.85, 1.0)
+    # the crit roll only draws from the RNG for moves that can crit
+    if move.crit_chance and rng.random() < move.crit_chance:
+        damage *= CRIT_MULTIPLIER
+    return max(1, int(damage))
+
+def base_damage(attacker: Combatant, defender: Combatant, move_name: str) -> float:
+    data = attacker.data or current_data()
+    mid = data.move_ids.get(move_name)
+    return 0.0 if mid is None else move_base_damage(attacker, defender, data.moves[mid])
+
+def calc_damage(attacker: Combatant, defender: Combatant, move_name: str, rng: RNG = random) -> int:
+    data = attacker.data or current_data()
+    mid = data.move_ids.get(move_name)
+    return 0 if mid is None else roll_damage(attacker, defender, data.moves[mid], rng)
+
+def apply_move_status(defender: Combatant, move: MoveInfo, rng: RNG) -> Optional[str]:
+    # roll the move's status procs in order; only a Healthy defender can be afflicted
+    status_applied = None
+    if move.burn_chance and defender.status.name == "Healthy":
+        if rng.random() < move.burn_chance:
+            defender.status.name = "Burn"; defender.status.turns = 3
+            status_applied = "Burn"
+    if move.poison_chance and defender.status.name == "Healthy":
+        if rng.random() < move.poison_chance:
+            defender.status.name = "Poison"; defender.status.turns = 5
+            status_applied = status_applied or "Poison"
+    if move.stun_chance and defender.status.name == "Healthy":
+        if rng.random() < move.stun_chance:
+            defender.status.name = "Stunned"; defender.status.turns = 1
+            status_applied = status_applied or "Stunned"
+    return status_applied
+
+def resolve_policies(policy_a: str = "greedy", policy_b: str = "greedy", depth: Optional[int] = None,
+                     budget_ms: Optional[float] = None) -> Optional[Sequence]:
+    """(policy for a, policy for b), or None when both are greedy and the compiled auto move applies."""
+    if policy_a == "greedy" and policy_b == "greedy":
+        return None
+    from .policies import make_policy  # imports this module, so resolve lazily
+    return (make_policy(policy_a, depth, budget_ms), make_policy(policy_b, depth, budget_ms))
+
+def play_turn(a: Combatant, b: Combatant, turn: int, rng: RNG, record=None, policies: Optional[Sequence] = None):
+    """Play one turn in place; ``record`` (e.g. ``list.append``) receives its events.
+
+    ``policies`` (see policies.py) picks each side's move; None uses the greedy auto move.
+    """
+    if record:
+        record((EV_TURN, turn))
+    # apply ongoing status effects first
+    for c in (a, b):
+        tick = apply_status_effects(c)
+        if tick and record:
+            record((EV_TICK, c.name, c.status.name, tick, c.hp, c.max_hp))
+    # determine order by speed (stun halves speed as example)
+    a_speed = a.speed * (0.5 if a.status.name == "Stunned" else 1.0)
+    b_speed = b.speed * (0.5 if b.status.name == "Stunned" else 1.0)
+    order = [(a, b)] if a_speed >= b_speed else [(b, a)]
+    if a_speed == b_speed:
+        order = [(a, b), (b, a)]
+    moves = (a.data or current_data()).moves
+    for attacker, defender in order:
+        if attacker.hp <= 0 or defender.hp <= 0:
+            continue
+        side = 0 if attacker is a else 1
+        # if stunned, skip action and reduce stun turns
+        if attacker.status.name == "Stunned" and attacker.status.turns > 0:
+            attacker.status.turns -= 1
+            if attacker.status.turns == 0:
+                attacker.status.name = "Healthy"
+            if record:
+                record((EV_STUNNED, turn, attacker.name, side))
+            continue
+        if policies is None:
+            move = moves[choose_move_id(attacker)]
+        else:
+            move = moves[policies[side].choose(a, b, side, turn)]
+        dmg = roll_damage(attacker, defender, move, rng)
+        defender.hp = max(0, defender.hp - dmg)
+        # try apply status effects from move
+        status_applied = apply_move_status(defender, move, rng)
+        if record:
+            record((EV_MOVE, turn, attacker.name, move.name, defender.name, dmg, defender.hp, defender.max_hp,
+                    status_applied, attacker.hp, side))
+        if defender.hp <= 0:
+            if record:
+                record((EV_FAINT, defender.name))
+            break
+
+def run_battle(a: Combatant, b: Combatant, rng: RNG, max_turns: int = 200,
+               events: Optional[List[Event]] = None, policies: Optional[Sequence] = None) -> int:
+    """Fight ``a`` against ``b`` in place and return the number of turns played.
+
+    The winner is ``a`` if ``a.hp > 0`` afterwards, otherwise ``b``. Events are
+    appended to ``events`` when a list is given.
+    """
+    record = events.append if events is not None else None
+    if record:
+        record((EV_START, a.name, a.hp, b.name, b.hp, a.level))
     turn = 1
+    while a.hp > 0 and b.hp > 0 and turn <= max_turns:
+        play_turn(a, b, turn, rng, record, policies)
+        turn += 1
+    return turn - 1
 
+def iter_battle(a: Combatant, b: Combatant, rng: RNG, max_turns: int = 200,
+                policies: Optional[Sequence] = None) -> Iterator[List[Event]]:
+    """Like run_battle, but yields each turn's events as soon as the turn is played.
+
+    The first item holds just the EV_START event.
+    """
+    yield [(EV_START, a.name, a.hp, b.name, b.hp, a.level)]
+    turn = 1
     while a.hp > 0 and b.hp > 0 and turn <= max_turns:
-        log.append(f"--- Turn {turn} ---")
-        # apply ongoing status effects first
-        apply_status_effects(a, log); apply_status_effects(b, log)
-        # determine order by speed (stun halves speed as example)
-        a_speed = a.speed * (0.5 if a.status.name == "Stunned" else 1.0)
-        b_speed = b.speed * (0.5 if b.status.name == "Stunned" else 1.0)
-        order = [(a, b)] if a_speed >= b_speed else [(b, a)]
-        if a_speed == b_speed:
-            order = [(a, b), (b, a)]
-        for attacker, defender in order:
-            if attacker.hp <= 0 or defender.hp <= 0:
-                continue
-            # if stunned, skip action and reduce stun turns
-            if attacker.status.name == "Stunned" and attacker.status.turns > 0:
-                log.append(f"{attacker.name} is stunned and cannot act this turn.")
-                attacker.status.turns -= 1
-                if attacker.status.turns == 0:
-                    attacker.status.name = "Healthy"
-                actions.append({
-                    "turn": turn,
-                    "actor": attacker.name,
-                    "action": "stunned",
-                    "target": None,
-                    "damage": 0,
-                    "status_applied": "Stunned (skipped)"
-                })
-                continue
-            mv = choose_move_auto(attacker)
-            mv_info = MOVES.get(mv, {})
-            dmg = calc_damage(attacker, defender, mv)
-            defender.hp = max(0, defender.hp - dmg)
-            log.append(f"{attacker.name} used {mv}, dealing {dmg} to {defender.name} ({defender.hp}/{defender.max_hp}).")
-            status_applied = None
-            # try apply status effects from move
-            if mv_info.get("burn_chance") and defender.status.name == "Healthy":
-                if random.random() < mv_info["burn_chance"]:
-                    defender.status.name = "Burn"; defender.status.turns = 3
-                    status_applied = "Burn"
-                    log.append(f"{defender.name} was burned!")
-            if mv_info.get("poison_chance") and defender.status.name == "Healthy":
-                if random.random() < mv_info["poison_chance"]:
-                    defender.status.name = "Poison"; defender.status.turns = 5
-                    status_applied = status_applied or "Poison"
-                    log.append(f"{defender.name} was poisoned!")
-            if mv_info.get("stun_chance") and defender.status.name == "Healthy":
-                if random.random() < mv_info["stun_chance"]:
-                    defender.status.name = "Stunned"; defender.status.turns = 1
-                    status_applied = status_applied or "Stunned"
-                    log.append(f"{defender.name} was stunned!")
-            actions.append({
-                "turn": turn,
-                "actor": attacker.name,
-                "action": mv,
-                "target": defender.name,
-                "damage": dmg,
-                "status_applied": status_applied,
-                "actor_hp": attacker.hp,
-                "target_hp": defender.hp
-            })
-            if defender.hp <= 0:
-                log.append(f"{defender.name} has fallen!")
-                break
+        events: List[Event] = []
+        play_turn(a, b, turn, rng, events.append, policies)
+        yield events
         turn += 1
 
+def stream_battle(npc_a: str, npc_b: str, level: int = 50, seed: int = None, max_turns: int = 200,
+                  rng: Optional[RNG] = None, policy_a: str = "greedy", policy_b: str = "greedy",
+                  depth: Optional[int] = None, budget_ms: Optional[float] = None,
+                  log_level: str = "full") -> Iterator[Dict]:
+    """Generator form of simulate_battle for streaming clients.
+
+    Yields {"type": "start", ...}, then one {"type": "turn", ...} per turn with
+    that turn's log lines and actions, then {"type": "end", "winner", "turns"}.
+    Concatenating the turn logs/actions gives simulate_battle's output for the
+    same ``log_level``, which drops ``log`` ("actions") or both ("none") from
+    the events as it does from the result.
+    """
+    if log_level not in LOG_LEVELS:
+        raise ValueError(f"log_level must be one of {LOG_LEVELS}")
+    if rng is None:
+        rng = random.Random(seed)
+    policies = resolve_policies(policy_a, policy_b, depth, budget_ms)
+    data = current_data()
+    a = build_combatant(npc_a, level, data)
+    b = build_combatant(npc_b, level, data)
+    turns = 0
+    for events in iter_battle(a, b, rng, max_turns, policies):
+        if events[0][0] == EV_START:
+            event = {"type": "start", "npc_a": a.name, "npc_b": b.name, "level": level, "data_version": data.version}
+        else:
+            turns = events[0][1]
+            event = {"type": "turn", "turn": turns}
+            if log_level != "none":
+                event["actions"] = events_to_actions(events)
+        if log_level == "full":
+            event["log"] = render_log(events)
+        yield event
+    yield {"type": "end", "winner": a.name if a.hp > 0 else b.name, "turns": turns}
+
+def simulate_battle(npc_a: str, npc_b: str, level: int = 50, seed: int = None, max_turns: int = 200,
+                    rng: Optional[RNG] = None, log_level: str = "full", policy_a: str = "greedy",
+                    policy_b: str = "greedy", depth: Optional[int] = None, budget_ms: Optional[float] = None) -> Dict:
+    """Simulate a 1v1 battle.
+
+    log_level controls what is returned besides winner/turns: "none" nothing,
+    "actions" the structured action list, "full" the actions plus text log.
+    Only compact event tuples are recorded while simulating; text is
+    rendered afterwards (see battle_log.render_log).
+
+    policy_a / policy_b name each side's move policy (policies.POLICY_NAMES);
+    depth and budget_ms tune the search policies.
+    """
+    if log_level not in LOG_LEVELS:
+        raise ValueError(f"log_level must be one of {LOG_LEVELS}")
+    policies = resolve_policies(policy_a, policy_b, depth, budget_ms)
+    # each call owns its RNG stream, so seeded battles are reproducible across threads
+    if rng is None:
+        rng = random.Random(seed)
+    # pin one snapshot for the whole battle, so a data reload mid-battle cannot mix versions
+    data = current_data()
+    a = build_combatant(npc_a, level, data)
+    b = build_combatant(npc_b, level, data)
+
+    events: Optional[List[Event]] = None if log_level == "none" else []
+    turns = run_battle(a, b, rng, max_turns, events, policies)
+
     winner = a.name if a.hp > 0 else b.name
-    return {
+    result = {
         "winner": winner,
-        "turns": turn - 1,
-        "log": log,
-        "actions": actions
+        "turns": turns,
+        "data_version": data.version,
     }
+    if log_level == "full":
+        result["log"] = render_log(events)
+    if events is not None:
+        result["actions"] = events_to_actions(events)
+    return result
@@ -0,0 +1,95 @@
+# server/battle_log.py
+"""Structured battle events and on-demand rendering.
+
+The engine records one small tuple per event on the hot path and nothing
+else; the ``actions`` dicts and the human-readable ``log`` lines are built
+from those tuples only when a caller asks for them.
+
+Event layouts (first field is the kind):
+    (EV_START, a_name, a_hp, b_name, b_hp, level)
+    (EV_TURN, turn)
+    (EV_TICK, name, status, dmg, hp, max_hp)
+    (EV_STUNNED, turn, name, side)
+    (EV_MOVE, turn, actor, move, target, dmg, target_hp, target_max_hp, status_applied, actor_hp, side)
+    (EV_FAINT, name)
+    (EV_TEAM_START, a_names, b_names, level)      # team battles (team_battle.py)
+
+``side`` is 0 for the acting combatant on side a (or team a) and 1 for side
+b, so the two sides of a mirror match stay apart.
+"""
+from typing import Dict, Iterable, List, Tuple
+
+EV_START, EV_TURN, EV_TICK, EV_STUNNED, EV_MOVE, EV_FAINT, EV_TEAM_START = range(7)
+
+LOG_LEVELS = ("none", "actions", "full")
+
+Event = Tuple
+
+_TICK_WORDS = {"Burn": "burn", "Poison": "poison"}
+_INFLICT_WORDS = {"Burn": "burned", "Poison": "poisoned", "Stunned": "stunned"}
+SIDE_NAMES = ("a", "b")
+
+
+def render_event(ev: Event) -> List[str]:
+    kind = ev[0]
+    if kind == EV_TURN:
+        return [f"--- Turn {ev[1]} ---"]
+    if kind == EV_MOVE:
+        _, _, actor, move, target, dmg, target_hp, target_max_hp, status_applied, _, _ = ev
+        lines = [f"{actor} used {move}, dealing {dmg} to {target} ({target_hp}/{target_max_hp})."]
+        if status_applied:
+            lines.append(f"{target} was {_INFLICT_WORDS[status_applied]}!")
+        return lines
+    if kind == EV_TICK:
+        _, name, status, dmg, hp, max_hp = ev
+        return [f"{name} takes {dmg} {_TICK_WORDS[status]} damage (HP: {hp}/{max_hp})."]
+    if kind == EV_STUNNED:
+        return [f"{ev[2]} is stunned and cannot act this turn."]
+    if kind == EV_FAINT:
+        return [f"{ev[1]} has fallen!"]
+    if kind == EV_START:
+        _, a_name, a_hp, b_name, b_hp, level = ev
+        return [f"Battle start: {a_name} (HP {a_hp}) vs {b_name} (HP {b_hp}), Level {level}"]
+    if kind == EV_TEAM_START:
+        _, a_names, b_names, level = ev
+        return [f"Team battle start: {', '.join(a_names)} vs {', '.join(b_names)}, Level {level}"]
+    raise ValueError(f"Unknown battle event kind: {kind}")
+
+
+def render_log(events: Iterable[Event]) -> List[str]:
+    log: List[str] = []
+    for ev in events:
+        log.extend(render_event(ev))
+    return log
+
+
+def event_to_action(ev: Event) -> Dict:
+    # only EV_STUNNED and EV_MOVE produce actions
+    if ev[0] == EV_STUNNED:
+        return {
+            "turn": ev[1],
+            "actor": ev[2],
+            "side": SIDE_NAMES[ev[3]],
+            "action": "stunned",
+            "target": None,
+            "damage": 0,
+            "status_applied": "Stunned (skipped)",
+            "actor_hp": None,
+            "target_hp": None
+        }
+    _, turn, actor, move, target, dmg, target_hp, _, status_applied, actor_hp, side = ev
+    return {
+        "turn": turn,
+        "actor": actor,
+        "side": SIDE_NAMES[side],
+        "action": move,
+        "target": target,
+        "damage": dmg,
+        "status_applied": status_applied,
+        "actor_hp": actor_hp,
+        "target_hp": target_hp
+    }
+
+
+def events_to_actions(events: Iterable[Event]) -> List[Dict]:
+    return [event_to_action(ev) for ev in events if ev[0] == EV_MOVE or ev[0] == EV_STUNNED]
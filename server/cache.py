@@ -0,0 +1,147 @@
+# server/cache.py
+"""Small result caches: an in-memory LRU with an optional on-disk tier.
+
+Values are bytes (usually serialized JSON) so every tier stores exactly the
+same thing and entries can be shared between processes through the second
+tier (a directory, or a result backend from backend.py). Keys are arbitrary
+strings; ``make_key`` hashes structured parts into a stable hex digest.
+
+The second tier blocks (file I/O, a SQLite write lock, a Redis round trip),
+so async code uses ``aget`` / ``aset``, which only leave the event loop when
+the memory tier cannot answer.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+def make_key(*parts: Any) -> str:
+    blob = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: bytes):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache:
+    """One file per key under ``directory``; writes are atomic renames."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, value: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+class TieredCache:
+    """LRU in front of an optional shared tier; hits there are promoted to memory.
+
+    ``disk`` is a ``DiskCache`` or anything else with ``get`` / ``set`` of bytes,
+    such as a ``backend.BackendCache``.
+    """
+
+    def __init__(self, memory: LRUCache, disk: Optional[DiskCache] = None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: bytes):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = await asyncio.to_thread(self.disk.get, key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    async def aset(self, key: str, value: bytes):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    def get_json(self, key: str) -> Any:
+        value = self.get(key)
+        return None if value is None else json.loads(value)
+
+    def set_json(self, key: str, value: Any):
+        self.set(key, json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+def cache_from_env(backend=None) -> TieredCache:
+    """Memory LRU plus the shared ``backend`` when given, else ``ARENA_CACHE_DIR`` when set."""
+    directory = os.getenv("ARENA_CACHE_DIR")
+    if backend is not None:
+        from .backend import BackendCache
+        # seconds an entry lives in the shared tier; 0 keeps entries forever
+        ttl = float(os.getenv("ARENA_CACHE_TTL", "86400"))
+        shared = BackendCache(backend, ttl=ttl or None)
+    else:
+        shared = DiskCache(directory) if directory else None
+    return TieredCache(LRUCache(int(os.getenv("ARENA_CACHE_SIZE", "4096"))), shared)
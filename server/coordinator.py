@@ -0,0 +1,237 @@
+# server/coordinator.py
+"""Sharded sweeps: split a matchup sweep by seed range, run the shards anywhere, merge.
+
+The cells are the job cells (jobs.expand_spec). Shard ``s`` of ``S`` holds
+seeds ``[s * n // S, (s + 1) * n // S)`` of every cell of ``n`` samples, so
+the shard plan depends only on the cells and ``S``. Shards are handed to
+*runners*, async callables ``runner(cells, slices) -> rows`` such as the
+local worker pool or another server's ``POST /battle/shard``; a runner that
+fails gives its shard back to the queue for the others. Each row carries
+the seed offset it started at, and ``merge`` sums every cell's rows in seed
+order after checking that they cover its seeds exactly once, so the merged
+counts equal those of one process running the whole sweep, whichever runner
+did which shard.
+
+Finished shards are kept in the result backend under the sweep's id (a hash
+of the engine version, data version, cells and shard count), so rerunning a
+sweep after a worker or host died, or from another worker process, only
+runs the shards that are missing.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+from .battle_engine import ENGINE_VERSION
+from .cache import make_key
+from .datastore import current_data
+from .jobs import Slice, aggregate, run_chunk
+
+logger = logging.getLogger(__name__)
+
+Runner = Callable[[List[Dict], List[Slice]], Awaitable[List[List]]]
+
+# seconds a remote host may take to answer one shard
+SHARD_TIMEOUT = float(os.getenv("ARENA_SHARD_TIMEOUT", "600"))
+# seconds finished shards are kept in the result backend for reruns
+SHARD_TTL = float(os.getenv("ARENA_SWEEP_TTL", "86400"))
+# 503 (host busy) answers a shard may get before its runner gives up on the host
+SHARD_RETRIES = 5
+# largest sweep POST /battle/sweep runs inside one request; bigger ones belong in /battle/jobs
+MAX_SWEEP_BATTLES = int(os.getenv("ARENA_SWEEP_MAX_BATTLES", "200000"))
+
+
+def peers_from_env() -> List[str]:
+    """Arena servers this one may send shards to (``ARENA_PEERS``, comma-separated base URLs)."""
+    # main() exports --peers here; only these URLs are ever contacted on a client's behalf
+    return [p.strip().rstrip("/") for p in os.getenv("ARENA_PEERS", "").split(",") if p.strip()]
+
+
+def shard_plan(cells: Sequence[Dict], shards: int) -> List[List[Slice]]:
+    """Slices of each of ``shards`` shards; seed ranges with no battles are left out."""
+    plan = []
+    for s in range(shards):
+        slices = []
+        for index, cell in enumerate(cells):
+            start = s * cell["samples"] // shards
+            end = (s + 1) * cell["samples"] // shards
+            if end > start:
+                slices.append((index, start, end - start))
+        plan.append(slices)
+    return plan
+
+
+def split_slices(slices: Sequence[Slice], parts: int) -> List[List[Slice]]:
+    """``slices`` cut into at most ``parts`` non-empty groups, each slice's seed range divided evenly."""
+    groups: List[List[Slice]] = [[] for _ in range(parts)]
+    for index, offset, count in slices:
+        for p in range(parts):
+            start, end = p * count // parts, (p + 1) * count // parts
+            if end > start:
+                groups[p].append((index, offset + start, end - start))
+    return [g for g in groups if g]
+
+
+def run_shard(cells: Sequence[Dict], slices: Sequence[Slice]) -> List[List]:
+    """Pool task: [cell index, seed offset, battles, wins_a, total turns, data_version] per slice."""
+    return [[row[0], offset, *row[1:]] for (_, offset, _), row in zip(slices, run_chunk(cells, slices))]
+
+
+def merge(cells: Sequence[Dict], shard_rows: Sequence[Sequence[List]]) -> Dict:
+    """Aggregate of every cell, summed in seed order.
+
+    Raises ValueError unless the rows cover each cell's seeds exactly once.
+    """
+    by_cell: List[List[List]] = [[] for _ in cells]
+    for rows in shard_rows:
+        for row in rows:
+            by_cell[row[0]].append(row)
+    ordered = []
+    for index, (cell, rows) in enumerate(zip(cells, by_cell)):
+        rows.sort(key=lambda r: r[1])
+        covered = 0
+        for row in rows:
+            if row[1] != covered:
+                raise ValueError(f"cell {index}: seeds from offset {min(row[1], covered)} are missing or run twice")
+            covered += row[2]
+        if covered != cell["samples"]:
+            raise ValueError(f"cell {index}: {covered} of {cell['samples']} battles present")
+        ordered.extend([row[0], *row[2:]] for row in rows)
+    return aggregate(cells, [ordered])
+
+
+def sweep_id(cells: Sequence[Dict], shards: int, data_version: str) -> str:
+    return make_key("sweep", ENGINE_VERSION, data_version, list(cells), shards)[:24]
+
+
+class Coordinator:
+    """Runs sweeps over ``runners``; each entry is one shard in flight, so list a runner once per slot.
+
+    ``backend`` is a result backend (backend.py) or None to keep shards in
+    memory for this sweep only.
+    """
+
+    def __init__(self, runners: Sequence[Runner], backend=None):
+        if not runners:
+            raise ValueError("a coordinator needs at least one runner")
+        self.runners = list(runners)
+        self.backend = backend
+
+    def _load(self, key: str) -> Dict[int, List[List]]:
+        if self.backend is None:
+            return {}
+        return {int(shard): json.loads(rows) for shard, rows in self.backend.hgetall(key).items()}
+
+    def _store(self, key: str, shard: int, rows: List[List]):
+        if self.backend is not None:
+            self.backend.hset(key, shard, json.dumps(rows, separators=(",", ":")))
+            self.backend.expire(key, int(SHARD_TTL))
+
+    async def run(self, cells: List[Dict], shards: Optional[int] = None) -> Dict:
+        """Run (or finish) the sweep over ``cells`` in ``shards`` shards (default: one per runner)."""
+        shards = max(1, shards or len(self.runners))
+        data = current_data()
+        sid = sweep_id(cells, shards, data.version)
+        key = f"sweep:{sid}"
+        plan = shard_plan(cells, shards)
+        # backend calls block (SQLite write lock, Redis round trip), so they run off the loop
+        done = await asyncio.to_thread(self._load, key)
+        reused = len(done)
+        queue: asyncio.Queue = asyncio.Queue()
+        for shard in range(shards):
+            if shard not in done:
+                queue.put_nowait(shard)
+        failures: List[BaseException] = []
+
+        async def drain(runner: Runner) -> bool:
+            while not queue.empty():
+                shard = queue.get_nowait()
+                try:
+                    rows = await runner(cells, plan[shard])
+                except Exception as e:
+                    # leave the shard to the remaining runners and retire this one
+                    logger.warning("Sweep %s shard %d failed on a runner: %s", sid, shard, e)
+                    failures.append(e)
+                    queue.put_nowait(shard)
+                    return False
+                done[shard] = rows
+                # shards that raced a data reload are merged but not kept for reuse
+                if all(row[5] == data.version for row in rows):
+                    await asyncio.to_thread(self._store, key, shard, rows)
+            return True
+
+        healthy = self.runners
+        while not queue.empty() and healthy:
+            # runners that finished early may have missed shards handed back by a failed one
+            ok = await asyncio.gather(*(drain(runner) for runner in healthy))
+            healthy = [runner for runner, fine in zip(healthy, ok) if fine]
+        if not queue.empty():
+            raise RuntimeError(f"sweep {sid}: {queue.qsize()} shard(s) left after every runner failed "
+                               f"(last error: {failures[-1]})")
+        out = merge(cells, [done[shard] for shard in range(shards)])
+        out.update(sweep_id=sid, shards=shards, shards_reused=reused, runner_failures=len(failures))
+        return out
+
+
+def http_runner(client, base_url: str, retries: int = SHARD_RETRIES) -> Runner:
+    """Runner that sends shards to another arena server's ``POST /battle/shard`` (``client``: httpx.AsyncClient).
+
+    A 503 (the host's pool is busy, not down) is retried up to ``retries``
+    times, honouring ``Retry-After``; after that the runner fails and the
+    coordinator hands the shard to another one.
+    """
+    url = base_url.rstrip("/") + "/battle/shard"
+
+    async def run(cells: List[Dict], slices: List[Slice]) -> List[List]:
+        for attempt in range(retries + 1):
+            resp = await client.post(url, json={"cells": cells, "slices": slices})
+            if resp.status_code != 503 or attempt == retries:
+                break
+            try:
+                delay = float(resp.headers.get("Retry-After", "1"))
+            except ValueError:
+                delay = 1.0
+            await asyncio.sleep(min(max(delay, 0.0), 30.0))
+        resp.raise_for_status()
+        return resp.json()["rows"]
+
+    return run
+
+
+async def _run_cli(args) -> Dict:
+    import httpx
+
+    from .backend import open_backend
+    from .jobs import expand_spec
+
+    sweep = {"samples": args.samples, "seed": args.seed, "levels": args.levels, "max_turns": args.max_turns}
+    if args.npcs:
+        sweep["npcs"] = args.npcs
+    cells = expand_spec({"sweep": sweep})
+    backend = open_backend(args.result_backend) if args.result_backend else None
+    async with httpx.AsyncClient(timeout=httpx.Timeout(SHARD_TIMEOUT, connect=5.0)) as client:
+        runners = [http_runner(client, host) for host in args.hosts for _ in range(args.host_slots)]
+        return await Coordinator(runners, backend).run(cells, shards=args.shards)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Shard a matchup sweep across arena servers and merge the results.")
+    parser.add_argument("--hosts", nargs="+", required=True, help="Arena servers, e.g. http://10.0.0.2:8000")
+    parser.add_argument("--npcs", nargs="*", help="NPC ids (default: all)")
+    parser.add_argument("--levels", nargs="+", type=int, default=[50])
+    parser.add_argument("--samples", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-turns", type=int, default=200)
+    parser.add_argument("--shards", type=int, default=None, help="Seed-range shards (default: one per host slot)")
+    parser.add_argument("--host-slots", type=int, default=2, help="Shards in flight per host")
+    parser.add_argument("--result-backend", default=os.getenv("ARENA_RESULT_BACKEND", ""),
+                        help="Keep finished shards here (sqlite:PATH or redis://) so a rerun skips them")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(_run_cli(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
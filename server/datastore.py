@@ -0,0 +1,166 @@
+# server/datastore.py
+"""Versioned, hot-swappable game data.
+
+``STORE`` holds the current ``GameData`` snapshot. Snapshots are never
+mutated after they are built; a reload builds and validates a complete new
+one and swaps the reference under a lock, so readers see either the old or
+the new data and never a mix. The engine grabs the snapshot once when a
+battle starts and every combatant keeps a reference to it, so battles in
+flight during a swap finish on the version they started with. Results carry
+``data_version`` (a content hash, identical across processes).
+
+Reloads are triggered by ``POST /admin/data/reload`` or by ``DataWatcher``,
+which polls the data files' mtimes (``--watch-data SECONDS``).
+"""
+import logging
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+from .gamedata import (COMPILED_PATH, MOVES_PATH, NPCS_PATH, TYPE_CHART_PATH, DataValidationError, GameData,
+                       load_compiled, read_raw_data, validate_raw)
+
+logger = logging.getLogger(__name__)
+
+SwapListener = Callable[[GameData, GameData], None]
+
+
+class DataStore:
+    def __init__(self, npcs_path: str = NPCS_PATH, moves_path: str = MOVES_PATH,
+                 type_chart_path: str = TYPE_CHART_PATH, compiled_path: Optional[str] = None):
+        self.paths = (npcs_path, moves_path, type_chart_path)
+        # first load only; reloads always re-read and validate the JSON
+        self.compiled_path = compiled_path
+        self._current: Optional[GameData] = None
+        self._lock = threading.Lock()
+        self._listeners: List[SwapListener] = []
+        self.loaded_at: Optional[float] = None
+
+    @property
+    def current(self) -> GameData:
+        data = self._current
+        if data is None:
+            with self._lock:
+                if self._current is None:
+                    data = load_compiled(*self.paths, cache_path=self.compiled_path)
+                    # the first load is held to the same rules as a reload
+                    problems = validate_raw(data.raw_npcs, data.raw_moves, data.type_chart)
+                    if problems:
+                        raise DataValidationError(problems)
+                    self._current = data
+                    self.loaded_at = time.time()
+                data = self._current
+        return data
+
+    def install(self, data: GameData):
+        """Adopt a snapshot another process already validated (worker processes; see sim_pool.py)."""
+        with self._lock:
+            self._current = data
+            self.loaded_at = time.time()
+
+    def subscribe(self, listener: SwapListener):
+        """``listener(old, new)`` runs after every swap (e.g. to recycle worker processes)."""
+        self._listeners.append(listener)
+
+    def swap(self, data: GameData) -> GameData:
+        """Install ``data`` as the current snapshot and return the previous one."""
+        problems = validate_raw(data.raw_npcs, data.raw_moves, data.type_chart)
+        if problems:
+            raise DataValidationError(problems)
+        old = self.current
+        with self._lock:
+            self._current = data
+            self.loaded_at = time.time()
+        if old.version != data.version:
+            for listener in self._listeners:
+                listener(old, data)
+        return old
+
+    def reload(self) -> GameData:
+        """Re-read the data files, validate them and swap; the old snapshot stays on any error."""
+        try:
+            raw = read_raw_data(*self.paths)
+        except (OSError, ValueError) as e:
+            raise DataValidationError([f"could not read data files: {e}"]) from e
+        problems = validate_raw(*raw)
+        if problems:
+            raise DataValidationError(problems)
+        try:
+            data = GameData(*raw)
+        except Exception as e:
+            # anything validate_raw missed still must not escape as a 500 or kill the watcher
+            raise DataValidationError([f"could not compile data files: {type(e).__name__}: {e}"]) from e
+        old = self.swap(data)
+        if old.version != data.version:
+            logger.info("Game data reloaded: %s -> %s", old.version, data.version)
+        return data
+
+    def info(self) -> dict:
+        data = self.current
+        return {"version": data.version, "loaded_at": self.loaded_at, "npcs": len(data.npcs),
+                "moves": len(data.moves), "paths": list(self.paths)}
+
+
+STORE = DataStore(compiled_path=COMPILED_PATH)
+
+
+def current_data() -> GameData:
+    return STORE.current
+
+
+class DataWatcher:
+    """Polls the store's files and reloads when any of them changes."""
+
+    def __init__(self, store: DataStore = STORE, interval: float = 2.0):
+        self.store = store
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # load now, so the baseline snapshot matches the baseline stamp
+        store.current
+        self._stamp = self._stat()
+
+    def _stat(self):
+        stamps = []
+        for path in self.store.paths:
+            try:
+                st = os.stat(path)
+                stamps.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamps.append(None)
+        return stamps
+
+    def check(self) -> bool:
+        """Reload if the files changed since the last check; True when a new snapshot was installed."""
+        stamp = self._stat()
+        if stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        try:
+            old = self.store.current.version
+            return self.store.reload().version != old
+        except DataValidationError as e:
+            # keep serving the old snapshot; the next edit gets another chance
+            logger.warning("Game data reload rejected: %s", e)
+            return False
+        except Exception:
+            # e.g. a reload listener failing; the watcher thread must outlive it
+            logger.exception("Game data reload failed")
+            return False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="data-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
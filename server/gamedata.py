@@ -0,0 +1,386 @@
+# server/gamedata.py
+"""Compiled NPC/move tables.
+
+``npcs.json`` and ``moves.json`` are loaded once and compiled into flat,
+``__slots__``-backed records indexed by integer id. The battle loop works on
+those ids, so per-turn move selection and damage lookups are list indexing
+and attribute access instead of repeated string-keyed dict lookups. The
+best automatic move of every NPC is resolved at compile time.
+
+``type_chart.json`` supplies type effectiveness. The deterministic part of
+every hit (level, attacker, move, defender) is precomputed into a dense
+``DamageTable`` so the engines only add the random roll and the crit.
+
+``load_compiled`` keeps the compiled ``GameData`` in a pickle next to the
+JSON (``ARENA_DATA_CACHE``), keyed on the source files' bytes, this module's
+code and ``ENGINE_VERSION``, so a fresh process skips the compile step. ``python -m server.gamedata`` prebuilds it.
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+NPCS_PATH = os.path.join(DATA_DIR, "npcs.json")
+MOVES_PATH = os.path.join(DATA_DIR, "moves.json")
+TYPE_CHART_PATH = os.path.join(DATA_DIR, "type_chart.json")
+
+
+def compiled_path_from_env() -> str:
+    # an empty ARENA_DATA_CACHE disables the compiled cache
+    return os.getenv("ARENA_DATA_CACHE", os.path.join(DATA_DIR, ".compiled.pickle"))
+
+
+COMPILED_PATH = compiled_path_from_env()
+# bump when GameData / NpcInfo / MoveInfo / DamageTable change shape, so old compiled files are rebuilt
+COMPILED_FORMAT = 1
+# bump when the battle rules change so cached outcomes are invalidated (battle_engine re-exports it)
+ENGINE_VERSION = 2
+
+DAMAGING_CATEGORIES = ("Physical", "Special")
+MOVE_CATEGORIES = DAMAGING_CATEGORIES + ("Status",)
+NPC_STATS = ("hp", "attack", "defense", "sp_attack", "sp_defense", "speed")
+
+CRIT_MULTIPLIER = 1.5
+# integer status codes, for code that packs battle states (the engine itself uses the names)
+HEALTHY, BURN, POISON, STUNNED = range(4)
+STATUS_CODES = {"Healthy": HEALTHY, "Burn": BURN, "Poison": POISON, "Stunned": STUNNED}
+# levels 1..MAX_TABLE_LEVEL are tabulated; anything else uses the formula directly
+MAX_TABLE_LEVEL = 100
+
+
+def scale_stat(base: int, npc_level: int, level: int) -> int:
+    # basic level scaling
+    return int(base * (1 + (level - npc_level) / 100))
+
+
+def damage_formula(level: int, power: int, atk_stat: int, def_stat: int, multiplier: float = 1.0) -> float:
+    return ((((2 * level) / 5) + 2) * power * atk_stat / max(1, def_stat) / 50 + 2) * multiplier
+
+
+class MoveInfo:
+    __slots__ = ("id", "name", "type", "power", "category", "is_damaging", "is_special", "priority",
+                 "crit_chance", "burn_chance", "poison_chance", "stun_chance", "effect")
+
+    def __init__(self, move_id: int, name: str, raw: Dict):
+        self.id = move_id
+        self.name = name
+        self.type = raw.get("type")
+        self.power = raw.get("power", 0)
+        self.category = raw.get("category")
+        # same test calc_damage has always applied: unknown, Status or zero-power moves deal nothing
+        self.is_damaging = bool(raw) and self.category != "Status" and self.power != 0
+        self.is_special = self.category == "Special"
+        self.priority = raw.get("priority", 0)
+        self.crit_chance = raw.get("crit_chance", 0.0)
+        self.burn_chance = raw.get("burn_chance", 0.0)
+        self.poison_chance = raw.get("poison_chance", 0.0)
+        self.stun_chance = raw.get("stun_chance", 0.0)
+        self.effect = raw.get("effect")
+
+    def __repr__(self):
+        return f"MoveInfo({self.id}, {self.name!r})"
+
+
+class NpcInfo:
+    __slots__ = ("id", "key", "name", "level", "hp", "attack", "defense", "sp_attack", "sp_defense", "speed",
+                 "move_ids", "move_slots", "auto_move_id", "type", "personality")
+
+    def __init__(self, npc_id: int, key: str, raw: Dict, move_ids: List[int], auto_move_id: int,
+                 type_: Optional[str]):
+        self.id = npc_id
+        self.key = key
+        self.name = raw["name"]
+        self.level = raw.get("level", 50)
+        self.hp = raw["hp"]
+        self.attack = raw["attack"]
+        self.defense = raw["defense"]
+        self.sp_attack = raw["sp_attack"]
+        self.sp_defense = raw["sp_defense"]
+        self.speed = raw["speed"]
+        self.move_ids = tuple(move_ids)
+        self.move_slots = {mid: slot for slot, mid in reversed(list(enumerate(move_ids)))}
+        self.auto_move_id = auto_move_id
+        self.type = type_
+        self.personality = raw.get("personality")
+
+    def stats_at(self, level: int) -> Tuple[int, int, int, int, int, int]:
+        """(max_hp, attack, defense, sp_attack, sp_defense, speed) scaled to ``level``."""
+        return (
+            scale_stat(self.hp, self.level, level) + 10,
+            scale_stat(self.attack, self.level, level),
+            scale_stat(self.defense, self.level, level),
+            scale_stat(self.sp_attack, self.level, level),
+            scale_stat(self.sp_defense, self.level, level),
+            scale_stat(self.speed, self.level, level),
+        )
+
+    def __repr__(self):
+        return f"NpcInfo({self.id}, {self.key!r})"
+
+
+def _auto_move(move_ids: List[int], moves: List[MoveInfo]) -> int:
+    # highest power damaging move; first listed move if none deal damage
+    best = move_ids[0]
+    best_power = -1
+    for mid in move_ids:
+        info = moves[mid]
+        if info.category in DAMAGING_CATEGORIES and info.power > best_power:
+            best_power = info.power
+            best = mid
+    return best
+
+
+class DamageTable:
+    """Dense base damage (before the random roll and crits) for NPC-built combatants.
+
+    Indexed by (level, attacker npc, attacker move slot, defender npc) with
+    both sides at the same level. Values live in one flat ``array('d')`` so
+    the scalar engine indexes it directly and NumPy code can wrap the same
+    buffer with ``as_numpy()`` without copying.
+    """
+
+    def __init__(self, data: "GameData"):
+        npcs = data.npcs
+        self.n_npcs = len(npcs)
+        self.n_slots = max((len(n.move_ids) for n in npcs), default=0)
+        self.shape = (MAX_TABLE_LEVEL, self.n_npcs, self.n_slots, self.n_npcs)
+        self.values = array("d", bytes(8 * MAX_TABLE_LEVEL * self.n_npcs * self.n_slots * self.n_npcs))
+        i = 0
+        for level in range(1, MAX_TABLE_LEVEL + 1):
+            stats = [n.stats_at(level) for n in npcs]
+            for atk in npcs:
+                _, attack, _, sp_attack, _, _ = stats[atk.id]
+                for slot in range(self.n_slots):
+                    move = data.moves[atk.move_ids[slot]] if slot < len(atk.move_ids) else None
+                    for dfn in npcs:
+                        if move is not None and move.is_damaging:
+                            def_stat = stats[dfn.id][4] if move.is_special else stats[dfn.id][2]
+                            self.values[i] = damage_formula(level, move.power, sp_attack if move.is_special else attack,
+                                                            def_stat, data.type_multiplier(move.type, dfn.type))
+                        i += 1
+        self._slots = [n.move_slots for n in npcs]
+
+    def get(self, level: int, atk_id: int, move_id: int, def_id: int) -> Optional[float]:
+        """Tabulated base damage, or None when the combination is not covered."""
+        if not 0 < level <= MAX_TABLE_LEVEL or atk_id < 0 or def_id < 0:
+            return None
+        slot = self._slots[atk_id].get(move_id)
+        if slot is None:
+            return None
+        return self.values[((level - 1) * self.n_npcs + atk_id) * self.n_slots * self.n_npcs
+                           + slot * self.n_npcs + def_id]
+
+    def as_numpy(self):
+        import numpy as np
+        return np.frombuffer(self.values, dtype=np.float64).reshape(self.shape)
+
+
+class GameData:
+    """Id-indexed NPC and move tables plus the raw JSON they were built from."""
+
+    def __init__(self, raw_npcs: Dict, raw_moves: Dict, type_chart: Optional[Dict] = None):
+        self.raw_npcs = raw_npcs
+        self.raw_moves = raw_moves
+        self.type_chart = type_chart or {}
+        # content hash: identical data gives the same version in every process and on every host
+        blob = json.dumps([raw_npcs, raw_moves, self.type_chart], sort_keys=True, separators=(",", ":"))
+        self.version = hashlib.sha256(blob.encode("utf-8")).hexdigest()[:12]
+        self.moves: List[MoveInfo] = []
+        self.move_ids: Dict[str, int] = {}
+        for name, info in raw_moves.items():
+            self._add_move(name, info)
+
+        self.npcs: List[NpcInfo] = []
+        self.npc_ids: Dict[str, int] = {}
+        for key, raw in raw_npcs.items():
+            # moves missing from moves.json still get an id (a no-op move), as MOVES.get(m, {}) did
+            mids = [self.move_ids[m] if m in self.move_ids else self._add_move(m, {}) for m in raw["moves"]]
+            auto = _auto_move(mids, self.moves)
+            # NPCs without an explicit "type" defend as the type of their signature move
+            npc = NpcInfo(len(self.npcs), key, raw, mids, auto, raw.get("type") or self.moves[auto].type)
+            self.npc_ids[key] = npc.id
+            self.npcs.append(npc)
+        self.damage = DamageTable(self)
+
+    def _add_move(self, name: str, raw: Dict) -> int:
+        move = MoveInfo(len(self.moves), name, raw)
+        self.move_ids[name] = move.id
+        self.moves.append(move)
+        return move.id
+
+    def type_multiplier(self, move_type: Optional[str], defender_type: Optional[str]) -> float:
+        return self.type_chart.get(move_type, {}).get(defender_type, 1.0)
+
+    def matchup_fingerprint(self, *npc_keys: str) -> str:
+        """Hash of exactly the data a matchup depends on: its NPCs and their moves.
+
+        Editing an unrelated NPC or move leaves the fingerprint unchanged, so
+        cached results for other matchups stay valid.
+        """
+        npcs = {k.lower(): self.raw_npcs[k.lower()] for k in npc_keys}
+        moves = {m: self.raw_moves.get(m) for npc in npcs.values() for m in npc["moves"]}
+        blob = json.dumps({"npcs": npcs, "moves": moves, "types": self.type_chart}, sort_keys=True,
+                          separators=(",", ":"))
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def npc(self, key: str) -> NpcInfo:
+        return self.npcs[self.npc_ids[key.lower()]]
+
+    def move(self, name: str) -> MoveInfo:
+        return self.moves[self.move_ids[name]]
+
+
+class DataValidationError(ValueError):
+    """Raised when NPC/move/type data fails ``validate_raw``; ``problems`` lists every issue."""
+
+    def __init__(self, problems: List[str]):
+        super().__init__("; ".join(problems))
+        self.problems = problems
+
+
+def _is_number(v) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def validate_raw(raw_npcs, raw_moves, type_chart=None) -> List[str]:
+    """Return every problem found in the raw JSON (empty list when it is usable)."""
+    problems = []
+    if not isinstance(raw_moves, dict):
+        return ["moves.json must be an object keyed by move name"]
+    if not isinstance(raw_npcs, dict) or not raw_npcs:
+        return ["npcs.json must be a non-empty object keyed by NPC key"]
+    for name, move in raw_moves.items():
+        if not isinstance(move, dict):
+            problems.append(f"move {name}: not an object")
+            continue
+        if move.get("category") not in MOVE_CATEGORIES:
+            problems.append(f"move {name}: category must be one of {MOVE_CATEGORIES}")
+        if not _is_number(move.get("power", 0)) or move.get("power", 0) < 0:
+            problems.append(f"move {name}: power must be a non-negative number")
+        if not isinstance(move.get("priority", 0), int):
+            problems.append(f"move {name}: priority must be an integer")
+        if move.get("type") is not None and not isinstance(move["type"], str):
+            problems.append(f"move {name}: type must be a string")
+        for field, value in move.items():
+            if field.endswith("_chance") and not (_is_number(value) and 0 <= value <= 1):
+                problems.append(f"move {name}: {field} must be between 0 and 1")
+    for key, npc in raw_npcs.items():
+        if not isinstance(npc, dict):
+            problems.append(f"npc {key}: not an object")
+            continue
+        if key != key.lower():
+            problems.append(f"npc {key}: keys must be lowercase")
+        if not isinstance(npc.get("name"), str):
+            problems.append(f"npc {key}: name must be a string")
+        for stat in NPC_STATS:
+            if not _is_number(npc.get(stat)) or npc[stat] < 0:
+                problems.append(f"npc {key}: {stat} must be a non-negative number")
+        if _is_number(npc.get("hp")) and npc["hp"] <= 0:
+            problems.append(f"npc {key}: hp must be positive")
+        level = npc.get("level", 50)
+        if not isinstance(level, int) or isinstance(level, bool) or level < 1:
+            problems.append(f"npc {key}: level must be a positive integer")
+        if npc.get("type") is not None and not isinstance(npc["type"], str):
+            problems.append(f"npc {key}: type must be a string")
+        moves = npc.get("moves")
+        if not isinstance(moves, list) or not moves:
+            problems.append(f"npc {key}: moves must be a non-empty list")
+            continue
+        for m in moves:
+            if not isinstance(m, str):
+                problems.append(f"npc {key}: move names must be strings, got {m!r}")
+            elif m not in raw_moves:
+                problems.append(f"npc {key}: unknown move {m!r}")
+    if type_chart is not None:
+        if not isinstance(type_chart, dict):
+            problems.append("type_chart.json must be an object")
+        else:
+            for attacking, row in type_chart.items():
+                if not isinstance(row, dict) or not all(_is_number(v) and v >= 0 for v in row.values()):
+                    problems.append(f"type chart {attacking}: multipliers must be non-negative numbers")
+    return problems
+
+
+def read_raw_data(npcs_path: str = NPCS_PATH, moves_path: str = MOVES_PATH,
+                  type_chart_path: str = TYPE_CHART_PATH) -> Tuple[Dict, Dict, Optional[Dict]]:
+    with open(npcs_path, "r", encoding="utf-8") as f:
+        npcs = json.load(f)
+    with open(moves_path, "r", encoding="utf-8") as f:
+        moves = json.load(f)
+    type_chart = None
+    if os.path.exists(type_chart_path):
+        with open(type_chart_path, "r", encoding="utf-8") as f:
+            type_chart = json.load(f)
+    return npcs, moves, type_chart
+
+
+def load_game_data(npcs_path: str = NPCS_PATH, moves_path: str = MOVES_PATH,
+                   type_chart_path: str = TYPE_CHART_PATH) -> GameData:
+    return GameData(*read_raw_data(npcs_path, moves_path, type_chart_path))
+
+
+def _source_digest(paths: Tuple[str, ...]) -> str:
+    h = hashlib.sha256(f"{COMPILED_FORMAT}:{ENGINE_VERSION}".encode())
+    # the compiled tables are this module's output, so an edit here (say to damage_formula) rebuilds them
+    with open(__file__, "rb") as f:
+        h.update(f.read())
+    h.update(b"\0")
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                h.update(f.read())
+        except FileNotFoundError:
+            h.update(b"<missing>")
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def write_compiled(data: GameData, digest: str, cache_path: str = COMPILED_PATH):
+    directory = os.path.dirname(cache_path) or "."
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # the digest comes first so a stale file is rejected without unpickling the tables
+            pickle.dump(digest, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load_compiled(npcs_path: str = NPCS_PATH, moves_path: str = MOVES_PATH, type_chart_path: str = TYPE_CHART_PATH,
+                  cache_path: Optional[str] = COMPILED_PATH) -> GameData:
+    """``load_game_data`` through the compiled cache; a missing, stale or unreadable cache is rebuilt.
+
+    The cache is a local build artifact that this process may unpickle, so
+    ``cache_path`` must never point at a file from an untrusted source.
+    """
+    paths = (npcs_path, moves_path, type_chart_path)
+    if not cache_path:
+        return load_game_data(*paths)
+    digest = _source_digest(paths)
+    try:
+        with open(cache_path, "rb") as f:
+            if pickle.load(f) == digest:
+                return pickle.load(f)
+    except Exception:
+        # missing, truncated, or written by classes that have since changed shape: rebuild below
+        pass
+    data = load_game_data(*paths)
+    try:
+        write_compiled(data, digest, cache_path)
+    except OSError:
+        # read-only checkout: run uncached
+        pass
+    return data
+
+
+if __name__ == "__main__":
+    compiled = load_compiled()
+    print(f"compiled data {compiled.version} ({len(compiled.npcs)} NPCs, {len(compiled.moves)} moves) -> "
+          f"{COMPILED_PATH}")
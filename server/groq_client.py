@@ -1,22 +1,204 @@
 # server/groq_client.py
 import os
+import asyncio
+import functools
+import json
+import time
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
 from dotenv import load_dotenv
 
+from .backend import backend_from_env
+from .cache import TieredCache, cache_from_env, make_key
+from .metrics import GROQ_LATENCY, GROQ_REQUESTS
+
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama3-8b-8192")
+# OpenAI-compatible endpoint; point it at a local stub for tests
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "20"))
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "4"))
+
+SYSTEM_PROMPT = "You are a concise assistant helping with game battle analysis."
+
+
+def _payload(prompt: str, model: str, temperature: float, max_tokens: int) -> Dict:
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": temperature,
+        "max_tokens": max_tokens
+    }
+
+
+def completion_key(prompt: str, model: str, temperature: float, max_tokens: int) -> str:
+    # content-addressed: the same prompt to the same model at the same temperature is free
+    return make_key("groq", model, SYSTEM_PROMPT, prompt, temperature, max_tokens)
+
+
+class AsyncGroqClient:
+    """Async Groq chat client with one pooled HTTP connection per event loop.
+
+    At most ``max_concurrency`` requests are in flight; completed answers are
+    cached by ``completion_key`` so repeated narrations never hit the API.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: str = GROQ_BASE_URL,
+                 timeout: float = GROQ_TIMEOUT, max_concurrency: int = GROQ_MAX_CONCURRENCY,
+                 cache: Optional[TieredCache] = None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.requests_sent = 0
+        self._loop = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _session(self):
+        # httpx clients and semaphores are bound to the loop they were first used on
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._loop is not loop:
+            self._loop = loop
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=min(5.0, self.timeout)),
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+                headers={"Authorization": f"Bearer {self.api_key}"},
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._http, self._semaphore
+
+    async def complete(self, prompt: str, model: Optional[str] = None, temperature: float = 0.6,
+                       max_tokens: int = 512) -> str:
+        if not self.api_key:
+            raise RuntimeError("GROQ_API_KEY not set in environment (.env).")
+        model = model or GROQ_MODEL
+        key = completion_key(prompt, model, temperature, max_tokens)
+        if self.cache is not None:
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                GROQ_REQUESTS.inc(mode="complete", outcome="cached")
+                return cached.decode("utf-8")
+
+        http, semaphore = self._session()
+        async with semaphore:
+            self.requests_sent += 1
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                r = await http.post("/chat/completions", json=_payload(prompt, model, temperature, max_tokens))
+                if r.status_code == 200:
+                    outcome = "ok"
+            except httpx.TimeoutException as e:
+                raise RuntimeError(f"Groq API timed out after {self.timeout}s") from e
+            finally:
+                GROQ_LATENCY.observe(time.perf_counter() - start, mode="complete", outcome=outcome)
+                GROQ_REQUESTS.inc(mode="complete", outcome=outcome)
+        if r.status_code != 200:
+            raise RuntimeError(f"Groq API error {r.status_code}: {r.text}")
+        content = r.json()["choices"][0]["message"]["content"]
+        if self.cache is not None:
+            await self.cache.aset(key, content.encode("utf-8"))
+        return content
+
+    async def stream(self, prompt: str, model: Optional[str] = None, temperature: float = 0.6,
+                     max_tokens: int = 512) -> AsyncIterator[str]:
+        """Yield completion text chunks as Groq produces them (OpenAI SSE protocol).
 
-def _groq_sdk_available():
+        A cached answer is yielded in one piece; a fully streamed answer is
+        cached under the same key ``complete`` uses.
+        """
+        if not self.api_key:
+            raise RuntimeError("GROQ_API_KEY not set in environment (.env).")
+        model = model or GROQ_MODEL
+        key = completion_key(prompt, model, temperature, max_tokens)
+        if self.cache is not None:
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                GROQ_REQUESTS.inc(mode="stream", outcome="cached")
+                yield cached.decode("utf-8")
+                return
+
+        http, semaphore = self._session()
+        payload = {**_payload(prompt, model, temperature, max_tokens), "stream": True}
+        parts = []
+        async with semaphore:
+            self.requests_sent += 1
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                async with http.stream("POST", "/chat/completions", json=payload) as r:
+                    if r.status_code != 200:
+                        await r.aread()
+                        raise RuntimeError(f"Groq API error {r.status_code}: {r.text}")
+                    async for line in r.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                        if delta:
+                            parts.append(delta)
+                            yield delta
+                outcome = "ok"
+            finally:
+                # latency covers the whole stream, not just time to first token
+                GROQ_LATENCY.observe(time.perf_counter() - start, mode="stream", outcome=outcome)
+                GROQ_REQUESTS.inc(mode="stream", outcome=outcome)
+        if self.cache is not None:
+            await self.cache.aset(key, "".join(parts).encode("utf-8"))
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+_async_client: Optional[AsyncGroqClient] = None
+
+
+def get_async_client() -> AsyncGroqClient:
+    global _async_client
+    if _async_client is None:
+        # narrations are shared between workers through the result backend too
+        _async_client = AsyncGroqClient(api_key=GROQ_API_KEY, cache=cache_from_env(backend_from_env()))
+    return _async_client
+
+
+async def aquery_groq(prompt: str, model: str = None, max_tokens: int = 512) -> str:
+    """Async, cached counterpart of ``query_groq``; use this from request handlers."""
+    return await get_async_client().complete(prompt, model=model, max_tokens=max_tokens)
+
+
+def astream_groq(prompt: str, model: str = None) -> AsyncIterator[str]:
+    """Token-streamed counterpart of ``aquery_groq``."""
+    return get_async_client().stream(prompt, model=model)
+
+
+@functools.lru_cache(maxsize=1)
+def _groq_sdk_client():
+    # probed once per process; None when the SDK is not installed
     try:
-        from groq import Groq  # noqa: F401
-        return True
+        from groq import Groq
     except Exception:
-        return False
+        return None
+    return Groq(api_key=GROQ_API_KEY)
+
 
 def query_groq(prompt: str, model: str = None) -> str:
     """
     Query Groq for short answers. Tries to use the groq SDK if installed,
     otherwise raises a clear error. Keep prompt concise.
+    Blocking: async callers should use ``aquery_groq``.
     """
     if not GROQ_API_KEY:
         raise RuntimeError("GROQ_API_KEY not set in environment (.env).")
@@ -24,34 +206,16 @@ def query_groq(prompt: str, model: str = None) -> str:
     model = model or GROQ_MODEL
 
     # Prefer SDK if available
-    if _groq_sdk_available():
-        from groq import Groq
-        client = Groq(api_key=GROQ_API_KEY)
-        resp = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a concise assistant helping with game battle analysis."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.6,
-            max_tokens=512
-        )
+    client = _groq_sdk_client()
+    if client is not None:
+        resp = client.chat.completions.create(**_payload(prompt, model, 0.6, 512))
         return resp.choices[0].message.content
 
     # If SDK unavailable, use requests to Groq-compatible endpoint (fallback)
     import requests
-    url = "https://api.groq.com/openai/v1/chat/completions"
+    url = f"{GROQ_BASE_URL.rstrip('/')}/chat/completions"
     headers = {"Authorization": f"Bearer {GROQ_API_KEY}", "Content-Type": "application/json"}
-    payload = {
-        "model": model,
-        "messages": [
-            {"role": "system", "content": "You are a concise assistant helping with game battle analysis."},
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": 0.6,
-        "max_tokens": 512
-    }
-    r = requests.post(url, headers=headers, json=payload, timeout=20)
+    r = requests.post(url, headers=headers, json=_payload(prompt, model, 0.6, 512), timeout=GROQ_TIMEOUT)
     if r.status_code != 200:
         raise RuntimeError(f"Groq API error {r.status_code}: {r.text}")
     j = r.json()
@@ -0,0 +1,477 @@
+# server/http_app.py
+"""FastAPI app: the REST endpoints plus the MCP server mounted at ``/mcp``.
+
+Kept apart from mcp_server.py so stdio mode never imports FastAPI, uvicorn or
+the Groq client. Run it with ``python -m server.mcp_server http``; uvicorn
+imports ``server.http_app:app``. State shared with the MCP tools (the worker
+pool, the result cache, the analytics store) lives in mcp_server and is
+looked up there per request, so main() and tests can swap it.
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import FastAPI, Header, HTTPException, Response
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+
+from . import mcp_server as core
+from .analytics import answer_prompt, simulate_cells_records
+from .battle_cache import battle_key, etag, etag_matches
+from .battle_engine import simulate_battle, stream_battle
+from .coordinator import (MAX_SWEEP_BATTLES, SHARD_TIMEOUT, Coordinator, http_runner, peers_from_env, run_shard,
+                          split_slices)
+from .datastore import STORE
+from .gamedata import DataValidationError
+from .groq_client import aquery_groq, astream_groq, get_async_client
+from .jobs import expand_spec, jobs_from_env
+from .mcp_server import (count_battles, data_watcher_from_env, mcp_server, record_result,
+                         run_analytics_query, run_matrix)
+from .metrics import CONTENT_TYPE, RESULT_CACHE, MetricsMiddleware, render
+from .models import (BattleRequest, BattleResponse, IngestRequest, JobRequest, MatrixRequest, NarrateBatchRequest,
+                     NarrateRequest, RecordRequest, ReplayRequest, ResumeRequest, ShardRequest, SweepRequest,
+                     TeamBattleRequest, TeamBattleResponse)
+from .narration import narrate_batch, narration_prompt
+from .profiler import PROFILER
+from .replay import SnapshotError, fork, record_battle, replay, resume
+from .serialization import JSON, MSGPACK, encode, wants_msgpack
+from .sim_pool import PoolSaturated
+from .team_battle import simulate_team_battle
+
+load_dotenv()
+
+async def run_job_chunk(fn, cells, slices):
+    # looks sim_pool up per call, so jobs follow main() / tests swapping in a new pool
+    rows = await core.sim_pool.run(fn, cells, slices)
+    count_battles("job", sum(r[1] for r in rows), sum(r[3] for r in rows))
+    return rows
+
+# bulk battle jobs, persisted in SQLite (ARENA_JOBS_DB) and resumed at startup
+job_manager = jobs_from_env(run_job_chunk, parallel=core.sim_pool.workers)
+
+def claim_job(job_id: str) -> bool:
+    # with --workers N every worker resumes at startup; the first to claim a job in the shared
+    # backend runs it (keyed by the uvicorn master's pid, so a restarted server claims afresh)
+    if int(os.getenv("ARENA_WORKERS", "1")) <= 1 or core.result_backend is None:
+        return True
+    return bool(core.result_backend.set(f"job-resume:{os.getppid()}:{job_id}", os.getpid(), ex=86400, nx=True))
+
+async def run_sweep_shard(cells, slices):
+    while True:
+        try:
+            rows = await core.sim_pool.run(run_shard, cells, slices)
+            break
+        except PoolSaturated:
+            # interactive requests share the pool; back off rather than failing the shard over
+            await asyncio.sleep(0.05)
+    count_battles("sweep", sum(r[2] for r in rows), sum(r[4] for r in rows))
+    return rows
+
+# Streamable HTTP transport; a fresh manager per app lifespan (run() is single-use)
+session_manager: StreamableHTTPSessionManager = None
+
+async def mcp_app(scope, receive, send):
+    await session_manager.handle_request(scope, receive, send)
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    global session_manager
+    session_manager = StreamableHTTPSessionManager(app=mcp_server)
+    watcher = data_watcher_from_env()
+    job_manager.resume(claim=claim_job)
+    async with session_manager.run():
+        yield
+    # running jobs stay "running" in the store and resume on the next start
+    await job_manager.shutdown()
+    if watcher is not None:
+        watcher.stop()
+    core.close_shared_state()
+    await get_async_client().aclose()
+
+# Create FastAPI app and mount MCP app
+app = FastAPI(title="AI NPC Battle Arena", lifespan=lifespan)
+app.mount("/mcp", mcp_app)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+app.add_middleware(MetricsMiddleware)
+
+@app.get("/")
+async def root():
+    return {"status": "ok", "message": "AI NPC Battle Arena MCP server running."}
+
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy", "service": "AI NPC Battle Arena"}
+
+@app.post("/battle/simulate", response_model=BattleResponse)
+async def battle_simulate_endpoint(req: BattleRequest, accept: Optional[str] = Header(None),
+                                   if_none_match: Optional[str] = Header(None)):
+    # seeded battles are served from result_cache as ready bytes, with an ETag for conditional requests
+    media_type = MSGPACK if wants_msgpack(accept) else JSON
+    version = STORE.current.version
+    key = battle_key(f"http:{media_type}", req.npc_a, req.npc_b, req.level, req.seed, req.max_turns,
+                     req.log_level, version, req.policy_a, req.policy_b, req.depth, req.budget_ms)
+    headers = {"Vary": "Accept"}
+    if key is not None:
+        headers["ETag"] = etag(key)
+        if etag_matches(if_none_match, headers["ETag"]):
+            RESULT_CACHE.inc(outcome="not_modified")
+            return Response(status_code=304, headers=headers)
+        body = await core.result_cache.aget(key)
+        if body is not None:
+            RESULT_CACHE.inc(outcome="hit")
+            return Response(body, media_type=media_type, headers=headers)
+    try:
+        res = await core.sim_pool.run(simulate_battle, req.npc_a, req.npc_b, level=req.level, seed=req.seed,
+                                      max_turns=req.max_turns, log_level=req.log_level, policy_a=req.policy_a,
+                                      policy_b=req.policy_b, depth=req.depth, budget_ms=req.budget_ms)
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    count_battles("single", 1, res["turns"])
+    record_result(res, req.npc_a, req.npc_b, req.level, req.seed, req.max_turns, policy_a=req.policy_a,
+                  policy_b=req.policy_b, depth=req.depth, budget_ms=req.budget_ms)
+    # the engine's dicts already have the BattleResponse shape; encode them without building models
+    body, media_type = encode({"winner": res["winner"], "turns": res["turns"], "data_version": res["data_version"],
+                               "log": res.get("log", []), "actions": res.get("actions", [])}, accept)
+    if key is not None:
+        if res["data_version"] == version:
+            RESULT_CACHE.inc(outcome="miss")
+            await core.result_cache.aset(key, body)
+        else:
+            # a reload that raced the battle changed the data under it; serve the result but do not cache it
+            del headers["ETag"]
+    return Response(body, media_type=media_type, headers=headers)
+
+@app.post("/battle/team", response_model=TeamBattleResponse)
+async def battle_team_endpoint(req: TeamBattleRequest):
+    try:
+        res = await core.sim_pool.run(simulate_team_battle, req.team_a, req.team_b, level=req.level,
+                                      seed=req.seed, max_turns=req.max_turns, log_level=req.log_level)
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Unknown NPC: {e.args[0]}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    count_battles("team", 1, res["turns"])
+    return res
+
+async def _run_replay(fn, *args, **kwargs) -> Dict:
+    try:
+        return await core.sim_pool.run(fn, *args, **kwargs)
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Unknown NPC: {e.args[0]}")
+    except ValueError as e:
+        # SnapshotError included: malformed, or taken on other rules/data
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/battle/record")
+async def battle_record_endpoint(req: RecordRequest):
+    """Simulate a battle and return its result, replay journal and snapshots at ``snapshot_turns``."""
+    res = await _run_replay(record_battle, req.npc_a, req.npc_b, level=req.level, seed=req.seed,
+                            max_turns=req.max_turns, snapshot_turns=req.snapshot_turns, log_level=req.log_level,
+                            policy_a=req.policy_a, policy_b=req.policy_b, depth=req.depth, budget_ms=req.budget_ms)
+    count_battles("record", 1, res["result"]["turns"])
+    return res
+
+@app.post("/battle/resume")
+async def battle_resume_endpoint(req: ResumeRequest):
+    """Continue a snapshot to the end; ``seed``, ``a`` or ``b`` fork it first."""
+    snapshot = req.snapshot
+    if req.seed is not None or req.a or req.b:
+        try:
+            snapshot = fork(snapshot, seed=req.seed, a=req.a, b=req.b)
+        except (SnapshotError, KeyError) as e:
+            raise HTTPException(status_code=422, detail=f"Cannot fork snapshot: {e}")
+    res = await _run_replay(resume, snapshot, log_level=req.log_level, strict=req.strict)
+    count_battles("resume", 1, res["turns"] - res["resumed_from"])
+    return res
+
+@app.post("/battle/replay")
+async def battle_replay_endpoint(req: ReplayRequest):
+    return await _run_replay(replay, req.journal, until_turn=req.until_turn, log_level=req.log_level,
+                             strict=req.strict)
+
+@app.post("/battle/jobs", status_code=202)
+async def battle_jobs_submit(req: JobRequest):
+    """Queue a bulk job; poll ``GET /battle/jobs/{id}`` or stream ``/battle/jobs/{id}/events``."""
+    spec = req.model_dump(exclude={"chunk_size"}, exclude_none=True)
+    try:
+        return await job_manager.submit(spec, chunk_size=req.chunk_size)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Unknown NPC: {e.args[0]}")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.get("/battle/jobs")
+async def battle_jobs_list(limit: int = 50):
+    return {"jobs": await asyncio.to_thread(job_manager.store.list, limit)}
+
+@app.get("/battle/jobs/{job_id}")
+async def battle_job_status(job_id: str):
+    """Progress plus the aggregate of every finished chunk so far."""
+    status = await job_manager.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return status
+
+@app.delete("/battle/jobs/{job_id}")
+async def battle_job_cancel(job_id: str):
+    if await job_manager.status(job_id, include_cells=False) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    if not await job_manager.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Job already finished")
+    return await job_manager.status(job_id, include_cells=False)
+
+@app.get("/battle/jobs/{job_id}/events")
+async def battle_job_events(job_id: str):
+    """Server-sent events: `progress` whenever chunks finish, then `end` with the full aggregate."""
+    if await job_manager.status(job_id, include_cells=False) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+
+    async def events():
+        last = None
+        while True:
+            status = await job_manager.status(job_id, include_cells=False)
+            if status["status"] not in ("queued", "running"):
+                yield _sse("end", await job_manager.status(job_id))
+                return
+            if (status["status"], status["done"]) != last:
+                last = (status["status"], status["done"])
+                yield _sse("progress", status)
+            await job_manager.wait_update(job_id)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/battle/sweep")
+async def battle_sweep_endpoint(req: SweepRequest):
+    """Run a sweep sharded by seed range over this server's pool and ``hosts``; returns the merged aggregate."""
+    spec = req.model_dump(include={"matchups", "sweep"}, exclude_none=True)
+    try:
+        cells = expand_spec(spec)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Unknown NPC: {e.args[0]}")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    total = sum(c["samples"] for c in cells)
+    if total > MAX_SWEEP_BATTLES:
+        raise HTTPException(status_code=422, detail=f"sweep has {total} battles; the limit for one request is "
+                                                    f"{MAX_SWEEP_BATTLES}, submit it to /battle/jobs instead")
+    # shards only ever go to the configured peers, never to a URL taken from the request
+    peers = peers_from_env()
+    hosts = [h.rstrip("/") for h in req.hosts]
+    unknown = [h for h in hosts if h not in peers]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"not a configured peer (--peers): {', '.join(unknown)}")
+    if not req.local and not hosts:
+        raise HTTPException(status_code=422, detail="give 'hosts' or leave 'local' on")
+    async with httpx.AsyncClient(timeout=httpx.Timeout(SHARD_TIMEOUT, connect=5.0)) as client:
+        runners = [run_sweep_shard] * core.sim_pool.workers if req.local else []
+        runners += [http_runner(client, host) for host in hosts for _ in range(req.host_slots)]
+        try:
+            return await Coordinator(runners, core.result_backend).run(cells, shards=req.shards)
+        except RuntimeError:
+            # the runners' errors are logged; they are not echoed to the client
+            logging.exception("Sweep failed")
+            raise HTTPException(status_code=502, detail="sweep could not finish: every runner failed")
+
+@app.post("/battle/shard")
+async def battle_shard_endpoint(req: ShardRequest):
+    """Run one shard for a coordinator: rows of [cell, seed offset, battles, wins_a, turns, data_version]."""
+    try:
+        cells = expand_spec({"matchups": [c.model_dump() for c in req.cells]})
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Unknown NPC: {e.args[0]}")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    for index, offset, count in req.slices:
+        if not 0 <= index < len(cells) or offset < 0 or count < 1 or offset + count > cells[index]["samples"]:
+            raise HTTPException(status_code=422, detail=f"slice {[index, offset, count]} is outside its cell")
+    try:
+        # spread the shard over this host's pool; merge() accepts the finer seed ranges
+        parts = await asyncio.gather(*(core.sim_pool.run(run_shard, cells, group)
+                                       for group in split_slices(req.slices, core.sim_pool.workers)))
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    rows = [row for part in parts for row in part]
+    count_battles("shard", sum(r[2] for r in rows), sum(r[4] for r in rows))
+    return {"rows": rows}
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.get("/battle/stream")
+async def battle_stream_endpoint(npc_a: str, npc_b: str, level: int = 50, seed: int = None, max_turns: int = 200,
+                                 policy_a: str = "greedy", policy_b: str = "greedy", log_level: str = "full"):
+    """Server-sent events: one `start`, one `turn` per simulated turn, then `end`."""
+    try:
+        events = stream_battle(npc_a, npc_b, level=level, seed=seed, max_turns=max_turns, policy_a=policy_a,
+                               policy_b=policy_b, log_level=log_level)
+        first = next(events)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Unknown NPC: {e.args[0]}")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        # the stream holds a pool slot until the battle ends or the client goes away
+        steps = core.sim_pool.stream(events)
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+    async def body():
+        try:
+            yield _sse(first["type"], first)
+            async for event in steps:
+                if event["type"] == "turn":
+                    count_battles("stream", 0, 1)
+                elif event["type"] == "end":
+                    count_battles("stream", 1, 0)
+                yield _sse(event["type"], event)
+        finally:
+            await steps.aclose()
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.post("/ai/narrate/stream")
+async def narrate_stream_endpoint(req: NarrateRequest):
+    """Server-sent events: `token` chunks as Groq generates them, then `end`."""
+    async def body():
+        try:
+            async for chunk in astream_groq(narration_prompt(req.model_dump(), req.style, req.budget_tokens)):
+                yield _sse("token", {"text": chunk})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+        yield _sse("end", {})
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.post("/ai/narrate/batch")
+async def narrate_batch_endpoint(req: NarrateBatchRequest):
+    """One narration per battle; battles are digested and packed ``batch_size`` to a Groq request."""
+    try:
+        return await narrate_batch([b.model_dump() for b in req.battles], aquery_groq, req.style, req.budget_tokens,
+                                   req.batch_size)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def encoded_response(payload: Any, accept: Optional[str]) -> Response:
+    """Compact JSON, or MessagePack for ``Accept: application/msgpack``."""
+    body, media_type = encode(payload, accept)
+    return Response(body, media_type=media_type, headers={"Vary": "Accept"})
+
+@app.post("/battle/matrix")
+async def battle_matrix_endpoint(req: MatrixRequest, accept: Optional[str] = Header(None)):
+    try:
+        return encoded_response(await run_matrix(npcs=req.npcs, levels=req.levels, samples=req.samples,
+                                                 seed=req.seed, max_turns=req.max_turns), accept)
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Unknown NPC: {e.args[0]}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/analytics/{kind}")
+async def analytics_endpoint(kind: str, npc: str = None, npc_a: str = None, npc_b: str = None, opponent: str = None,
+                             move: str = None, level: int = None, data_version: str = None, limit: int = 50,
+                             accept: Optional[str] = Header(None)):
+    """Aggregates over recorded battles; ``kind`` is win_rate, move_damage, status_procs or summary."""
+    filters = {"npc": npc, "npc_a": npc_a, "npc_b": npc_b, "opponent": opponent, "move": move, "level": level,
+               "data_version": data_version}
+    try:
+        result = await asyncio.to_thread(run_analytics_query, {"query": kind, "limit": limit, **filters})
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return encoded_response(result, accept)
+
+@app.post("/analytics/ingest")
+async def analytics_ingest_endpoint(req: IngestRequest):
+    """Simulate a seeded sweep (like /battle/matrix) and store every battle for analytics."""
+    data = STORE.current
+    npcs = [k.lower() for k in (req.npcs or list(data.npc_ids))]
+    for k in npcs:
+        if k not in data.npc_ids:
+            raise HTTPException(status_code=404, detail=f"Unknown NPC: {k}")
+    specs = [{"npc_a": a, "npc_b": b, "level": level, "seed": req.seed, "samples": req.samples,
+              "max_turns": req.max_turns} for level in req.levels for a in npcs for b in npcs]
+    groups = [specs[i::core.sim_pool.workers] for i in range(min(core.sim_pool.workers, len(specs)))]
+    try:
+        chunks = await asyncio.gather(*(core.sim_pool.run(simulate_cells_records, g) for g in groups))
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    records = [r for chunk in chunks for r in chunk]
+    await asyncio.to_thread(core.analytics.add, records)
+    count_battles("ingest", len(records), sum(battle[6] for battle, _ in records))
+    return {"battles": len(records), "actions": sum(len(actions) for _, actions in records)}
+
+@app.post("/ai/query")
+async def ai_query_endpoint(question: str):
+    """Answer an analytics question: SQL computes the numbers, Groq only phrases them."""
+    try:
+        result = await asyncio.to_thread(run_analytics_query, {"question": question})
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        answer = await aquery_groq(answer_prompt(question, result))
+    except Exception as e:
+        # the numbers are still useful without the prose
+        return {"answer": None, "error": str(e), **result}
+    return {"answer": answer, **result}
+
+@app.get("/admin/data")
+async def data_info():
+    return STORE.info()
+
+@app.post("/admin/data/reload")
+async def data_reload():
+    """Re-read npcs.json / moves.json / type_chart.json; battles already running keep their snapshot."""
+    previous = STORE.current.version
+    try:
+        await asyncio.to_thread(STORE.reload)
+    except DataValidationError as e:
+        raise HTTPException(status_code=422, detail={"message": "data rejected", "problems": e.problems})
+    return {**STORE.info(), "previous_version": previous}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text exposition of latency histograms, simulation counters and pool depth."""
+    return Response(render(), media_type=CONTENT_TYPE)
+
+@app.post("/debug/profiler/start")
+async def profiler_start(interval_ms: float = 5.0, reset: bool = True):
+    """Start the sampling profiler (see server/profiler.py); cheap enough to leave on briefly in production."""
+    if interval_ms <= 0:
+        raise HTTPException(status_code=422, detail="interval_ms must be positive")
+    if reset:
+        PROFILER.reset()
+    PROFILER.interval = interval_ms / 1000
+    PROFILER.start()
+    return PROFILER.report(top=0)
+
+@app.post("/debug/profiler/stop")
+async def profiler_stop(top: int = 20):
+    PROFILER.stop()
+    return PROFILER.report(top=top)
+
+@app.get("/debug/profiler")
+async def profiler_report(top: int = 20):
+    return PROFILER.report(top=top)
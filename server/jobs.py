@@ -0,0 +1,396 @@
+# server/jobs.py
+"""Bulk battle jobs: submit a large sweep, poll or stream its progress.
+
+A job is a list of cells, each ``samples`` seeded battles of ``npc_a`` vs
+``npc_b`` at one level with seeds ``seed .. seed + samples - 1`` (the same
+cells as the matrix). It comes either from a ``matchups`` list or from a
+``sweep`` spec that expands to every ordered pair of NPCs at every level.
+
+The battles are cut into chunks of ``chunk_size``; chunks run through the
+simulation pool, at most ``parallel`` at a time across all jobs. Each finished
+chunk's per-cell partial counts are written to SQLite in the same transaction
+that advances the job's progress and adds them to the job's running totals,
+so a status poll reads one row however many chunks have finished, and a
+restarted server (``JobManager.resume``) runs only the chunks that are
+missing. Store calls run in a thread so SQLite never blocks the event loop. The cells are expanded once at submission and stored with
+the job, and the chunk plan is a pure function of the cells and the chunk
+size, so a resumed job (even after a data reload that added NPCs) runs
+exactly the battles an uninterrupted run would have.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .datastore import current_data
+from .matrix import simulate_cell
+from .sim_pool import PoolSaturated
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ("queued", "running", "done", "failed", "cancelled")
+MAX_BATTLES = 10_000_000
+
+# (cell index, offset into the cell's seeds, battles)
+Slice = Tuple[int, int, int]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    spec TEXT NOT NULL,
+    cells TEXT NOT NULL,
+    status TEXT NOT NULL,
+    chunk_size INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    error TEXT,
+    totals TEXT
+);
+CREATE TABLE IF NOT EXISTS job_chunks (
+    job_id TEXT NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    chunk INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (job_id, chunk)
+);
+"""
+
+
+def expand_spec(spec: Dict) -> List[Dict]:
+    """Cells of a job spec; raises KeyError for unknown NPCs and ValueError for bad specs."""
+    data = current_data()
+    if bool(spec.get("matchups")) == bool(spec.get("sweep")):
+        raise ValueError("give exactly one of 'matchups' or 'sweep'")
+    if spec.get("sweep"):
+        sweep = spec["sweep"]
+        npcs = [k.lower() for k in (sweep.get("npcs") or list(data.npc_ids))]
+        cells = [{"npc_a": a, "npc_b": b, "level": level, "seed": sweep.get("seed", 0),
+                  "samples": sweep.get("samples", 100), "max_turns": sweep.get("max_turns", 200)}
+                 for level in sweep.get("levels") or [50] for a in npcs for b in npcs]
+    else:
+        cells = [{"npc_a": m["npc_a"].lower(), "npc_b": m["npc_b"].lower(), "level": m.get("level", 50),
+                  "seed": m.get("seed", 0), "samples": m.get("samples", 1), "max_turns": m.get("max_turns", 200)}
+                 for m in spec["matchups"]]
+    for cell in cells:
+        for key in (cell["npc_a"], cell["npc_b"]):
+            if key not in data.npc_ids:
+                raise KeyError(key)
+        if cell["samples"] < 1:
+            raise ValueError("samples must be at least 1")
+    total = sum(c["samples"] for c in cells)
+    if total > MAX_BATTLES:
+        raise ValueError(f"job has {total} battles; the limit is {MAX_BATTLES}")
+    return cells
+
+
+def plan_chunks(cells: Sequence[Dict], chunk_size: int) -> List[List[Slice]]:
+    chunks: List[List[Slice]] = []
+    current: List[Slice] = []
+    room = chunk_size
+    for index, cell in enumerate(cells):
+        offset = 0
+        while offset < cell["samples"]:
+            take = min(room, cell["samples"] - offset)
+            current.append((index, offset, take))
+            offset += take
+            room -= take
+            if room == 0:
+                chunks.append(current)
+                current, room = [], chunk_size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def run_chunk(cells: Sequence[Dict], slices: Sequence[Slice]) -> List[List]:
+    """Pool task: [cell index, battles, wins_a, total turns, data_version] per slice."""
+    out = []
+    for index, offset, count in slices:
+        cell = cells[index]
+        res = simulate_cell({**cell, "seed": cell["seed"] + offset, "samples": count})
+        out.append([index, count, res["wins_a"], round(res["mean_turns"] * count), res["data_version"]])
+    return out
+
+
+def _empty_totals(n_cells: int) -> Dict:
+    # per cell [battles, wins_a, total turns], plus the data versions and chunks seen
+    return {"counts": [[0, 0, 0] for _ in range(n_cells)], "versions": [], "chunks": 0}
+
+
+def _add_rows(totals: Dict, rows: Sequence[List]):
+    for index, battles, wins_a, turns, version in rows:
+        c = totals["counts"][index]
+        c[0] += battles
+        c[1] += wins_a
+        c[2] += turns
+        if version not in totals["versions"]:
+            totals["versions"].append(version)
+    totals["chunks"] += 1
+
+
+def _tally(cells: Sequence[Dict], chunk_results: Iterable[Sequence[List]]) -> Dict:
+    totals = _empty_totals(len(cells))
+    for rows in chunk_results:
+        _add_rows(totals, rows)
+    return totals
+
+
+def aggregate(cells: Sequence[Dict], chunk_results: Sequence[Sequence[List]]) -> Dict:
+    return _summarize(cells, _tally(cells, chunk_results))
+
+
+def _summarize(cells: Sequence[Dict], totals: Dict) -> Dict:
+    counts, versions = totals["counts"], totals["versions"]
+    out = []
+    for cell, (battles, wins_a, turns) in zip(cells, counts):
+        out.append({**cell, "battles": battles, "wins_a": wins_a, "wins_b": battles - wins_a,
+                    "win_rate_a": wins_a / battles if battles else None,
+                    "mean_turns": turns / battles if battles else None})
+    return {"cells": out, "data_versions": sorted(versions)}
+
+
+class JobStore:
+    """SQLite persistence; one connection shared under a lock."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # opened lazily so importing the server never creates the database file
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if columns and "totals" not in columns:
+                # stores written before running totals existed; add_chunk rebuilds them from the chunks
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN totals TEXT")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def create(self, job_id: str, spec: Dict, cells: List[Dict], chunk_size: int):
+        now = time.time()
+        total = sum(c["samples"] for c in cells)
+        with self._lock:
+            self.conn.execute("INSERT INTO jobs (id, spec, cells, status, chunk_size, total, created_at, updated_at, "
+                              "totals) VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?)",
+                              (job_id, json.dumps(spec), json.dumps(cells), chunk_size, total, now, now,
+                               json.dumps(_empty_totals(len(cells)))))
+
+    def add_chunk(self, job_id: str, chunk: int, rows: List[List], battles: int):
+        with self._lock:
+            conn = self.conn
+            # IMMEDIATE: the totals are read and written back, and other processes may share the file
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("INSERT OR IGNORE INTO job_chunks (job_id, chunk, result) VALUES (?, ?, ?)",
+                             (job_id, chunk, json.dumps(rows)))
+                if conn.execute("SELECT changes()").fetchone()[0]:
+                    cells, totals = conn.execute("SELECT cells, totals FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                    if totals is None:
+                        totals = _tally(json.loads(cells), (json.loads(r) for r, in conn.execute(
+                            "SELECT result FROM job_chunks WHERE job_id = ?", (job_id,))))
+                    else:
+                        totals = json.loads(totals)
+                        _add_rows(totals, rows)
+                    conn.execute("UPDATE jobs SET done = done + ?, totals = ?, updated_at = ? WHERE id = ?",
+                                 (battles, json.dumps(totals), time.time(), job_id))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None,
+                   unless: Sequence[str] = ()) -> bool:
+        """Set the status unless it is currently one of ``unless`` (e.g. a concurrent cancel); False if not."""
+        marks = ", ".join("?" * len(unless))
+        with self._lock:
+            return self.conn.execute(f"UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?"
+                                     f"{f' AND status NOT IN ({marks})' if unless else ''}",
+                                     (status, error, time.time(), job_id, *unless)).rowcount > 0
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self.conn.execute("SELECT id, spec, cells, status, chunk_size, total, done, created_at, updated_at, "
+                                    "error, totals FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "spec", "cells", "status", "chunk_size", "total", "done", "created_at", "updated_at", "error",
+                "totals")
+        job = dict(zip(keys, row))
+        job["spec"] = json.loads(job["spec"])
+        job["cells"] = json.loads(job["cells"])
+        if job["totals"] is None:
+            # an older store whose job has not finished a chunk since: tally what is there
+            job["totals"] = _tally(job["cells"], self.chunks(job_id).values())
+        else:
+            job["totals"] = json.loads(job["totals"])
+        return job
+
+    def get_status(self, job_id: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def chunk_ids(self, job_id: str) -> List[int]:
+        with self._lock:
+            return [r[0] for r in self.conn.execute("SELECT chunk FROM job_chunks WHERE job_id = ?", (job_id,))]
+
+    def chunks(self, job_id: str) -> Dict[int, List[List]]:
+        with self._lock:
+            rows = self.conn.execute("SELECT chunk, result FROM job_chunks WHERE job_id = ?", (job_id,)).fetchall()
+        return {chunk: json.loads(result) for chunk, result in rows}
+
+    def list(self, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            rows = self.conn.execute("SELECT id, status, total, done, created_at, updated_at FROM jobs "
+                                     "ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        keys = ("id", "status", "total", "done", "created_at", "updated_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def unfinished(self) -> List[str]:
+        with self._lock:
+            rows = self.conn.execute("SELECT id FROM jobs WHERE status IN ('queued', 'running') "
+                                     "ORDER BY created_at").fetchall()
+        return [r[0] for r in rows]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class JobManager:
+    """Runs jobs on the event loop; ``run`` is an async executor hook such as ``SimulationPool.run``."""
+
+    def __init__(self, path: str, run: Callable[..., Awaitable], chunk_size: int = 2000, parallel: int = 2):
+        self.store = JobStore(path)
+        self.run = run
+        self.chunk_size = chunk_size
+        self.parallel = parallel
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._updates: Dict[str, asyncio.Event] = {}
+
+    async def submit(self, spec: Dict, chunk_size: Optional[int] = None) -> Dict:
+        """Validate and persist a job, then start it."""
+        cells = expand_spec(spec)
+        job_id = uuid.uuid4().hex[:16]
+        await asyncio.to_thread(self.store.create, job_id, spec, cells, chunk_size or self.chunk_size)
+        self._start(job_id)
+        return await self.status(job_id, include_cells=False)
+
+    def resume(self, claim: Optional[Callable[[str], bool]] = None) -> List[str]:
+        """Restart every queued or running job found in the store (call at startup).
+
+        With several processes sharing the store, ``claim(job_id)`` must be true
+        in exactly one of them for each job; the others leave it alone.
+        """
+        ids = [job_id for job_id in self.store.unfinished()
+               if job_id not in self._tasks and (claim is None or claim(job_id))]
+        for job_id in ids:
+            self._start(job_id)
+        if ids:
+            logger.info("Resuming %d unfinished battle job(s)", len(ids))
+        return ids
+
+    def _start(self, job_id: str):
+        self._tasks[job_id] = asyncio.get_running_loop().create_task(self._run_job(job_id))
+
+    def _notify(self, job_id: str):
+        event = self._updates.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _run_chunk(self, job_id: str, index: int, cells: List[Dict], slices: List[Slice]):
+        async with self._slots:
+            if await asyncio.to_thread(self.store.get_status, job_id) == "cancelled":
+                # cancelled through another worker process sharing the store
+                return
+            while True:
+                try:
+                    rows = await self.run(run_chunk, cells, slices)
+                    break
+                except PoolSaturated:
+                    # interactive requests share the pool; back off instead of failing the job
+                    await asyncio.sleep(0.05)
+        await asyncio.to_thread(self.store.add_chunk, job_id, index, rows, sum(s[2] for s in slices))
+        self._notify(job_id)
+
+    async def _run_job(self, job_id: str):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.parallel)
+        store = self.store
+        try:
+            job = await asyncio.to_thread(store.get, job_id)
+            cells = job["cells"]
+            done = set(await asyncio.to_thread(store.chunk_ids, job_id))
+            plan = plan_chunks(cells, job["chunk_size"])
+            # a cancel may land while this task is starting; never overwrite it
+            await asyncio.to_thread(store.set_status, job_id, "running", unless=("cancelled",))
+            await asyncio.gather(*(self._run_chunk(job_id, i, cells, slices)
+                                   for i, slices in enumerate(plan) if i not in done))
+            await asyncio.to_thread(store.set_status, job_id, "done", unless=("cancelled",))
+        except asyncio.CancelledError:
+            # shutdown leaves the job "running" so resume() picks it up; cancel() marks it first
+            raise
+        except Exception as e:
+            logger.exception("Battle job %s failed", job_id)
+            await asyncio.to_thread(store.set_status, job_id, "failed", str(e), unless=("cancelled",))
+        finally:
+            self._tasks.pop(job_id, None)
+            self._notify(job_id)
+
+    async def cancel(self, job_id: str) -> bool:
+        if not await asyncio.to_thread(self.store.set_status, job_id, "cancelled",
+                                       unless=("done", "failed", "cancelled")):
+            return False
+        task = self._tasks.pop(job_id, None)
+        if task is not None:
+            task.cancel()
+        self._notify(job_id)
+        return True
+
+    async def status(self, job_id: str, include_cells: bool = True) -> Optional[Dict]:
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None:
+            return None
+        out = {k: job[k] for k in ("id", "status", "total", "done", "chunk_size", "created_at", "updated_at", "error")}
+        out["progress"] = job["done"] / job["total"] if job["total"] else 1.0
+        if include_cells:
+            # the running totals kept by add_chunk; no chunk is re-read
+            out["chunks_done"] = job["totals"]["chunks"]
+            out.update(_summarize(job["cells"], job["totals"]))
+        return out
+
+    async def wait_update(self, job_id: str, timeout: float = 1.0):
+        """Block until a chunk of ``job_id`` finishes or its status changes, or ``timeout`` passes."""
+        event = self._updates.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def shutdown(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self.store.close()
+
+
+def jobs_from_env(run: Callable[..., Awaitable], parallel: int) -> JobManager:
+    # main() exports --jobs-db here so uvicorn's re-import of the app sees it
+    return JobManager(os.getenv("ARENA_JOBS_DB", "arena_jobs.sqlite3"), run,
+                      chunk_size=int(os.getenv("ARENA_JOB_CHUNK", "2000")), parallel=parallel)
@@ -0,0 +1,111 @@
+# server/matrix.py
+"""Round-robin win-rate matrix with per-cell memoization.
+
+A cell is ``samples`` seeded battles of ``npc_a`` vs ``npc_b`` at one level,
+using seeds ``seed .. seed + samples - 1``. Each cell is cached under a key
+made of its parameters, ``ENGINE_VERSION`` and the fingerprint of only the
+NPCs and moves it involves, so editing one move invalidates just the cells
+whose NPCs know that move. A cell computed on a different data snapshot than
+the one the matrix started with (a reload raced it) is returned but not cached.
+"""
+import asyncio
+import random
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from .battle_engine import ENGINE_VERSION, build_combatant, run_battle
+from .cache import TieredCache, make_key
+from .datastore import current_data
+from .gamedata import GameData
+
+CellSpec = Dict[str, Any]
+
+
+def cell_key(spec: CellSpec, data: Optional[GameData] = None) -> str:
+    fingerprint = (data or current_data()).matchup_fingerprint(spec["npc_a"], spec["npc_b"])
+    return make_key("matrix-cell", ENGINE_VERSION, fingerprint, spec)
+
+
+def simulate_cell(spec: CellSpec) -> Dict:
+    data = current_data()
+    wins_a = 0
+    total_turns = 0
+    for s in range(spec["seed"], spec["seed"] + spec["samples"]):
+        a = build_combatant(spec["npc_a"], spec["level"], data)
+        b = build_combatant(spec["npc_b"], spec["level"], data)
+        total_turns += run_battle(a, b, random.Random(s), spec["max_turns"])
+        wins_a += a.hp > 0
+    return {
+        **spec,
+        "wins_a": wins_a,
+        "wins_b": spec["samples"] - wins_a,
+        "win_rate_a": wins_a / spec["samples"],
+        "mean_turns": total_turns / spec["samples"],
+        "data_version": data.version,
+    }
+
+
+def simulate_cells(specs: Sequence[CellSpec]) -> List[Dict]:
+    # one pool task per chunk of cells keeps the matrix within the pool's queue limit
+    return [simulate_cell(spec) for spec in specs]
+
+
+async def compute_matrix(run: Callable[..., Awaitable], cache: Optional[TieredCache],
+                         npcs: Optional[List[str]] = None, levels: Sequence[int] = (50,),
+                         samples: int = 100, seed: int = 0, max_turns: int = 200,
+                         chunks: int = 1) -> Dict:
+    """Compute the N x N matrix for every level.
+
+    ``run`` is an async executor hook such as ``SimulationPool.run``; uncached
+    cells are split into at most ``chunks`` tasks that run in parallel.
+    """
+    data = current_data()
+    npcs = [k.lower() for k in (npcs or list(data.npc_ids))]
+    for k in npcs:
+        if k not in data.npc_ids:
+            raise KeyError(k)
+
+    specs = [
+        {"npc_a": a, "npc_b": b, "level": level, "seed": seed, "samples": samples, "max_turns": max_turns}
+        for level in levels for a in npcs for b in npcs
+    ]
+    results: Dict[int, Dict] = {}
+    missing: List[int] = []
+    # one trip off the loop for every lookup: the shared tier may be a file, SQLite or Redis
+    found = (await asyncio.to_thread(lambda: [cache.get_json(cell_key(spec, data)) for spec in specs])
+             if cache is not None else [None] * len(specs))
+    for i, cached in enumerate(found):
+        if cached is None:
+            missing.append(i)
+        else:
+            results[i] = cached
+
+    if missing:
+        n_chunks = max(1, min(chunks, len(missing)))
+        groups = [missing[c::n_chunks] for c in range(n_chunks)]
+        computed = await asyncio.gather(*(run(simulate_cells, [specs[i] for i in g]) for g in groups))
+        fresh = []
+        for group, cells in zip(groups, computed):
+            for i, cell in zip(group, cells):
+                results[i] = cell
+                if cell["data_version"] == data.version:
+                    fresh.append((cell_key(specs[i], data), cell))
+        if cache is not None and fresh:
+            await asyncio.to_thread(lambda: [cache.set_json(key, cell) for key, cell in fresh])
+
+    n = len(npcs)
+    win_rates = {}
+    for li, level in enumerate(levels):
+        base = li * n * n
+        win_rates[str(level)] = [[results[base + r * n + c]["win_rate_a"] for c in range(n)] for r in range(n)]
+    return {
+        "npcs": npcs,
+        "levels": list(levels),
+        "samples": samples,
+        "seed": seed,
+        "max_turns": max_turns,
+        "data_version": data.version,
+        "win_rates": win_rates,
+        "cells": [results[i] for i in range(len(specs))],
+        "cache_hits": len(specs) - len(missing),
+        "computed": len(missing),
+    }
@@ -1,31 +1,120 @@
 # server/mcp_server.py
+"""MCP server: the battle tools, the state they share with the HTTP API, and the CLI.
+
+``python -m server.mcp_server stdio`` imports only this module, the MCP SDK
+and the engine; FastAPI, uvicorn and the Groq client load only in http mode
+(server/http_app.py) or on the first narration. ``app`` is still importable
+from here for callers that expect it.
+"""
 import os
+import json
 import argparse
+import asyncio
 import logging
+import time
 from typing import Any, Dict, List
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
-import uvicorn
 
 # MCP imports
 from mcp.server import Server
-from mcp.server.fastapi import create_app
-from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 
 # Local imports (use relative imports)
-from .battle_engine import simulate_battle
-from .groq_client import query_groq
-from .models import BattleRequest, BattleResponse, BattleAction
+from .battle_engine import simulate_battle, stream_battle
+from .policies import POLICY_NAMES
+from .battle_log import LOG_LEVELS
+from .analytics import QUERY_FILTERS, analytics_from_env, parse_question, replay_key
+from .backend import backend_from_env
+from .battle_cache import battle_key
+from .cache import cache_from_env
+from .datastore import STORE, DataWatcher
+from .gamedata import compiled_path_from_env
+from .matrix import compute_matrix
+from .metrics import MCP_TOOL_LATENCY, REGISTRY, RESULT_CACHE, SIM_BATTLES, SIM_TURNS
+from .narration import narrate_batch, narration_prompt
+from .serialization import dumps
+from .sim_pool import POOL_KINDS, PoolSaturated, pool_from_env
+from .team_battle import simulate_team_battle
 
 # Patch logging for Uvicorn bug on Python 3.11
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
-load_dotenv()
 
 # Create MCP Server
 mcp_server = Server("ai-npc-battle-arena")
 
+# CPU-bound simulations run here, never on the event loop
+sim_pool = pool_from_env()
+
+# read at scrape time, so they follow main() swapping in a new pool
+REGISTRY.gauge("arena_sim_pool_pending", "Simulations running or queued", fn=lambda: sim_pool.pending)
+REGISTRY.gauge("arena_sim_pool_capacity", "Simulations allowed in flight before 503", fn=lambda: sim_pool.capacity)
+
+# worker processes hold their own copy of the game data; replace them after a reload
+STORE.subscribe(lambda old, new: sim_pool.recycle())
+
+# results shared by every worker process and host (ARENA_RESULT_BACKEND: sqlite:PATH or redis://; unset: none)
+result_backend = backend_from_env()
+
+# memoized matrix cells and seeded battle responses (memory LRU, plus the shared backend or ARENA_CACHE_DIR)
+result_cache = cache_from_env(result_backend)
+
+# battle outcomes and actions for the analytics queries (SQLite, ARENA_ANALYTICS_DB)
+analytics = analytics_from_env()
+
+def close_shared_state():
+    """Stop the pool and close the result backend and analytics store (on exit, or before replacing them)."""
+    sim_pool.shutdown(wait=False)
+    if result_backend is not None:
+        result_backend.close()
+    analytics.close()
+
+def count_battles(kind: str, battles: int, turns: int):
+    SIM_BATTLES.inc(battles, kind=kind)
+    SIM_TURNS.inc(turns, kind=kind)
+
+def record_result(result: Dict, npc_a: str, npc_b: str, level: int, seed, max_turns: int = 200, **policy):
+    try:
+        # replays of a seeded battle share one key, so the store counts the battle once
+        key = replay_key(npc_a, npc_b, level, seed, max_turns, result["data_version"], **policy)
+        analytics.record(result, npc_a, npc_b, level, seed, key=key)
+    except Exception:
+        # analytics must never fail the battle request itself
+        logging.exception("Could not record battle for analytics")
+
+async def run_matrix(npcs=None, levels=(50,), samples=100, seed=0, max_turns=200) -> Dict:
+    async def run_cells(fn, specs):
+        # only cells that miss the cache reach here, so cached cells are not counted twice
+        cells = await sim_pool.run(fn, specs)
+        count_battles("matrix", sum(c["samples"] for c in cells),
+                      sum(round(c["mean_turns"] * c["samples"]) for c in cells))
+        return cells
+
+    return await compute_matrix(run_cells, result_cache, npcs=npcs, levels=levels, samples=samples,
+                                seed=seed, max_turns=max_turns, chunks=sim_pool.workers)
+
+POLICY_ARGS = ("policy_a", "policy_b", "depth", "budget_ms")
+POLICY_SCHEMA = {
+    "policy_a": {"type": "string", "enum": list(POLICY_NAMES), "default": "greedy",
+                 "description": "Move policy for npc_a (expectiminimax: lookahead search)"},
+    "policy_b": {"type": "string", "enum": list(POLICY_NAMES), "default": "greedy",
+                 "description": "Move policy for npc_b"},
+    "depth": {"type": "integer", "minimum": 1, "maximum": 8, "description": "Search depth in turns (default 3)"},
+    "budget_ms": {"type": "number", "minimum": 0, "maximum": 1000,
+                  "description": "Time budget per search decision in ms (default 50; 0 = unlimited, reproducible)"},
+}
+
+# structured fields a narration request may carry besides the text log (see narration.battle_digest)
+NARRATE_BATTLE_PROPS = {
+    "actions": {"type": "array", "items": {"type": "object"},
+                "description": "Structured actions from a simulate result"},
+    "winner": {"type": "string"},
+    "turns": {"type": "integer"},
+}
+
+def _progress_token():
+    # MCP clients opt into streaming by sending a progressToken with the request
+    meta = mcp_server.request_context.meta
+    return meta.progressToken if meta is not None else None
+
 @mcp_server.list_tools()
 async def list_tools() -> List[Tool]:
     """List available tools for MCP clients."""
@@ -40,7 +129,14 @@ async def list_tools() -> List[Tool]:
                     "npc_b": {"type": "string", "description": "Second NPC key"},
                     "level": {"type": "integer", "description": "NPC level", "default": 50},
                     "seed": {"type": "integer", "description": "Random seed for reproducibility"},
-                    "max_turns": {"type": "integer", "description": "Maximum turns", "default": 200}
+                    "max_turns": {"type": "integer", "description": "Maximum turns", "default": 200},
+                    "log_level": {
+                        "type": "string",
+                        "enum": list(LOG_LEVELS),
+                        "description": "none: winner/turns only, actions: structured actions, full: actions + text log",
+                        "default": "full"
+                    },
+                    **POLICY_SCHEMA
                 },
                 "required": ["npc_a", "npc_b"]
             }
@@ -52,9 +148,83 @@ async def list_tools() -> List[Tool]:
                 "type": "object",
                 "properties": {
                     "battle_log": {"type": "array", "items": {"type": "string"}, "description": "Battle log lines"},
-                    "style": {"type": "string", "description": "Narration style", "default": "neutral"}
+                    **NARRATE_BATTLE_PROPS,
+                    "style": {"type": "string", "description": "Narration style", "default": "neutral"},
+                    "budget_tokens": {"type": "integer", "minimum": 20, "maximum": 4000,
+                                      "description": "Token budget for the battle digest sent to Groq"}
+                }
+            }
+        ),
+        Tool(
+            name="narrate_battles_with_groq",
+            description="Narrate several battles, packing them into as few Groq requests as possible",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "battles": {"type": "array", "minItems": 1, "maxItems": 100,
+                                "items": {"type": "object", "properties": {
+                                    "battle_log": {"type": "array", "items": {"type": "string"}},
+                                    **NARRATE_BATTLE_PROPS}},
+                                "description": "Simulate results (or their log / actions / winner)"},
+                    "style": {"type": "string", "description": "Narration style", "default": "neutral"},
+                    "budget_tokens": {"type": "integer", "minimum": 20, "maximum": 4000},
+                    "batch_size": {"type": "integer", "minimum": 1, "maximum": 20,
+                                   "description": "Battles per Groq request"}
                 },
-                "required": ["battle_log"]
+                "required": ["battles"]
+            }
+        ),
+        Tool(
+            name="team_battle_tool",
+            description="Simulate an N vs M team battle (turn order by move priority, then speed)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "team_a": {"type": "array", "items": {"type": "string"}, "minItems": 1, "maxItems": 100,
+                               "description": "NPC keys on team A (repeats allowed)"},
+                    "team_b": {"type": "array", "items": {"type": "string"}, "minItems": 1, "maxItems": 100,
+                               "description": "NPC keys on team B (repeats allowed)"},
+                    "level": {"type": "integer", "description": "NPC level", "default": 50},
+                    "seed": {"type": "integer", "description": "Random seed for reproducibility"},
+                    "max_turns": {"type": "integer", "description": "Maximum turns", "default": 200},
+                    "log_level": {"type": "string", "enum": list(LOG_LEVELS), "default": "none"}
+                },
+                "required": ["team_a", "team_b"]
+            }
+        ),
+        Tool(
+            name="battle_matrix_tool",
+            description="Round-robin win-rate matrix (row NPC vs column NPC) for one or more levels",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "npcs": {"type": "array", "items": {"type": "string"}, "description": "NPC keys (default: all)"},
+                    "levels": {"type": "array", "items": {"type": "integer"}, "description": "Levels", "default": [50]},
+                    "samples": {"type": "integer", "description": "Seeded battles per cell", "default": 100,
+                                "minimum": 1, "maximum": 10000},
+                    "seed": {"type": "integer", "description": "First seed of each cell's seed range", "default": 0},
+                    "max_turns": {"type": "integer", "description": "Maximum turns", "default": 200}
+                }
+            }
+        ),
+        Tool(
+            name="battle_analytics_tool",
+            description="Aggregate stats over recorded battles: win rate by matchup, average damage per move, "
+                        "status-proc frequency, or a summary. Pass `query` + filters, or a free-text `question`.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "enum": list(QUERY_FILTERS)},
+                    "question": {"type": "string", "description": "Mapped to a query when `query` is omitted"},
+                    "npc": {"type": "string", "description": "NPC on either side (move queries: the user)"},
+                    "npc_a": {"type": "string"},
+                    "npc_b": {"type": "string"},
+                    "opponent": {"type": "string", "description": "Move queries: the NPC being hit"},
+                    "move": {"type": "string"},
+                    "level": {"type": "integer"},
+                    "data_version": {"type": "string"},
+                    "limit": {"type": "integer", "default": 50, "minimum": 1, "maximum": 1000}
+                }
             }
         )
     ]
@@ -62,91 +232,239 @@ async def list_tools() -> List[Tool]:
 @mcp_server.call_tool()
 async def call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
     """Handle tool calls from MCP clients."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        content = await dispatch_tool(name, arguments)
+        outcome = "ok"
+        return content
+    finally:
+        MCP_TOOL_LATENCY.observe(time.perf_counter() - start, tool=name, outcome=outcome)
+
+async def dispatch_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
     if name == "simulate_battle_tool":
         npc_a = arguments.get("npc_a")
         npc_b = arguments.get("npc_b")
         level = arguments.get("level", 50)
         seed = arguments.get("seed")
         max_turns = arguments.get("max_turns", 200)
+        log_level = arguments.get("log_level", "full")
+        policy = {k: arguments[k] for k in POLICY_ARGS if arguments.get(k) is not None}
+
+        token = _progress_token()
+        if token is not None:
+            # stream each turn as a progress notification, then return the usual full result
+            session = mcp_server.request_context.session
+            result = {"winner": None, "turns": 0, "data_version": None}
+            if log_level == "full":
+                result["log"] = []
+            if log_level != "none":
+                result["actions"] = []
+            events = stream_battle(npc_a, npc_b, level, seed, max_turns, log_level=log_level, **policy)
+            # holds a pool slot for the whole battle, like a non-streamed run
+            steps = sim_pool.stream(events)
+            try:
+                async for event in steps:
+                    if event["type"] == "start":
+                        result["data_version"] = event["data_version"]
+                    elif event["type"] == "end":
+                        result["winner"], result["turns"] = event["winner"], event["turns"]
+                        continue
+                    elif event["type"] == "turn":
+                        count_battles("stream", 0, 1)
+                    for field in ("log", "actions"):
+                        if field in result:
+                            result[field].extend(event.get(field, []))
+                    await session.send_progress_notification(token, progress=event.get("turn", 0),
+                                                             total=max_turns, message=dumps(event).decode("utf-8"))
+            finally:
+                await steps.aclose()
+            count_battles("stream", 1, 0)
+            record_result(result, npc_a, npc_b, level, seed, max_turns, **policy)
+            return [TextContent(type="text", text=dumps(result).decode("utf-8"))]
         
-        result = simulate_battle(npc_a, npc_b, level, seed, max_turns)
-        return [TextContent(type="text", text=json.dumps(result, indent=2))]
+        version = STORE.current.version
+        key = battle_key("tool", npc_a, npc_b, level, seed, max_turns, log_level, version, **policy)
+        cached = await result_cache.aget(key) if key is not None else None
+        if cached is not None:
+            RESULT_CACHE.inc(outcome="hit")
+            return [TextContent(type="text", text=cached.decode("utf-8"))]
+        # PoolSaturated propagates as an MCP tool error: the client's back-pressure signal
+        result = await sim_pool.run(simulate_battle, npc_a, npc_b, level, seed, max_turns, log_level=log_level,
+                                    **policy)
+        count_battles("single", 1, result["turns"])
+        record_result(result, npc_a, npc_b, level, seed, max_turns, **policy)
+        body = dumps(result)
+        if key is not None and result["data_version"] == version:
+            RESULT_CACHE.inc(outcome="miss")
+            await result_cache.aset(key, body)
+        return [TextContent(type="text", text=body.decode("utf-8"))]
     
     elif name == "narrate_battle_with_groq":
-        battle_log = arguments.get("battle_log", [])
+        # the Groq client (httpx, dotenv) loads on the first narration, not at startup
+        from .groq_client import aquery_groq, astream_groq
+
         style = arguments.get("style", "neutral")
-        
-        prompt = f"Narrate this battle in a {style} style:\n\n" + "\n".join(battle_log[:50])
-        narration = query_groq(prompt)
+        prompt = narration_prompt(arguments, style, arguments.get("budget_tokens"))
+        token = _progress_token()
+        if token is not None:
+            # token-streamed narration: one progress notification per chunk
+            session = mcp_server.request_context.session
+            parts = []
+            async for chunk in astream_groq(prompt):
+                parts.append(chunk)
+                await session.send_progress_notification(token, progress=len(parts), message=chunk)
+            narration = "".join(parts)
+        else:
+            narration = await aquery_groq(prompt)
         return [TextContent(type="text", text=json.dumps({"narration": narration}))]
+
+    elif name == "narrate_battles_with_groq":
+        from .groq_client import aquery_groq
+
+        result = await narrate_batch(arguments.get("battles", []), aquery_groq, arguments.get("style", "neutral"),
+                                     arguments.get("budget_tokens"), arguments.get("batch_size"))
+        return [TextContent(type="text", text=json.dumps(result))]
+
+    elif name == "team_battle_tool":
+        result = await sim_pool.run(
+            simulate_team_battle,
+            arguments.get("team_a", []),
+            arguments.get("team_b", []),
+            level=arguments.get("level", 50),
+            seed=arguments.get("seed"),
+            max_turns=arguments.get("max_turns", 200),
+            log_level=arguments.get("log_level", "none"),
+        )
+        count_battles("team", 1, result["turns"])
+        return [TextContent(type="text", text=dumps(result).decode("utf-8"))]
+
+    elif name == "battle_matrix_tool":
+        result = await run_matrix(
+            npcs=arguments.get("npcs"),
+            levels=arguments.get("levels", [50]),
+            samples=arguments.get("samples", 100),
+            seed=arguments.get("seed", 0),
+            max_turns=arguments.get("max_turns", 200),
+        )
+        return [TextContent(type="text", text=dumps(result).decode("utf-8"))]
+
+    elif name == "battle_analytics_tool":
+        # the query flushes buffered records first; keep that SQLite work off the event loop
+        result = await asyncio.to_thread(run_analytics_query, arguments)
+        return [TextContent(type="text", text=dumps(result).decode("utf-8"))]
     
     raise ValueError(f"Unknown tool: {name}")
 
-# Create FastAPI app and mount MCP app
-app = FastAPI(title="AI NPC Battle Arena")
-mcp_app = create_app(mcp_server)
-app.mount("/mcp", mcp_app)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-@app.get("/")
-async def root():
-    return {"status": "ok", "message": "AI NPC Battle Arena MCP server running."}
-
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy", "service": "AI NPC Battle Arena"}
-
-@app.post("/battle/simulate", response_model=BattleResponse)
-async def battle_simulate_endpoint(req: BattleRequest):
-    try:
-        res = simulate_battle(req.npc_a, req.npc_b, level=req.level, seed=req.seed, max_turns=req.max_turns)
-        # convert actions dicts to BattleAction models
-        actions = [BattleAction(**{
-            "turn": a.get("turn"),
-            "actor": a.get("actor"),
-            "action": a.get("action"),
-            "target": a.get("target"),
-            "damage": a.get("damage"),
-            "status_applied": a.get("status_applied"),
-            "actor_hp": a.get("actor_hp"),
-            "target_hp": a.get("target_hp"),
-        }) for a in res.get("actions", [])]
-        return BattleResponse(
-            winner=res["winner"],
-            turns=res["turns"],
-            log=res["log"],
-            actions=actions
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+def run_analytics_query(arguments: Dict[str, Any]) -> Dict:
+    """``query`` + filters, or a free-text ``question`` mapped by parse_question."""
+    args = {k: v for k, v in arguments.items() if v is not None}
+    question = args.pop("question", None)
+    limit = args.pop("limit", 50)
+    kind = args.pop("query", None)
+    if kind is None:
+        if question is None:
+            raise ValueError("pass `query` or `question`")
+        parsed = parse_question(question)
+        kind = parsed.pop("kind")
+        args = {**parsed, **args}
+    return analytics.query(kind, limit=limit, **args)
 
-@app.post("/ai/query")
-async def ai_query_endpoint(question: str):
-    try:
-        ans = query_groq(question)
-        return {"answer": ans}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+def data_watcher_from_env():
+    interval = float(os.getenv("ARENA_DATA_WATCH", "0"))
+    if interval <= 0:
+        return None
+    watcher = DataWatcher(STORE, interval)
+    watcher.start()
+    return watcher
 
 def main():
+    # before the flags are parsed, so .env values reach their defaults and every *_from_env() below
+    from dotenv import load_dotenv
+    load_dotenv()
+    # the data store was set up at import time, before .env was read
+    STORE.compiled_path = compiled_path_from_env()
+
     parser = argparse.ArgumentParser()
     parser.add_argument("mode", choices=["http", "stdio"])
     parser.add_argument("--host", default="127.0.0.1")
     parser.add_argument("--port", default=8000, type=int)
+    parser.add_argument("--pool", choices=POOL_KINDS, default=os.getenv("SIM_POOL_KIND", "process"),
+                        help="Executor used for simulations")
+    parser.add_argument("--pool-workers", type=int, default=None,
+                        help="Simulation workers (default: CPU count)")
+    parser.add_argument("--pool-queue", type=int, default=int(os.getenv("SIM_POOL_MAX_QUEUE", "64")),
+                        help="Simulations allowed to wait for a worker before returning 503")
+    parser.add_argument("--cache-dir", default=os.getenv("ARENA_CACHE_DIR"),
+                        help="Directory for the on-disk result cache (default: memory only)")
+    parser.add_argument("--watch-data", type=float, default=float(os.getenv("ARENA_DATA_WATCH", "0")),
+                        metavar="SECONDS", help="Poll the data files and hot-reload on change (0: off)")
+    parser.add_argument("--jobs-db", default=os.getenv("ARENA_JOBS_DB", "arena_jobs.sqlite3"),
+                        help="SQLite file for bulk battle jobs; unfinished jobs resume on restart")
+    parser.add_argument("--analytics-db", default=os.getenv("ARENA_ANALYTICS_DB", "arena_analytics.sqlite3"),
+                        help="SQLite file recording battle outcomes and actions for /analytics queries")
+    parser.add_argument("--no-analytics", action="store_true",
+                        default=os.getenv("ARENA_ANALYTICS_RECORD", "1") == "0",
+                        help="Do not record /battle/simulate and simulate_battle_tool results for analytics")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("ARENA_WORKERS", "1")),
+                        help="uvicorn worker processes in http mode; each has its own simulation pool")
+    parser.add_argument("--result-backend", default=os.getenv("ARENA_RESULT_BACKEND", ""),
+                        help="Result store shared by workers: sqlite:PATH or redis://HOST:PORT/DB "
+                             "(default with --workers > 1: sqlite:arena_results.sqlite3)")
+    parser.add_argument("--peers", default=os.getenv("ARENA_PEERS", ""),
+                        help="Comma-separated arena server URLs /battle/sweep may send shards to")
+    parser.add_argument("--profile", action="store_true",
+                        help="Start the sampling profiler at boot (toggle later via /debug/profiler/*)")
     args = parser.parse_args()
 
+    # uvicorn re-imports the app module, so hand the pool settings over via the environment
+    os.environ["SIM_POOL_KIND"] = args.pool
+    os.environ["SIM_POOL_MAX_QUEUE"] = str(args.pool_queue)
+    if args.pool_workers:
+        os.environ["SIM_POOL_WORKERS"] = str(args.pool_workers)
+    if args.cache_dir:
+        os.environ["ARENA_CACHE_DIR"] = args.cache_dir
+    os.environ["ARENA_DATA_WATCH"] = str(args.watch_data)
+    os.environ["ARENA_JOBS_DB"] = args.jobs_db
+    os.environ["ARENA_ANALYTICS_DB"] = args.analytics_db
+    os.environ["ARENA_ANALYTICS_RECORD"] = "0" if args.no_analytics else "1"
+    if args.mode == "http" and args.workers > 1 and not args.result_backend:
+        # per-process memory caches alone would compute every result once per worker
+        args.result_backend = "sqlite:arena_results.sqlite3"
+    if args.result_backend:
+        os.environ["ARENA_RESULT_BACKEND"] = args.result_backend
+    os.environ["ARENA_WORKERS"] = str(args.workers)
+    os.environ["ARENA_PEERS"] = args.peers
+
+    if args.profile:
+        from .profiler import PROFILER
+        PROFILER.start()
+
     if args.mode == "stdio":
         # Run as stdio server for MCP clients
-        stdio_server(mcp_server)
+        global sim_pool, result_backend, result_cache, analytics
+        # the import-time instances predate .env and the flags; release them before replacing them
+        close_shared_state()
+        sim_pool = pool_from_env()
+        result_backend = backend_from_env()
+        result_cache = cache_from_env(result_backend)
+        analytics = analytics_from_env()
+        data_watcher_from_env()
+
+        from mcp.server.stdio import stdio_server
+
+        async def run_stdio():
+            async with stdio_server() as (read_stream, write_stream):
+                await mcp_server.run(read_stream, write_stream, mcp_server.create_initialization_options())
+
+        try:
+            asyncio.run(run_stdio())
+        finally:
+            close_shared_state()
     else:
         # Run as HTTP server
+        import uvicorn
+
         log_config = {
             "version": 1,
             "disable_existing_loggers": False,
@@ -173,12 +491,20 @@ def main():
         }
 
         uvicorn.run(
-            "server.mcp_server:app",
+            "server.http_app:app",
             host=args.host,
             port=args.port,
             reload=False,
+            workers=args.workers,
             log_config=log_config,
         )
 
+def __getattr__(name):
+    # the FastAPI app is built on first access, so stdio mode never imports FastAPI
+    if name == "app":
+        from .http_app import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
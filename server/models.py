@@ -1,10 +1,11 @@
 # server/models.py
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
 class BattleAction(BaseModel):
     turn: int
     actor: str
+    side: Optional[Literal["a", "b"]] = None
     action: str
     target: Optional[str] = None
     damage: Optional[int] = None
@@ -18,9 +19,126 @@ class BattleRequest(BaseModel):
     level: Optional[int] = 50
     seed: Optional[int] = None
     max_turns: Optional[int] = 200
+    # "none": winner/turns only, "actions": + structured actions, "full": + text log
+    log_level: Literal["none", "actions", "full"] = "full"
+    # move policy per side (see server/policies.py); depth / budget_ms tune the search
+    policy_a: Literal["greedy", "expectiminimax"] = "greedy"
+    policy_b: Literal["greedy", "expectiminimax"] = "greedy"
+    depth: Optional[int] = Field(None, ge=1, le=8)
+    budget_ms: Optional[float] = Field(None, ge=0, le=1000)
 
 class BattleResponse(BaseModel):
     winner: str
     turns: int
-    log: List[str]
-    actions: List[BattleAction]
+    # content hash of the NPC/move data the battle ran on
+    data_version: Optional[str] = None
+    log: List[str] = []
+    actions: List[BattleAction] = []
+
+class RecordRequest(BattleRequest):
+    # capture a resumable snapshot after each of these turns
+    snapshot_turns: List[int] = Field([], max_length=200)
+
+class ResumeRequest(BaseModel):
+    snapshot: Dict[str, Any]
+    log_level: Literal["none", "actions", "full"] = "full"
+    # what-if: reseed the RNG and/or override combatant fields (hp, status, ...) before resuming
+    seed: Optional[int] = None
+    a: Optional[Dict[str, Any]] = None
+    b: Optional[Dict[str, Any]] = None
+    # refuse snapshots taken on other engine rules or game data
+    strict: bool = True
+
+class ReplayRequest(BaseModel):
+    journal: Dict[str, Any]
+    # stop after this turn and return a snapshot instead of the result
+    until_turn: Optional[int] = Field(None, ge=0)
+    log_level: Literal["none", "actions", "full"] = "full"
+    strict: bool = True
+
+class JobMatchup(BaseModel):
+    npc_a: str
+    npc_b: str
+    level: int = 50
+    seed: int = 0
+    # battles with seeds seed .. seed + samples - 1
+    samples: int = Field(1, ge=1)
+    max_turns: int = 200
+
+class JobSweep(BaseModel):
+    # every ordered pair of these NPCs (None: all) at every level
+    npcs: Optional[List[str]] = None
+    levels: List[int] = [50]
+    samples: int = Field(100, ge=1)
+    seed: int = 0
+    max_turns: int = 200
+
+class JobRequest(BaseModel):
+    # exactly one of matchups / sweep
+    matchups: Optional[List[JobMatchup]] = Field(None, max_length=100_000)
+    sweep: Optional[JobSweep] = None
+    chunk_size: Optional[int] = Field(None, ge=10, le=1_000_000)
+
+class SweepRequest(BaseModel):
+    # exactly one of matchups / sweep, as for jobs
+    matchups: Optional[List[JobMatchup]] = Field(None, max_length=100_000)
+    sweep: Optional[JobSweep] = None
+    # seed-range shards (default: one per runner slot)
+    shards: Optional[int] = Field(None, ge=1, le=10_000)
+    # peers to run shards on, e.g. "http://10.0.0.2:8000"; each must be listed in --peers / ARENA_PEERS
+    hosts: List[str] = Field([], max_length=256)
+    host_slots: int = Field(2, ge=1, le=64)
+    # also run shards in this server's worker pool
+    local: bool = True
+
+class ShardRequest(BaseModel):
+    cells: List[JobMatchup] = Field(..., min_length=1, max_length=100_000)
+    # (cell index, seed offset, battles)
+    slices: List[Tuple[int, int, int]] = Field(..., min_length=1, max_length=100_000)
+
+class TeamBattleRequest(BaseModel):
+    team_a: List[str] = Field(..., min_length=1, max_length=100)
+    team_b: List[str] = Field(..., min_length=1, max_length=100)
+    level: int = 50
+    seed: Optional[int] = None
+    max_turns: int = 200
+    log_level: Literal["none", "actions", "full"] = "full"
+
+class TeamBattleResponse(BaseModel):
+    winner: Literal["team_a", "team_b"]
+    turns: int
+    data_version: Optional[str] = None
+    survivors: Dict[str, List[str]]
+    log: List[str] = []
+    actions: List[BattleAction] = []
+
+class MatrixRequest(BaseModel):
+    # None means every NPC in npcs.json
+    npcs: Optional[List[str]] = None
+    levels: List[int] = [50]
+    samples: int = Field(100, ge=1, le=10000)
+    seed: int = 0
+    max_turns: int = 200
+
+class IngestRequest(MatrixRequest):
+    # same sweep as the matrix, but every battle and action lands in the analytics store
+    samples: int = Field(100, ge=1, le=10000)
+
+class NarrateBattle(BaseModel):
+    # structured actions digest best; a text log alone also works
+    battle_log: List[str] = []
+    actions: List[Dict[str, Any]] = []
+    winner: Optional[str] = None
+    turns: Optional[int] = None
+
+class NarrateRequest(NarrateBattle):
+    style: str = "neutral"
+    # token budget for the battle digest sent to Groq (default NARRATION_DIGEST_TOKENS)
+    budget_tokens: Optional[int] = Field(None, ge=20, le=4000)
+
+class NarrateBatchRequest(BaseModel):
+    battles: List[NarrateBattle] = Field(..., min_length=1, max_length=100)
+    style: str = "neutral"
+    budget_tokens: Optional[int] = Field(None, ge=20, le=4000)
+    # battles packed into one Groq request (default NARRATION_BATCH_SIZE)
+    batch_size: Optional[int] = Field(None, ge=1, le=20)
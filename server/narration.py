@@ -0,0 +1,181 @@
+# server/narration.py
+"""Prompts for Groq narration: token-budgeted battle digests and batching.
+
+A digest keeps a battle's key moments (opening blows, status procs, stuns,
+the biggest hits and the finishing blow) within a token budget, instead of
+the first N raw log lines. It is built from the structured ``actions`` when
+present, else from the text log with the ``--- Turn N ---`` filler dropped.
+``narrate_batch`` packs several digests into one request and splits the
+answer back into one narration per battle.
+"""
+import asyncio
+import os
+import re
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+DIGEST_TOKENS = int(os.getenv("NARRATION_DIGEST_TOKENS", "300"))
+BATCH_SIZE = int(os.getenv("NARRATION_BATCH_SIZE", "8"))
+# completion tokens allowed per narrated battle
+ANSWER_TOKENS = int(os.getenv("NARRATION_ANSWER_TOKENS", "200"))
+
+Query = Callable[..., Awaitable[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English with Llama-family tokenizers; close enough for budgeting
+    return (len(text) + 3) // 4
+
+
+def _action_line(act: Dict) -> str:
+    if act["action"] == "stunned":
+        return f"T{act['turn']} {act['actor']} is stunned and skips"
+    line = f"T{act['turn']} {act['actor']} {act['action']} -> {act['target']} -{act['damage']}"
+    if act.get("target_hp") is not None:
+        line += " (KO)" if act["target_hp"] == 0 else f" ({act['target_hp']} HP left)"
+    if act.get("status_applied"):
+        line += f" +{act['status_applied']}"
+    return line
+
+
+def _action_scores(actions: Sequence[Dict]) -> List[float]:
+    top = max((act.get("damage") or 0 for act in actions), default=0) or 1
+    seen = set()
+    scores = []
+    for act in actions:
+        score = (act.get("damage") or 0) / top
+        if act["action"] == "stunned":
+            score += 0.8
+        elif act.get("status_applied"):
+            score += 1.0
+        side = act.get("side", act["actor"])
+        if side not in seen:
+            # each side's opening move sets the scene (names collide in a mirror match)
+            seen.add(side)
+            score += 1.5
+        if act.get("target_hp") == 0:
+            score += 10
+        scores.append(score)
+    if scores:
+        scores[-1] += 10
+    return scores
+
+
+def _log_scores(lines: Sequence[str]) -> List[float]:
+    scores = []
+    for line in lines:
+        score = 0.1
+        if re.search(r"burn|poison|stun|faint|wins|defeat", line, re.I):
+            score += 1.0
+        scores.append(score)
+    if scores:
+        scores[0] += 10
+        for back in range(1, min(3, len(scores)) + 1):
+            scores[-back] += 5
+    return scores
+
+
+def _select(lines: Sequence[str], scores: Sequence[float], budget: int) -> List[str]:
+    """Highest-scoring lines that fit ``budget`` tokens, in their original order, gaps marked."""
+    chosen = []
+    used = 0
+    for i in sorted(range(len(lines)), key=lambda i: -scores[i]):
+        # +2 covers the newline and a possible gap marker after the line
+        cost = estimate_tokens(lines[i]) + 2
+        if used + cost <= budget:
+            chosen.append(i)
+            used += cost
+    out = []
+    last = -1
+    for i in sorted(chosen):
+        if i > last + 1:
+            out.append("...")
+        out.append(lines[i])
+        last = i
+    if chosen and last < len(lines) - 1:
+        out.append("...")
+    return out
+
+
+def battle_digest(battle: Dict, budget_tokens: Optional[int] = None) -> str:
+    """Key moments of ``battle`` within ``budget_tokens`` (default ``DIGEST_TOKENS``).
+
+    ``battle`` is a simulate result or narration request: ``actions`` and
+    optionally ``winner`` / ``turns``, or a text ``log`` / ``battle_log``.
+    """
+    budget = budget_tokens or DIGEST_TOKENS
+    actions = battle.get("actions") or []
+    header = []
+    if actions:
+        first = actions[0]
+        rival = first["target"] or next((a["target"] for a in actions if a["target"]), None)
+        header.append(f"{first['actor']} vs {rival}" if rival else first["actor"])
+    if battle.get("winner"):
+        turns = f" after {battle['turns']} turns" if battle.get("turns") else ""
+        header.append(f"Winner: {battle['winner']}{turns}")
+    budget -= sum(estimate_tokens(h) + 1 for h in header)
+    if actions:
+        lines = [_action_line(act) for act in actions]
+        body = _select(lines, _action_scores(actions), budget)
+    else:
+        log = [line for line in (battle.get("log") or battle.get("battle_log") or [])
+               if not line.startswith("--- Turn")]
+        body = _select(log, _log_scores(log), budget)
+    return "\n".join(header + body)
+
+
+def _single_prompt(digest: str, style: str) -> str:
+    return f"Narrate this battle in a {style} style:\n\n{digest}"
+
+
+def narration_prompt(battle: Dict, style: str = "neutral", budget_tokens: Optional[int] = None) -> str:
+    return _single_prompt(battle_digest(battle, budget_tokens), style)
+
+
+def batch_prompt(digests: Sequence[str], style: str = "neutral") -> str:
+    parts = [f"Narrate each of the following {len(digests)} battles in a {style} style, one short paragraph "
+             "each. Begin each narration with its marker exactly as given (e.g. [[1]]) and write nothing "
+             "else outside the narrations."]
+    for n, digest in enumerate(digests, 1):
+        parts.append(f"[[{n}]]\n{digest}")
+    return "\n\n".join(parts)
+
+
+def split_batch(text: str, count: int) -> List[Optional[str]]:
+    """One narration per marker in ``text``; None where the model skipped a battle."""
+    out: List[Optional[str]] = [None] * count
+    pieces = re.split(r"\[\[(\d+)\]\]", text)
+    for marker, body in zip(pieces[1::2], pieces[2::2]):
+        n = int(marker) - 1
+        if 0 <= n < count and body.strip():
+            out[n] = body.strip()
+    return out
+
+
+async def narrate_batch(battles: Sequence[Dict], query: Query, style: str = "neutral",
+                        budget_tokens: Optional[int] = None, batch_size: Optional[int] = None) -> Dict:
+    """Narrate ``battles`` with one ``query(prompt, max_tokens=...)`` call per ``batch_size`` battles.
+
+    Battles whose answer is missing from a batched reply are retried one by
+    one, so every battle gets a narration. ``requests`` counts Groq calls.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    digests = [battle_digest(b, budget_tokens) for b in battles]
+    single = [_single_prompt(d, style) for d in digests]
+    packs = [list(range(i, min(i + batch_size, len(battles)))) for i in range(0, len(battles), batch_size)]
+
+    async def run(pack: List[int]):
+        if len(pack) == 1:
+            return {pack[0]: await query(single[pack[0]], max_tokens=ANSWER_TOKENS)}, 1
+        text = await query(batch_prompt([digests[i] for i in pack], style), max_tokens=ANSWER_TOKENS * len(pack))
+        answers = dict(zip(pack, split_batch(text, len(pack))))
+        missing = [i for i in pack if answers[i] is None]
+        retried = await asyncio.gather(*(query(single[i], max_tokens=ANSWER_TOKENS) for i in missing))
+        answers.update(zip(missing, retried))
+        return answers, 1 + len(missing)
+
+    done = await asyncio.gather(*(run(pack) for pack in packs))
+    narrations: Dict[int, str] = {}
+    for answers, _ in done:
+        narrations.update(answers)
+    return {"narrations": [narrations[i] for i in range(len(battles))],
+            "requests": sum(sent for _, sent in done)}
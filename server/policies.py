@@ -0,0 +1,306 @@
+# server/policies.py
+"""Pluggable move-choice policies.
+
+A policy picks the move an NPC uses when it acts. ``GreedyPolicy`` is the
+classic rule (highest-power damaging move, resolved at load time) and is what
+the engine uses when no policy is given. ``ExpectiminimaxPolicy`` searches a
+few turns ahead over a model of the battle rules:
+
+* max nodes for the deciding NPC, min nodes for its opponent;
+* chance nodes for crits and status procs (the damage roll is replaced by its
+  mean, which keeps the tree small);
+* the 1v1 turn order of ``play_turn`` (after ticks only the faster side acts,
+  both on a tie, stun halves speed), so stunning a faster foe is valued.
+
+Turn-start values are memoized in a ``TranspositionTable`` keyed on a packed
+integer of (hp, status) for both sides plus the remaining depth; the table is
+shared by every decision, so later turns and repeated battles mostly hit it.
+Search deepens iteratively until ``depth`` or the per-decision ``budget_ms``
+runs out and plays the best move of the deepest finished iteration. With a
+budget the reached depth depends on machine speed; pass ``budget_ms=0`` for
+fully reproducible seeded battles. Policies never draw from the battle RNG.
+
+Status moves without damage or procs (FlameShield, Fortify, ...) have no
+effect in the engine yet, so the search sees them as a pass and will only
+pick one when nothing else is better.
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .battle_engine import Combatant, choose_move_id, move_base_damage
+from .datastore import current_data
+from .gamedata import BURN, CRIT_MULTIPLIER, HEALTHY, POISON, STATUS_CODES, STUNNED
+
+# (own HP weight, opponent HP weight) in the leaf evaluation
+PERSONALITY_WEIGHTS = {
+    "Aggressive": (0.75, 1.25),
+    "Stoic": (1.25, 0.75),
+}
+
+MEAN_ROLL = (0.85 + 1.0) / 2
+WIN = 1000.0
+
+# (probability, damage, inflicted status code or None)
+Outcome = Tuple[float, int, Optional[int]]
+
+
+class _SearchTimeout(Exception):
+    pass
+
+
+class Policy:
+    name = "base"
+
+    def choose(self, a: Combatant, b: Combatant, side: int, turn: int) -> int:
+        """Return the move id for ``a`` (side 0) or ``b`` (side 1), which is about to act."""
+        raise NotImplementedError
+
+
+class GreedyPolicy(Policy):
+    name = "greedy"
+
+    def choose(self, a, b, side, turn):
+        return choose_move_id(b if side else a)
+
+
+class TranspositionTable:
+    """Memoized turn-start values, one dict per search context (matchup and data version).
+
+    Searches on several threads share one table: lookups read the dicts
+    directly, while inserts and the counters go through the lock, and an
+    insert beyond ``max_entries`` empties the table first.
+    """
+
+    def __init__(self, max_entries: int = 500_000):
+        self.max_entries = max_entries
+        self.entries = 0
+        self.hits = 0
+        self.misses = 0
+        self._tables: Dict[tuple, Dict[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def table(self, context: tuple) -> Dict[int, float]:
+        with self._lock:
+            return self._tables.setdefault(context, {})
+
+    def put(self, table: Dict[int, float], key: int, value: float):
+        with self._lock:
+            if self.entries >= self.max_entries:
+                # crude but O(1) amortized: drop everything and start over
+                for t in self._tables.values():
+                    t.clear()
+                self._tables.clear()
+                self.entries = 0
+            table[key] = value
+            self.entries += 1
+
+    def count(self, hits: int, misses: int):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"entries": self.entries, "hits": self.hits, "misses": self.misses,
+                    "contexts": len(self._tables)}
+
+
+TRANSPOSITION = TranspositionTable()
+
+
+def _pack(hp0: int, st0: int, hp1: int, st1: int, depth: int) -> int:
+    return ((((hp0 << 2 | st0) << 16 | hp1) << 2 | st1) << 6) | depth
+
+
+def _attack_outcomes(attacker: Combatant, defender: Combatant, move, defender_healthy: bool) -> List[Outcome]:
+    base = move_base_damage(attacker, defender, move)
+    hits = [(1.0, 1.0)]
+    if base and move.crit_chance:
+        hits = [(1 - move.crit_chance, 1.0), (move.crit_chance, CRIT_MULTIPLIER)]
+    procs: List[Tuple[float, Optional[int]]] = [(1.0, None)]
+    if defender_healthy:
+        # burn, poison, stun are rolled in order and only the first to land sticks
+        procs, left = [], 1.0
+        for chance, code in ((move.burn_chance, BURN), (move.poison_chance, POISON), (move.stun_chance, STUNNED)):
+            if chance:
+                procs.append((left * chance, code))
+                left *= 1 - chance
+        procs.append((left, None))
+    outcomes = []
+    for p_hit, mult in hits:
+        dmg = max(1, int(base * MEAN_ROLL * mult)) if base else 0
+        outcomes.extend((p_hit * p_proc, dmg, code) for p_proc, code in procs if p_hit * p_proc > 0)
+    return outcomes
+
+
+class _Fighter:
+    """Static per-side data the search needs."""
+
+    def __init__(self, me: Combatant, foe: Combatant):
+        data = me.data or current_data()
+        self.max_hp = me.max_hp
+        self.speed = me.speed
+        self.ticks = (0, max(1, me.max_hp // 16), max(1, me.max_hp // 12), 0)
+        npc = data.npcs[me.npc_id]
+        self.weights = PERSONALITY_WEIGHTS.get(npc.personality, (1.0, 1.0))
+        # candidate moves, with moves that would play out identically collapsed into one
+        self.moves: List[Tuple[int, List[Outcome], List[Outcome]]] = []
+        seen = set()
+        for mid in npc.move_ids:
+            move = data.moves[mid]
+            healthy = _attack_outcomes(me, foe, move, True)
+            afflicted = _attack_outcomes(me, foe, move, False)
+            signature = (tuple(healthy), tuple(afflicted), move.priority)
+            if signature not in seen:
+                seen.add(signature)
+                self.moves.append((mid, healthy, afflicted))
+
+
+class ExpectiminimaxPolicy(Policy):
+    name = "expectiminimax"
+
+    def __init__(self, depth: int = 3, budget_ms: float = 50.0, table: TranspositionTable = TRANSPOSITION):
+        if depth < 1:
+            raise ValueError("depth must be at least 1")
+        self.depth = depth
+        self.budget_ms = budget_ms
+        self.table = table
+        self.last_depth = 0
+        self._cache_key = None
+        self._context: tuple = ()
+        self._fighters: Tuple[_Fighter, _Fighter] = None
+        self._tt: Dict[int, float] = {}
+        self._hits = self._misses = 0
+        self._me = 0
+        self._deadline = 0.0
+
+    def _prepare(self, a: Combatant, b: Combatant, side: int):
+        key = (id(a), id(b), side)
+        if key != self._cache_key:
+            self._fighters = (_Fighter(a, b), _Fighter(b, a))
+            data = a.data or current_data()
+            self._context = (data.version, a.npc_id, b.npc_id, a.level, b.level, a.max_hp, b.max_hp, a.speed,
+                             b.speed, side)
+            self._cache_key = key
+        # fetched per decision: the table may have been emptied since the last one
+        self._tt = self.table.table(self._context)
+        self._me = side
+
+    def choose(self, a, b, side, turn):
+        self._prepare(a, b, side)
+        state = (a.hp, STATUS_CODES[a.status.name], b.hp, STATUS_CODES[b.status.name])
+        # on a speed tie a acts first, so b still acts after a's move this turn
+        then = 1 if side == 0 and self._speed(0, state[1]) == self._speed(1, state[3]) else None
+        self._deadline = time.perf_counter() + self.budget_ms / 1000 if self.budget_ms > 0 else float("inf")
+        best = None
+        self.last_depth = 0
+        self._hits = self._misses = 0
+        for depth in range(1, self.depth + 1):
+            try:
+                best = self._best_move(state, side, then, depth)
+            except _SearchTimeout:
+                break
+            self.last_depth = depth
+        # counted locally during the search and added to the shared table once per decision
+        self.table.count(self._hits, self._misses)
+        if best is None:
+            # not even a one-ply search fit in the budget
+            return choose_move_id(b if side else a)
+        return best
+
+    def _speed(self, side: int, status: int) -> float:
+        return self._fighters[side].speed * (0.5 if status == STUNNED else 1.0)
+
+    def _best_move(self, state, side, then, depth) -> int:
+        best_mid, best_value = None, -float("inf")
+        for mid, healthy, afflicted in self._fighters[side].moves:
+            value = self._expect(state, side, healthy, afflicted, then, depth)
+            if value > best_value:
+                best_mid, best_value = mid, value
+        return best_mid
+
+    def _terminal(self, hp0: int, hp1: int, depth: int) -> float:
+        # same tiebreak as run_battle: a wins only if a is still standing; faster wins score higher
+        winner = 0 if hp0 > 0 else 1
+        return (WIN + depth) if winner == self._me else -(WIN + depth)
+
+    def _evaluate(self, state) -> float:
+        hp = (state[0], state[2])
+        me, foe = self._me, 1 - self._me
+        own_w, foe_w = self._fighters[me].weights
+        return own_w * hp[me] / self._fighters[me].max_hp - foe_w * hp[foe] / self._fighters[foe].max_hp
+
+    def _expect(self, state, actor, healthy, afflicted, then, depth) -> float:
+        """Expected value of ``actor`` using a move with the given outcomes, then finishing the turn."""
+        hp0, st0, hp1, st1 = state
+        defender_status = st1 if actor == 0 else st0
+        total = 0.0
+        for p, dmg, code in (healthy if defender_status == HEALTHY else afflicted):
+            if actor == 0:
+                nxt = (hp0, st0, max(0, hp1 - dmg), st1 if code is None else code)
+            else:
+                nxt = (max(0, hp0 - dmg), st0 if code is None else code, hp1, st1)
+            if nxt[0] <= 0 or nxt[2] <= 0:
+                total += p * self._terminal(nxt[0], nxt[2], depth)
+            elif then is not None:
+                total += p * self._act(nxt, then, None, depth)
+            else:
+                total += p * self._turn(nxt, depth - 1)
+        return total
+
+    def _act(self, state, actor, then, depth) -> float:
+        status = state[1] if actor == 0 else state[3]
+        if status == STUNNED:
+            # the stunned side skips its action and recovers
+            nxt = (state[0], HEALTHY, state[2], state[3]) if actor == 0 else (state[0], state[1], state[2], HEALTHY)
+            return self._act(nxt, then, None, depth) if then is not None else self._turn(nxt, depth - 1)
+        values = [self._expect(state, actor, healthy, afflicted, then, depth)
+                  for _, healthy, afflicted in self._fighters[actor].moves]
+        return max(values) if actor == self._me else min(values)
+
+    def _turn(self, state, depth) -> float:
+        if depth <= 0:
+            return self._evaluate(state)
+        key = _pack(*state, depth)
+        value = self._tt.get(key)
+        if value is not None:
+            self._hits += 1
+            return value
+        self._misses += 1
+        if time.perf_counter() > self._deadline:
+            raise _SearchTimeout
+        hp0, st0, hp1, st1 = state
+        f0, f1 = self._fighters
+        hp0 = max(0, hp0 - f0.ticks[st0])
+        hp1 = max(0, hp1 - f1.ticks[st1])
+        if hp0 <= 0 or hp1 <= 0:
+            value = self._terminal(hp0, hp1, depth)
+        else:
+            ticked = (hp0, st0, hp1, st1)
+            s0, s1 = self._speed(0, st0), self._speed(1, st1)
+            if s0 > s1:
+                value = self._act(ticked, 0, None, depth)
+            elif s1 > s0:
+                value = self._act(ticked, 1, None, depth)
+            else:
+                value = self._act(ticked, 0, 1, depth)
+        self.table.put(self._tt, key, value)
+        return value
+
+
+POLICIES = {"greedy": GreedyPolicy, "expectiminimax": ExpectiminimaxPolicy}
+POLICY_NAMES = tuple(POLICIES)
+
+
+def make_policy(name: str, depth: Optional[int] = None, budget_ms: Optional[float] = None) -> Policy:
+    if name not in POLICIES:
+        raise ValueError(f"Unknown policy {name!r}; expected one of {POLICY_NAMES}")
+    if name == "greedy":
+        return GreedyPolicy()
+    options = {}
+    if depth is not None:
+        options["depth"] = depth
+    if budget_ms is not None:
+        options["budget_ms"] = budget_ms
+    return POLICIES[name](**options)
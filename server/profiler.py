@@ -0,0 +1,96 @@
+# server/profiler.py
+"""Low-overhead sampling profiler that can be switched on at runtime.
+
+A daemon thread snapshots every other thread's stack with
+``sys._current_frames()`` at a fixed interval and counts the functions it
+sees. ``report()`` lists the hottest functions of this package (the battle
+loop, damage and status code) by self and inclusive samples. Only threads of
+this process are visible, so use the thread simulation pool when profiling.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005, path_prefix: str = PACKAGE_DIR):
+        self.interval = interval
+        self.path_prefix = path_prefix
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self._self: Counter = Counter()
+        self._inclusive: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def reset(self):
+        with self._lock:
+            self.samples = 0
+            self._self.clear()
+            self._inclusive.clear()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(skip_thread=me)
+
+    def sample(self, skip_thread: Optional[int] = None):
+        frames = sys._current_frames()
+        with self._lock:
+            for thread_id, frame in frames.items():
+                if thread_id == skip_thread:
+                    continue
+                leaf = True
+                seen = set()
+                while frame is not None:
+                    code = frame.f_code
+                    if code.co_filename.startswith(self.path_prefix):
+                        name = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+                        if leaf:
+                            self._self[name] += 1
+                            leaf = False
+                        if name not in seen:
+                            self._inclusive[name] += 1
+                            seen.add(name)
+                    frame = frame.f_back
+            self.samples += 1
+
+    def report(self, top: int = 20) -> Dict:
+        with self._lock:
+            by_self: List = self._self.most_common(top)
+            by_inclusive: List = self._inclusive.most_common(top)
+            samples = self.samples
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "samples": samples,
+            "top_self": [{"function": f, "samples": n} for f, n in by_self],
+            "top_inclusive": [{"function": f, "samples": n} for f, n in by_inclusive],
+        }
+
+
+PROFILER = SamplingProfiler()
@@ -0,0 +1,276 @@
+# server/replay.py
+"""Battle snapshots, resume, fork and journal replay.
+
+A snapshot is a plain JSON-able dict holding both combatants (stats, HP,
+status), the number of turns played, the RNG's internal state and the move
+policy configuration. ``resume`` continues a battle from a snapshot exactly
+as the original run would have, without replaying the prefix; ``fork``
+copies a snapshot with a new seed and/or edited combatants for what-if runs.
+
+A journal is the compact alternative: the seed plus the move id chosen for
+every action. ``replay`` re-runs a journal with the recorded moves forced, so
+it reproduces battles whose search policy ran under a time budget, and can
+stop at any turn to hand back a snapshot.
+
+Snapshots and journals record ``engine_version`` and ``data_version``;
+restoring onto different rules or data raises ``SnapshotError`` unless
+``strict=False``.
+"""
+import copy
+import random
+from dataclasses import fields
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .battle_engine import ENGINE_VERSION, RNG, Combatant, Status, build_combatant, play_turn, resolve_policies
+from .battle_log import EV_START, LOG_LEVELS, Event, events_to_actions, render_log
+from .datastore import current_data
+from .gamedata import GameData
+from .policies import GreedyPolicy, Policy
+
+SNAPSHOT_FORMAT = 1
+
+# Combatant fields that fork() may override
+_EDITABLE = ("hp", "max_hp", "attack", "defense", "sp_attack", "sp_defense", "speed", "level", "status")
+_POLICY_KEYS = ("policy_a", "policy_b", "depth", "budget_ms")
+
+
+class SnapshotError(ValueError):
+    """Malformed snapshot/journal, or one taken on different engine rules or data."""
+
+
+def rng_state(rng: RNG) -> Dict:
+    if isinstance(rng, random.Random):
+        version, internal, gauss_next = rng.getstate()
+        return {"kind": "random", "version": version, "state": list(internal), "gauss_next": gauss_next}
+    bit_generator = getattr(rng, "bit_generator", None)
+    if bit_generator is not None:
+        return {"kind": "numpy", "state": bit_generator.state}
+    raise SnapshotError(f"cannot capture the state of {type(rng).__name__}; use random.Random or a numpy Generator")
+
+
+def restore_rng(state: Dict) -> RNG:
+    if state["kind"] == "random":
+        rng = random.Random()
+        rng.setstate((state["version"], tuple(state["state"]), state["gauss_next"]))
+        return rng
+    if state["kind"] == "numpy":
+        import numpy as np
+        bit_generator = getattr(np.random, state["state"]["bit_generator"])()
+        bit_generator.state = state["state"]
+        return np.random.Generator(bit_generator)
+    raise SnapshotError(f"unknown RNG kind {state['kind']!r}")
+
+
+def combatant_to_dict(c: Combatant) -> Dict:
+    out = {f.name: getattr(c, f.name) for f in fields(c) if f.name not in ("status", "data")}
+    out["status"] = {"name": c.status.name, "turns": c.status.turns}
+    return out
+
+
+def combatant_from_dict(d: Dict, data: GameData) -> Combatant:
+    values = {k: v for k, v in d.items() if k != "status"}
+    return Combatant(**values, status=Status(**d["status"]), data=data)
+
+
+def _check_versions(doc: Dict, data: GameData, strict: bool):
+    if doc.get("format") != SNAPSHOT_FORMAT:
+        raise SnapshotError(f"unsupported format {doc.get('format')!r}")
+    if not strict:
+        return
+    if doc["engine_version"] != ENGINE_VERSION:
+        raise SnapshotError(f"taken with engine version {doc['engine_version']}, running {ENGINE_VERSION}")
+    if doc["data_version"] != data.version:
+        raise SnapshotError(f"taken on data version {doc['data_version']}, current is {data.version}")
+
+
+def capture(a: Combatant, b: Combatant, turn: int, rng: RNG, max_turns: int = 200,
+            policy: Optional[Dict] = None) -> Dict:
+    """Snapshot a battle after ``turn`` turns have been played."""
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "engine_version": ENGINE_VERSION,
+        "data_version": (a.data or current_data()).version,
+        "turn": turn,
+        "max_turns": max_turns,
+        "a": combatant_to_dict(a),
+        "b": combatant_to_dict(b),
+        "rng": rng_state(rng),
+        "policy": dict(policy or {}),
+    }
+
+
+def restore(snapshot: Dict, strict: bool = True) -> Tuple[Combatant, Combatant, int, RNG]:
+    data = current_data()
+    try:
+        _check_versions(snapshot, data, strict)
+        a = combatant_from_dict(snapshot["a"], data)
+        b = combatant_from_dict(snapshot["b"], data)
+        return a, b, snapshot["turn"], restore_rng(snapshot["rng"])
+    except (KeyError, TypeError) as e:
+        raise SnapshotError(f"malformed snapshot: {e}") from e
+
+
+def _play(a: Combatant, b: Combatant, rng: RNG, first_turn: int, last_turn: int, events: Optional[List[Event]],
+          policies) -> int:
+    record = events.append if events is not None else None
+    turn = first_turn
+    while a.hp > 0 and b.hp > 0 and turn <= last_turn:
+        play_turn(a, b, turn, rng, record, policies)
+        turn += 1
+    return turn - 1
+
+
+def _result(a: Combatant, b: Combatant, turns: int, events: Optional[List[Event]], log_level: str) -> Dict:
+    result = {
+        "winner": a.name if a.hp > 0 else b.name,
+        "turns": turns,
+        "data_version": (a.data or current_data()).version,
+    }
+    if log_level == "full":
+        result["log"] = render_log(events)
+    if events is not None:
+        result["actions"] = events_to_actions(events)
+    return result
+
+
+def resume(snapshot: Dict, log_level: str = "full", strict: bool = True) -> Dict:
+    """Play a snapshot to the end; log/actions cover only the resumed turns."""
+    if log_level not in LOG_LEVELS:
+        raise ValueError(f"log_level must be one of {LOG_LEVELS}")
+    a, b, turn, rng = restore(snapshot, strict)
+    try:
+        max_turns = snapshot["max_turns"]
+        policies = resolve_policies(**snapshot.get("policy", {}))
+    except (KeyError, TypeError) as e:
+        raise SnapshotError(f"malformed snapshot: {e}") from e
+    events: Optional[List[Event]] = None if log_level == "none" else []
+    turns = _play(a, b, rng, turn + 1, max_turns, events, policies)
+    return {**_result(a, b, turns, events, log_level), "resumed_from": turn}
+
+
+def fork(snapshot: Dict, seed: Optional[int] = None, a: Optional[Dict] = None, b: Optional[Dict] = None) -> Dict:
+    """Copy ``snapshot`` with a fresh RNG seed and/or edited combatant fields (e.g. {"hp": 10})."""
+    forked = copy.deepcopy(snapshot)
+    if seed is not None:
+        forked["rng"] = rng_state(random.Random(seed))
+    for side, edits in (("a", a), ("b", b)):
+        for field, value in (edits or {}).items():
+            if field not in _EDITABLE:
+                raise SnapshotError(f"cannot override {field!r}; editable fields are {_EDITABLE}")
+            if field == "status":
+                value = {"name": value, "turns": 1 if value == "Stunned" else 0} if isinstance(value, str) else value
+            forked[side][field] = value
+    forked["forked"] = True
+    return forked
+
+
+class _Recorder(Policy):
+    def __init__(self, inner: Policy, moves: List[int]):
+        self.inner = inner
+        self.moves = moves
+
+    def choose(self, a, b, side, turn):
+        mid = self.inner.choose(a, b, side, turn)
+        self.moves.append(mid)
+        return mid
+
+
+class _JournalPolicy(Policy):
+    """Plays back recorded move ids in action order; both sides share one cursor."""
+
+    def __init__(self, cursor: Iterable[int]):
+        self.cursor = cursor
+
+    def choose(self, a, b, side, turn):
+        mid = next(self.cursor, None)
+        if mid is None:
+            raise SnapshotError(f"journal ran out of moves at turn {turn}")
+        return mid
+
+
+def record_battle(npc_a: str, npc_b: str, level: int = 50, seed: Optional[int] = None, max_turns: int = 200,
+                  snapshot_turns: Iterable[int] = (), log_level: str = "none", **policy) -> Dict:
+    """Simulate a battle and return its result, journal and snapshots after the requested turns."""
+    if log_level not in LOG_LEVELS:
+        raise ValueError(f"log_level must be one of {LOG_LEVELS}")
+    unknown = set(policy) - set(_POLICY_KEYS)
+    if unknown:
+        raise TypeError(f"unexpected arguments: {sorted(unknown)}")
+    if seed is None:
+        # a journal is only replayable with a known seed
+        seed = random.SystemRandom().randrange(2 ** 63)
+    data = current_data()
+    a = build_combatant(npc_a, level, data)
+    b = build_combatant(npc_b, level, data)
+    rng = random.Random(seed)
+    moves: List[int] = []
+    resolved = resolve_policies(**policy) or (GreedyPolicy(), GreedyPolicy())
+    policies = (_Recorder(resolved[0], moves), _Recorder(resolved[1], moves))
+
+    events: Optional[List[Event]] = None if log_level == "none" else []
+    if events is not None:
+        events.append((EV_START, a.name, a.hp, b.name, b.hp, level))
+    snapshots = []
+    turns = 0
+    for stop in sorted(t for t in set(snapshot_turns) if 0 <= t < max_turns) + [max_turns]:
+        if a.hp <= 0 or b.hp <= 0:
+            break
+        turns = _play(a, b, rng, turns + 1, stop, events, policies)
+        if stop < max_turns and turns == stop:
+            snapshots.append(capture(a, b, turns, rng, max_turns, policy))
+
+    result = _result(a, b, turns, events, log_level)
+    journal = {
+        "format": SNAPSHOT_FORMAT,
+        "engine_version": ENGINE_VERSION,
+        "data_version": data.version,
+        "npc_a": npc_a,
+        "npc_b": npc_b,
+        "level": level,
+        "seed": seed,
+        "max_turns": max_turns,
+        "moves": moves,
+        "winner": result["winner"],
+        "turns": turns,
+    }
+    return {"result": result, "journal": journal, "snapshots": snapshots}
+
+
+def replay(journal: Dict, until_turn: Optional[int] = None, log_level: str = "full", strict: bool = True) -> Dict:
+    """Re-run a journal with its recorded moves.
+
+    With ``until_turn`` the battle stops there and ``{"snapshot": ...}`` is
+    returned; otherwise the result plus ``verified`` (winner and turns match).
+    """
+    if log_level not in LOG_LEVELS:
+        raise ValueError(f"log_level must be one of {LOG_LEVELS}")
+    data = current_data()
+    try:
+        _check_versions(journal, data, strict)
+        npc_a, npc_b, level = journal["npc_a"], journal["npc_b"], journal["level"]
+        rng = random.Random(journal["seed"])
+        cursor = iter(journal["moves"])
+        max_turns = journal["max_turns"]
+    except (KeyError, TypeError) as e:
+        raise SnapshotError(f"malformed journal: {e}") from e
+    # a well-formed journal naming an NPC this data lacks is an unknown NPC (KeyError), not a malformed journal
+    try:
+        a = build_combatant(npc_a, level, data)
+        b = build_combatant(npc_b, level, data)
+    except (AttributeError, TypeError) as e:
+        raise SnapshotError(f"malformed journal: {e}") from e
+    policies = (_JournalPolicy(cursor), _JournalPolicy(cursor))
+
+    if until_turn is not None:
+        turns = _play(a, b, rng, 1, min(until_turn, max_turns), None, policies)
+        # the continuation is greedy: the recorded moves cover only the original run
+        return {"snapshot": capture(a, b, turns, rng, max_turns)}
+
+    events: Optional[List[Event]] = None if log_level == "none" else []
+    if events is not None:
+        events.append((EV_START, a.name, a.hp, b.name, b.hp, journal["level"]))
+    turns = _play(a, b, rng, 1, max_turns, events, policies)
+    result = _result(a, b, turns, events, log_level)
+    result["verified"] = result["winner"] == journal["winner"] and turns == journal["turns"]
+    return result
+
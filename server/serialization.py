@@ -0,0 +1,118 @@
+# server/serialization.py
+"""Response bodies written straight from engine dicts to bytes.
+
+``dumps`` produces compact JSON (orjson when installed, the stdlib json
+module otherwise) and ``packb`` MessagePack (the msgpack package when
+installed, otherwise the small encoder below, which covers the JSON-shaped
+values results are made of). ``encode`` picks one from an Accept header.
+Neither path builds pydantic models; the response models in models.py only
+document the shapes.
+"""
+import json
+import struct
+from typing import Any, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+_MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def packb(obj: Any) -> bytes:
+    if msgpack is not None:
+        return msgpack.packb(obj, use_bin_type=True)
+    out = bytearray()
+    _pack(obj, out)
+    return bytes(out)
+
+
+def _pack_len(n: int, out: bytearray, fix: int, fix_limit: int, first: int, sizes: Tuple[int, ...]):
+    # fix* header when it fits, else the 8/16/32-bit length forms starting at type byte ``first``
+    if n < fix_limit:
+        out.append(fix | n)
+        return
+    for code, fmt in zip(range(first, first + len(sizes)), sizes):
+        if n < 1 << (8 * fmt):
+            out.append(code)
+            out += n.to_bytes(fmt, "big")
+            return
+    raise ValueError("object too large for MessagePack")
+
+
+def _pack(obj: Any, out: bytearray):
+    if obj is None:
+        out.append(0xC0)
+    elif obj is True or obj is False:
+        out.append(0xC3 if obj else 0xC2)
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80 or -32 <= obj < 0:
+            out += struct.pack(">b" if obj < 0 else ">B", obj)
+        elif obj >= 0:
+            for code, fmt in ((0xCC, ">B"), (0xCD, ">H"), (0xCE, ">I"), (0xCF, ">Q")):
+                if obj < 1 << (8 * struct.calcsize(fmt)):
+                    out.append(code)
+                    out += struct.pack(fmt, obj)
+                    return
+            raise OverflowError("int too large for MessagePack")
+        else:
+            for code, fmt in ((0xD0, ">b"), (0xD1, ">h"), (0xD2, ">i"), (0xD3, ">q")):
+                if obj >= -(1 << (8 * struct.calcsize(fmt) - 1)):
+                    out.append(code)
+                    out += struct.pack(fmt, obj)
+                    return
+            raise OverflowError("int too small for MessagePack")
+    elif isinstance(obj, float):
+        out.append(0xCB)
+        out += struct.pack(">d", obj)
+    elif isinstance(obj, str):
+        raw = obj.encode("utf-8")
+        _pack_len(len(raw), out, 0xA0, 32, 0xD9, (1, 2, 4))
+        out += raw
+    elif isinstance(obj, (bytes, bytearray)):
+        _pack_len(len(obj), out, 0, 0, 0xC4, (1, 2, 4))
+        out += obj
+    elif isinstance(obj, (list, tuple)):
+        _pack_len(len(obj), out, 0x90, 16, 0xDC, (2, 4))
+        for item in obj:
+            _pack(item, out)
+    elif isinstance(obj, dict):
+        _pack_len(len(obj), out, 0x80, 16, 0xDE, (2, 4))
+        for key, value in obj.items():
+            _pack(key, out)
+            _pack(value, out)
+    else:
+        raise TypeError(f"cannot MessagePack-encode {type(obj).__name__}")
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    for part in (accept or "").split(","):
+        media_type, _, params = part.partition(";")
+        if media_type.strip().lower() in _MSGPACK_TYPES:
+            q = [p.split("=", 1)[1] for p in params.replace(" ", "").split(";") if p.startswith("q=")]
+            try:
+                return not q or float(q[0]) > 0
+            except ValueError:
+                return False
+    return False
+
+
+def encode(obj: Any, accept: Optional[str] = None) -> Tuple[bytes, str]:
+    """(body, media type): MessagePack when ``accept`` asks for it, compact JSON otherwise."""
+    if wants_msgpack(accept):
+        return packb(obj), MSGPACK
+    return dumps(obj), JSON
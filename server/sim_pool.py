@@ -0,0 +1,185 @@
+# server/sim_pool.py
+"""Off-loop execution for CPU-bound simulations.
+
+The FastAPI handlers and the MCP ``call_tool`` handler are async, so running
+``simulate_battle`` inline would stall the event loop for every other client.
+``SimulationPool`` hands the work to a process (or thread) pool and bounds the
+number of simulations that may be running or queued at once; past that limit
+``run`` raises ``PoolSaturated`` so callers can answer with 503 / retry-later.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Iterator, Optional
+
+from .datastore import STORE, current_data
+from .gamedata import GameData
+from .metrics import SIM_DURATION
+
+POOL_KINDS = ("process", "thread")
+
+
+class PoolSaturated(RuntimeError):
+    """Raised when the pool already has ``capacity`` simulations in flight."""
+
+
+def _install_data(data: GameData):
+    # worker processes run on the snapshot the parent validated, never on what is on disk now
+    STORE.install(data)
+
+
+class SimulationPool:
+    def __init__(self, kind: str = "process", workers: Optional[int] = None, max_queue: int = 64):
+        if kind not in POOL_KINDS:
+            raise ValueError(f"Unknown pool kind: {kind}")
+        self.kind = kind
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.max_queue = max(0, max_queue)
+        self.pending = 0
+        self._executor: Optional[Executor] = None
+        self._step_executor: Optional[Executor] = None
+
+    @property
+    def capacity(self) -> int:
+        # one running task per worker plus the bounded backlog
+        return self.workers + self.max_queue
+
+    @property
+    def saturated(self) -> bool:
+        return self.pending >= self.capacity
+
+    def _get_executor(self) -> Executor:
+        # created lazily so importing the server never forks worker processes
+        if self._executor is None:
+            if self.kind == "process":
+                # fork() from a process that is running threads (anyio's stdin reader in stdio
+                # mode, the data watcher) can deadlock the child, so start workers from a
+                # clean forkserver where available
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver") if "forkserver" in methods else None
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                                     initializer=_install_data, initargs=(current_data(),))
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sim")
+        return self._executor
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        if self.saturated:
+            raise PoolSaturated(
+                f"Simulation pool saturated ({self.pending}/{self.capacity} in flight); retry later."
+            )
+        self.pending += 1
+        try:
+            future = self._get_executor().submit(partial(fn, *args, **kwargs))
+        except BaseException:
+            self.pending -= 1
+            raise
+        # the slot is held until the work itself ends, not the awaiting coroutine: a cancelled
+        # caller (client gone, timeout) leaves its simulation running in the executor
+        self._release_when_done(future)
+        with SIM_DURATION.time(kind=getattr(fn, "__name__", "task")):
+            return await asyncio.wrap_future(future)
+
+    def stream(self, iterator: Iterator) -> "PoolStream":
+        """Step a blocking generator (a streamed battle) off the loop, holding one slot while it runs.
+
+        The slot is taken here, so a full pool raises ``PoolSaturated`` before
+        anything is sent, and given back when the stream ends or is
+        ``aclose()``d. Process workers cannot hold a generator, so process
+        pools step it on a companion thread pool of the same size instead.
+        """
+        if self.saturated:
+            raise PoolSaturated(
+                f"Simulation pool saturated ({self.pending}/{self.capacity} in flight); retry later."
+            )
+        self.pending += 1
+        return PoolStream(self, iterator)
+
+    def _get_step_executor(self) -> Executor:
+        if self.kind == "thread":
+            return self._get_executor()
+        if self._step_executor is None:
+            self._step_executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sim-stream")
+        return self._step_executor
+
+    def _release_when_done(self, future: Future):
+        loop = asyncio.get_running_loop()
+
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                # the loop is gone (shutdown); nothing else will read the count on it
+                self._release()
+
+        future.add_done_callback(release)
+
+    def _release(self):
+        self.pending -= 1
+
+    def recycle(self):
+        """Retire the worker processes after a data reload; tasks already submitted finish on the old workers.
+
+        New workers start on the parent's current (validated) snapshot. Thread pools
+        share this process's data store, so they are left alone.
+        """
+        if self.kind == "process" and self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def shutdown(self, wait: bool = True):
+        for executor in (self._executor, self._step_executor):
+            if executor is not None:
+                executor.shutdown(wait=wait)
+        self._executor = self._step_executor = None
+
+
+class PoolStream:
+    """Async iterator returned by ``SimulationPool.stream``; always end it or ``aclose()`` it."""
+
+    _DONE = object()
+
+    def __init__(self, pool: SimulationPool, iterator: Iterator):
+        self.pool = pool
+        self.iterator = iterator
+        self._future: Optional[Future] = None
+        self._open = True
+
+    def __aiter__(self) -> "PoolStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        if not self._open:
+            raise StopAsyncIteration
+        self._future = self.pool._get_step_executor().submit(next, self.iterator, self._DONE)
+        try:
+            item = await asyncio.wrap_future(self._future)
+        except BaseException:
+            await self.aclose()
+            raise
+        if item is self._DONE:
+            await self.aclose()
+            raise StopAsyncIteration
+        return item
+
+    async def aclose(self):
+        if not self._open:
+            return
+        self._open = False
+        if self._future is not None and not self._future.done():
+            # abandoned mid-step: the turn still runs, so keep the slot until it ends
+            self.pool._release_when_done(self._future)
+        else:
+            self.pool._release()
+
+
+def pool_from_env() -> SimulationPool:
+    # main() exports the CLI flags here so uvicorn's re-import of the app sees them
+    workers = os.getenv("SIM_POOL_WORKERS")
+    return SimulationPool(
+        kind=os.getenv("SIM_POOL_KIND", "process"),
+        workers=int(workers) if workers else None,
+        max_queue=int(os.getenv("SIM_POOL_MAX_QUEUE", "64")),
+    )
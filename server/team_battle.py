@@ -0,0 +1,237 @@
+# server/team_battle.py
+"""N vs M team battles driven by a priority-queue turn scheduler.
+
+Each turn every living combatant first takes its burn/poison tick, then acts
+once (unlike the 1v1 engine, where only the faster side acts). The order
+comes from ``TurnScheduler``: higher move ``priority`` first, then higher
+effective speed (stun halves it, as in 1v1), then team A before team B and
+roster order. Attackers focus the living opponent with the lowest
+HP, looked up through ``_TargetIndex``. Both structures are heaps with lazy
+invalidation, so scheduling an action or picking a target is O(log n) and a
+50 vs 50 raid never rescans the rosters.
+
+A team wins when the other side has no one standing. At ``max_turns`` the side
+with more survivors wins, then the one with more total HP, then team A.
+"""
+import heapq
+import random
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .battle_engine import (RNG, Combatant, apply_move_status, apply_status_effects, build_combatant,
+                            choose_move_id, roll_damage)
+from .battle_log import (EV_FAINT, EV_MOVE, EV_STUNNED, EV_TEAM_START, EV_TICK, EV_TURN, LOG_LEVELS, Event,
+                         events_to_actions, render_log)
+from .datastore import current_data
+from .gamedata import GameData
+
+TEAMS = ("team_a", "team_b")
+
+
+def effective_speed(c: Combatant) -> float:
+    return c.speed * (0.5 if c.status.name == "Stunned" else 1.0)
+
+
+class TurnScheduler:
+    """Orders one turn's actions; every operation is O(log n).
+
+    Entries are (-priority, -speed, slot, version). ``reschedule`` pushes a
+    fresh entry and bumps the slot's version instead of searching the heap;
+    ``pop`` discards entries whose version is stale.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[int, float, int, int]] = []
+        self._version: Dict[int, int] = {}
+
+    def start_turn(self, entries: Iterable[Tuple[int, int, float]]):
+        """``entries`` are (slot, priority, speed) for everyone acting this turn."""
+        self._heap = [(-priority, -speed, slot, 0) for slot, priority, speed in entries]
+        heapq.heapify(self._heap)
+        self._version = {entry[2]: 0 for entry in self._heap}
+
+    def reschedule(self, slot: int, priority: int, speed: float):
+        version = self._version.get(slot)
+        if version is None:
+            return  # already acted this turn
+        self._version[slot] = version + 1
+        heapq.heappush(self._heap, (-priority, -speed, slot, version + 1))
+
+    def cancel(self, slot: int):
+        self._version.pop(slot, None)
+
+    def pop(self) -> Optional[int]:
+        while self._heap:
+            _, _, slot, version = heapq.heappop(self._heap)
+            if self._version.get(slot) == version:
+                del self._version[slot]
+                return slot
+        return None
+
+    def __len__(self):
+        return len(self._version)
+
+
+class _TargetIndex:
+    """Lowest-HP living member of one team; entries are refreshed on every HP change."""
+
+    def __init__(self, fighters: Sequence[Combatant], slots: Iterable[int]):
+        self.fighters = fighters
+        self._heap = [(fighters[s].hp, s) for s in slots]
+        heapq.heapify(self._heap)
+
+    def update(self, slot: int):
+        hp = self.fighters[slot].hp
+        if hp > 0:
+            heapq.heappush(self._heap, (hp, slot))
+
+    def lowest(self) -> Optional[int]:
+        heap = self._heap
+        while heap:
+            hp, slot = heap[0]
+            if hp == self.fighters[slot].hp and hp > 0:
+                return slot
+            heapq.heappop(heap)
+        return None
+
+
+class TeamBattle:
+    def __init__(self, team_a: Sequence[Combatant], team_b: Sequence[Combatant], rng: RNG):
+        if not team_a or not team_b:
+            raise ValueError("Both teams need at least one combatant")
+        self.fighters: List[Combatant] = list(team_a) + list(team_b)
+        self.side = [0] * len(team_a) + [1] * len(team_b)
+        self.alive = [len(team_a), len(team_b)]
+        self.rng = rng
+        # auto moves never change during a battle, so resolve them once
+        data = self.fighters[0].data or current_data()
+        self.moves = [data.moves[choose_move_id(c)] for c in self.fighters]
+        n = len(self.fighters)
+        self.targets = (_TargetIndex(self.fighters, range(len(team_a))),
+                        _TargetIndex(self.fighters, range(len(team_a), n)))
+        self.scheduler = TurnScheduler()
+
+    @property
+    def over(self) -> bool:
+        return not (self.alive[0] and self.alive[1])
+
+    def team(self, side: int) -> List[Combatant]:
+        return [c for c, s in zip(self.fighters, self.side) if s == side]
+
+    def winner(self) -> int:
+        """0 for team A, 1 for team B."""
+        if self.alive[0] != self.alive[1]:
+            return 0 if self.alive[0] > self.alive[1] else 1
+        hp = [sum(c.hp for c in self.team(s)) for s in (0, 1)]
+        return 0 if hp[0] >= hp[1] else 1
+
+    def _faint(self, slot: int, record):
+        self.alive[self.side[slot]] -= 1
+        self.scheduler.cancel(slot)
+        if record:
+            record((EV_FAINT, self.fighters[slot].name))
+
+    def play_turn(self, turn: int, record=None):
+        fighters, moves, rng = self.fighters, self.moves, self.rng
+        if record:
+            record((EV_TURN, turn))
+        for slot, c in enumerate(fighters):
+            if c.hp <= 0:
+                continue
+            tick = apply_status_effects(c)
+            if tick:
+                if record:
+                    record((EV_TICK, c.name, c.status.name, tick, c.hp, c.max_hp))
+                self.targets[self.side[slot]].update(slot)
+                if c.hp <= 0:
+                    self._faint(slot, record)
+        if self.over:
+            return
+
+        scheduler = self.scheduler
+        scheduler.start_turn((slot, moves[slot].priority, effective_speed(c))
+                             for slot, c in enumerate(fighters) if c.hp > 0)
+        while True:
+            slot = scheduler.pop()
+            if slot is None:
+                break
+            attacker = fighters[slot]
+            # if stunned, skip action and reduce stun turns
+            if attacker.status.name == "Stunned" and attacker.status.turns > 0:
+                attacker.status.turns -= 1
+                if attacker.status.turns == 0:
+                    attacker.status.name = "Healthy"
+                if record:
+                    record((EV_STUNNED, turn, attacker.name, self.side[slot]))
+                continue
+            foe_side = 1 - self.side[slot]
+            target = self.targets[foe_side].lowest()
+            defender = fighters[target]
+            move = moves[slot]
+            dmg = roll_damage(attacker, defender, move, rng)
+            defender.hp = max(0, defender.hp - dmg)
+            status_applied = apply_move_status(defender, move, rng)
+            if record:
+                record((EV_MOVE, turn, attacker.name, move.name, defender.name, dmg, defender.hp, defender.max_hp,
+                        status_applied, attacker.hp, self.side[slot]))
+            self.targets[foe_side].update(target)
+            if defender.hp <= 0:
+                self._faint(target, record)
+                if self.over:
+                    break
+            elif status_applied == "Stunned":
+                # a stunned defender that has not acted yet drops back in the order
+                scheduler.reschedule(target, moves[target].priority, effective_speed(defender))
+
+    def run(self, max_turns: int = 200, events: Optional[List[Event]] = None) -> int:
+        """Fight until one team is down or ``max_turns``; returns turns played."""
+        record = events.append if events is not None else None
+        if record:
+            level = self.fighters[0].level
+            record((EV_TEAM_START, tuple(c.name for c in self.team(0)), tuple(c.name for c in self.team(1)), level))
+        turn = 1
+        while not self.over and turn <= max_turns:
+            self.play_turn(turn, record)
+            turn += 1
+        return turn - 1
+
+
+def build_teams(team_a: Sequence[str], team_b: Sequence[str], level: int = 50, data: Optional[GameData] = None
+                ) -> Tuple[List[Combatant], List[Combatant]]:
+    """Build both rosters; NPCs fielded more than once are named "EmberMage #1", "EmberMage #2", ..."""
+    data = data or current_data()
+    a = [build_combatant(key, level, data) for key in team_a]
+    b = [build_combatant(key, level, data) for key in team_b]
+    counts = Counter(c.name for c in a + b)
+    seen: Counter = Counter()
+    for c in a + b:
+        if counts[c.name] > 1:
+            seen[c.name] += 1
+            c.name = f"{c.name} #{seen[c.name]}"
+    return a, b
+
+
+def simulate_team_battle(team_a: Sequence[str], team_b: Sequence[str], level: int = 50, seed: int = None,
+                         max_turns: int = 200, rng: Optional[RNG] = None, log_level: str = "full") -> Dict:
+    """Simulate an N vs M battle; ``log_level`` works as in simulate_battle."""
+    if log_level not in LOG_LEVELS:
+        raise ValueError(f"log_level must be one of {LOG_LEVELS}")
+    if rng is None:
+        rng = random.Random(seed)
+    data = current_data()
+    a, b = build_teams(team_a, team_b, level, data)
+    battle = TeamBattle(a, b, rng)
+    events: Optional[List[Event]] = None if log_level == "none" else []
+    turns = battle.run(max_turns, events)
+
+    result = {
+        "winner": TEAMS[battle.winner()],
+        "turns": turns,
+        "data_version": data.version,
+        "survivors": {TEAMS[s]: [c.name for c in battle.team(s) if c.hp > 0] for s in (0, 1)},
+    }
+    if log_level == "full":
+        result["log"] = render_log(events)
+    if events is not None:
+        result["actions"] = events_to_actions(events)
+    return result
@@ -0,0 +1,208 @@
+# server/trace.py
+"""Compact columnar battle traces for bulk export.
+
+One fixed-width record per action (``ACTION_DTYPE``, 25 bytes) and one per
+match (``MATCH_DTYPE``). NPCs and moves are stored as ids into name tables
+saved next to the arrays, so a trace stays readable after the data files
+change. A trace is a directory:
+
+    actions.npy / matches.npy   (NumPy format, memory-mapped by TraceReader)
+    actions.parquet / matches.parquet   (when written with fmt="parquet")
+    meta.json                   (format version + npc/move name tables)
+
+``TraceReader`` rebuilds ``BattleAction`` models lazily, one match at a time.
+
+    python -m server.trace OUT_DIR --npc-a embermage --npc-b ironknight --samples 10000
+"""
+import argparse
+import json
+import os
+import random
+from typing import Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from .battle_engine import build_combatant, run_battle
+from .battle_log import EV_MOVE, EV_STUNNED, SIDE_NAMES, Event
+from .datastore import current_data
+from .gamedata import GameData
+from .models import BattleAction
+
+TRACE_VERSION = 2
+
+KIND_MOVE, KIND_STUNNED = 0, 1
+STATUS_CODES = {None: 0, "Burn": 1, "Poison": 2, "Stunned": 3}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+ACTION_DTYPE = np.dtype([
+    ("match", "<u4"),
+    ("turn", "<u2"),
+    ("kind", "u1"),
+    ("status", "u1"),
+    ("side", "u1"),       # acting side: 0 = npc_a, 1 = npc_b (ids alone collide in a mirror match)
+    ("actor", "<i2"),
+    ("target", "<i2"),
+    ("move", "<i2"),
+    ("damage", "<i2"),
+    ("actor_hp", "<i4"),
+    ("target_hp", "<i4"),
+])
+
+MATCH_DTYPE = np.dtype([
+    ("npc_a", "<i2"),
+    ("npc_b", "<i2"),
+    ("level", "<u2"),
+    ("winner", "u1"),     # 0 = npc_a, 1 = npc_b
+    ("seed", "<i8"),
+    ("turns", "<u2"),
+    ("first", "<u8"),     # index of the match's first action record
+    ("count", "<u4"),
+])
+
+
+class TraceBuilder:
+    """Simulates battles straight into action records (no log or action dicts)."""
+
+    def __init__(self, data: Optional[GameData] = None):
+        # one snapshot for the whole trace, so ids stay consistent across a data reload
+        self.data = data or current_data()
+        self.npc_names = [npc.name for npc in self.data.npcs]
+        self.move_names = [move.name for move in self.data.moves]
+        self._npc_by_name = {npc.name: npc.id for npc in self.data.npcs}
+        self._actions: List[tuple] = []
+        self._matches: List[tuple] = []
+
+    def add_battle(self, npc_a: str, npc_b: str, level: int = 50, seed: Optional[int] = None,
+                   max_turns: int = 200):
+        a = build_combatant(npc_a, level, self.data)
+        b = build_combatant(npc_b, level, self.data)
+        events: List[Event] = []
+        turns = run_battle(a, b, random.Random(seed), max_turns, events)
+        match = len(self._matches)
+        first = len(self._actions)
+        self._encode(match, events)
+        self._matches.append((a.npc_id, b.npc_id, level, 0 if a.hp > 0 else 1, -1 if seed is None else seed,
+                              turns, first, len(self._actions) - first))
+
+    def _encode(self, match: int, events: List[Event]):
+        npc = self._npc_by_name
+        append = self._actions.append
+        for ev in events:
+            if ev[0] == EV_MOVE:
+                _, turn, actor, move, target, dmg, target_hp, _, status, actor_hp, side = ev
+                append((match, turn, KIND_MOVE, STATUS_CODES[status], side, npc[actor], npc[target],
+                        self.data.move_ids[move], dmg, actor_hp, target_hp))
+            elif ev[0] == EV_STUNNED:
+                append((match, ev[1], KIND_STUNNED, STATUS_CODES["Stunned"], ev[3], npc[ev[2]], -1, -1, 0, -1, -1))
+
+    def build(self) -> "Trace":
+        return Trace(np.array(self._actions, dtype=ACTION_DTYPE), np.array(self._matches, dtype=MATCH_DTYPE),
+                     self.npc_names, self.move_names)
+
+
+class Trace:
+    def __init__(self, actions: np.ndarray, matches: np.ndarray, npc_names: Sequence[str],
+                 move_names: Sequence[str]):
+        self.actions = actions
+        self.matches = matches
+        self.npc_names = list(npc_names)
+        self.move_names = list(move_names)
+
+    def __len__(self):
+        return len(self.matches)
+
+    def action(self, index: int) -> BattleAction:
+        r = self.actions[index]
+        actor = self.npc_names[r["actor"]]
+        side = SIDE_NAMES[r["side"]]
+        if r["kind"] == KIND_STUNNED:
+            return BattleAction(turn=int(r["turn"]), actor=actor, side=side, action="stunned", damage=0,
+                                status_applied="Stunned (skipped)")
+        return BattleAction(
+            turn=int(r["turn"]),
+            actor=actor,
+            side=side,
+            action=self.move_names[r["move"]],
+            target=self.npc_names[r["target"]],
+            damage=int(r["damage"]),
+            status_applied=STATUS_NAMES[int(r["status"])],
+            actor_hp=int(r["actor_hp"]),
+            target_hp=int(r["target_hp"]),
+        )
+
+    def match_actions(self, match: int) -> Iterator[BattleAction]:
+        """Lazily rebuild one match's BattleAction models."""
+        m = self.matches[match]
+        first = int(m["first"])
+        for i in range(first, first + int(m["count"])):
+            yield self.action(i)
+
+    def winner(self, match: int) -> str:
+        m = self.matches[match]
+        return self.npc_names[m["npc_b"] if m["winner"] else m["npc_a"]]
+
+    def save(self, path: str, fmt: str = "npy"):
+        os.makedirs(path, exist_ok=True)
+        if fmt == "npy":
+            np.save(os.path.join(path, "actions.npy"), self.actions)
+            np.save(os.path.join(path, "matches.npy"), self.matches)
+        elif fmt == "parquet":
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError as e:
+                raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow).") from e
+            for name, arr in (("actions", self.actions), ("matches", self.matches)):
+                table = pa.table({field: arr[field] for field in arr.dtype.names})
+                pq.write_table(table, os.path.join(path, f"{name}.parquet"))
+        else:
+            raise ValueError(f"Unknown trace format: {fmt}")
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": TRACE_VERSION, "format": fmt, "npc_names": self.npc_names,
+                       "move_names": self.move_names}, f)
+
+
+def read_trace(path: str) -> Trace:
+    """Open a trace directory; .npy traces are memory-mapped, not loaded."""
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta["version"] != TRACE_VERSION:
+        raise ValueError(f"Unsupported trace version {meta['version']}")
+    if meta["format"] == "npy":
+        actions = np.load(os.path.join(path, "actions.npy"), mmap_mode="r")
+        matches = np.load(os.path.join(path, "matches.npy"), mmap_mode="r")
+    else:
+        import pyarrow.parquet as pq
+        arrays = []
+        for name, dtype in (("actions", ACTION_DTYPE), ("matches", MATCH_DTYPE)):
+            table = pq.read_table(os.path.join(path, f"{name}.parquet"))
+            arr = np.empty(table.num_rows, dtype=dtype)
+            for field in dtype.names:
+                arr[field] = table.column(field).to_numpy()
+            arrays.append(arr)
+        actions, matches = arrays
+    return Trace(actions, matches, meta["npc_names"], meta["move_names"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate seeded battles into a compact trace")
+    parser.add_argument("out")
+    parser.add_argument("--npc-a", required=True)
+    parser.add_argument("--npc-b", required=True)
+    parser.add_argument("--level", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0, help="first seed")
+    parser.add_argument("--samples", type=int, default=1000)
+    parser.add_argument("--max-turns", type=int, default=200)
+    parser.add_argument("--format", choices=["npy", "parquet"], default="npy")
+    args = parser.parse_args()
+
+    builder = TraceBuilder()
+    for s in range(args.seed, args.seed + args.samples):
+        builder.add_battle(args.npc_a, args.npc_b, args.level, s, args.max_turns)
+    trace = builder.build()
+    trace.save(args.out, args.format)
+    print(f"Wrote {len(trace)} matches / {len(trace.actions)} actions to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from server.analytics import AnalyticsStore, parse_question, replay_key, simulate_records
+from server.matrix import simulate_cell
+from server.battle_engine import simulate_battle
+
+
+@pytest.fixture
+def store():
+    s = AnalyticsStore(":memory:", flush_every=50)
+    yield s
+    s.close()
+
+
+def test_win_rate_rollup_matches_matrix(store):
+    seeds = range(7, 7 + 120)
+    store.add(simulate_records("embermage", "ironknight", 50, seeds))
+    store.add(simulate_records("windblade", "mistcaller", 40, seeds))
+    rows = store.query("win_rate", npc_a="EmberMage", level=50)["rows"]
+    expected = simulate_cell({"npc_a": "embermage", "npc_b": "ironknight", "level": 50, "seed": 7,
+                              "samples": 120, "max_turns": 200})
+    assert len(rows) == 1
+    assert (rows[0]["battles"], rows[0]["wins_a"]) == (120, expected["wins_a"])
+    assert rows[0]["mean_turns"] == pytest.approx(expected["mean_turns"], abs=0.01)
+    # npc alone matches either side
+    assert [r["npc_a"] for r in store.query("win_rate", npc="mistcaller")["rows"]] == ["windblade"]
+    assert store.query("summary")["rows"][0]["battles"] == 240
+
+
+def test_move_rollups_match_raw_actions(store):
+    store.add(simulate_records("embermage", "ironknight", 50, range(60)))
+    # full batches are written in the background; wait for them before reading raw rows
+    store.flush()
+    uses = damage = procs = 0
+    for battle_id, in store.conn.execute("SELECT id FROM battles"):
+        for move, dmg, status in store.conn.execute(
+                "SELECT move, damage, status_applied FROM actions WHERE battle_id = ? AND actor = 'embermage' "
+                "AND stunned = 0", (battle_id,)):
+            if move == "Firebolt":
+                uses, damage, procs = uses + 1, damage + dmg, procs + (status == "Burn")
+    row = store.query("move_damage", npc="embermage", move="Firebolt")["rows"][0]
+    assert row["uses"] == uses and row["avg_damage"] == round(damage / uses, 2)
+    proc_row = store.query("status_procs", npc="embermage", move="Firebolt")["rows"][0]
+    assert proc_row["burn"] == procs
+    with pytest.raises(ValueError):
+        store.query("move_damage", npc_a="embermage")
+    with pytest.raises(ValueError):
+        store.query("nonsense")
+
+
+def test_mirror_matches_stay_out_of_win_rates(store):
+    store.record(simulate_battle("embermage", "embermage", 50, 1), "embermage", "embermage", 50, 1)
+    row = store.query("win_rate")["rows"][0]
+    assert row["battles"] == 1 and row["wins_a"] == 0 and row["win_rate_a"] is None
+
+
+def test_parse_question():
+    assert parse_question("How often does WindBlade beat EmberMage at level 40?") == {
+        "kind": "win_rate", "npc_a": "windblade", "npc_b": "embermage", "level": 40}
+    assert parse_question("average damage of Firebolt by embermage") == {
+        "kind": "move_damage", "npc": "embermage", "move": "Firebolt"}
+    assert parse_question("how many battles so far")["kind"] == "summary"
+    assert parse_question("tell me about firebolt by embermage") == {"kind": "summary", "npc": "embermage"}
+
+
+def test_seeded_replays_are_counted_once(store):
+    result = simulate_battle("embermage", "ironknight", 50, 3)
+    key = replay_key("embermage", "ironknight", 50, 3, 200, result["data_version"])
+    for _ in range(3):
+        store.record(result, "embermage", "ironknight", 50, 3, key=key)
+    # an ingest of the same seed is the same battle
+    store.add(simulate_records("embermage", "ironknight", 50, [3, 4]))
+    assert store.query("summary")["rows"][0]["battles"] == 2
+    assert replay_key("embermage", "ironknight", 50, None, 200, result["data_version"]) is None
+    store.record(result, "embermage", "ironknight", 50)
+    assert store.query("summary")["rows"][0]["battles"] == 3
+
+
+def test_recording_switch_and_retention():
+    store = AnalyticsStore(":memory:", recording=False, retention_days=1)
+    store.record(simulate_battle("embermage", "ironknight", 50, 1), "embermage", "ironknight", 50, 1)
+    assert store.query("summary")["rows"][0]["battles"] == 0
+    old = simulate_records("embermage", "ironknight", 50, [1])
+    old[0] = (old[0][0][:8] + (time.time() - 2 * 86400,) + old[0][0][9:], old[0][1])
+    store.add(old + simulate_records("embermage", "ironknight", 50, [2]))
+    store.flush()
+    # raw rows past the retention window are gone, the rollups still count them
+    assert [seed for seed, in store.conn.execute("SELECT seed FROM battles")] == [2]
+    assert store.conn.execute("SELECT COUNT(DISTINCT battle_id) FROM actions").fetchone()[0] == 1
+    assert store.query("win_rate")["rows"][0]["battles"] == 2
+    store.close()
+
+
+def test_failed_flush_keeps_the_batch(store, monkeypatch):
+    store.add(simulate_records("embermage", "ironknight", 50, range(3)))
+
+    def broken(pending):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(store, "_write", broken)
+    with pytest.raises(sqlite3.OperationalError):
+        store.flush()
+    monkeypatch.undo()
+    assert store.query("summary")["rows"][0]["battles"] == 3
+
+
+def test_full_buffer_is_written_off_the_callers_thread():
+    store = AnalyticsStore(":memory:", flush_every=5)
+    threads = []
+    write = store._write
+    store._write = lambda pending: (threads.append(threading.current_thread().name), write(pending))
+    store.add(simulate_records("embermage", "ironknight", 50, range(5)))
+    deadline = time.time() + 5
+    while not threads and time.time() < deadline:
+        time.sleep(0.01)
+    assert threads == ["analytics-writer"]
+    assert store.query("summary")["rows"][0]["battles"] == 5
+    store.close()
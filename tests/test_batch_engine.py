@@ -0,0 +1,37 @@
+from collections import Counter
+
+from server.battle_engine import simulate_battle
+from server.batch_engine import simulate_battles_batch
+
+
+def test_batch_is_deterministic_for_seed():
+    r1 = simulate_battles_batch("embermage", "embermage", n=200, seed=7)
+    r2 = simulate_battles_batch("embermage", "embermage", n=200, seed=7)
+    assert r1 == r2
+    assert r1["npc_a"]["wins"] + r1["npc_b"]["wins"] == 200
+    assert sum(r1["turns_histogram"]) == 200
+
+
+def test_batch_matches_scalar_distribution():
+    n = 2000
+    batch = simulate_battles_batch("embermage", "embermage", n=n, seed=1)
+    scalar = [simulate_battle("embermage", "embermage", seed=s) for s in range(n)]
+    scalar_turns = Counter(r["turns"] for r in scalar)
+    for t in set(scalar_turns) | {t for t, c in enumerate(batch["turns_histogram"]) if c}:
+        assert abs(batch["turns_histogram"][t] - scalar_turns.get(t, 0)) / n < 0.05
+    scalar_hits = [a["damage"] for r in scalar for a in r["actions"]]
+    batch_hits = batch["npc_a"]["damage"]["per_hit_histogram"]
+    batch_hits = [sum(c for c in batch_hits), sum(d * c for d, c in enumerate(batch_hits))]
+    batch_b = batch["npc_b"]["damage"]["per_hit_histogram"]
+    batch_hits[0] += sum(batch_b)
+    batch_hits[1] += sum(d * c for d, c in enumerate(batch_b))
+    assert abs(batch_hits[1] / batch_hits[0] - sum(scalar_hits) / len(scalar_hits)) < 0.5
+
+
+def test_batch_one_sided_matchup():
+    # WindBlade outspeeds EmberMage, so only it ever acts
+    res = simulate_battles_batch("embermage", "windblade", n=100, seed=3)
+    scalar = simulate_battle("embermage", "windblade", seed=3)
+    assert res["npc_b"]["wins"] == 100
+    assert scalar["winner"] == res["npc_b"]["name"]
+    assert res["npc_a"]["damage"]["total_mean"] == 0.0
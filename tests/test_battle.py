@@ -3,3 +3,83 @@ def test_simulate():
     out = simulate_battle("embermage","windblade", level=50, seed=1)
     assert "winner" in out
     assert isinstance(out["log"], list)
+
+def test_seeded_battle_ignores_global_random():
+    import random
+    first = simulate_battle("embermage", "embermage", seed=5)
+    random.seed(999); random.random()
+    assert simulate_battle("embermage", "embermage", seed=5) == first
+
+def test_seeded_battles_in_threads():
+    from concurrent.futures import ThreadPoolExecutor
+    expected = [simulate_battle("embermage", "embermage", seed=s) for s in range(20)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        got = list(pool.map(lambda s: simulate_battle("embermage", "embermage", seed=s), range(20)))
+    assert got == expected
+
+def test_numpy_generator_rng():
+    import numpy as np
+    r1 = simulate_battle("embermage", "embermage", rng=np.random.default_rng(3))
+    r2 = simulate_battle("embermage", "embermage", rng=np.random.default_rng(3))
+    assert r1 == r2
+
+def test_log_levels():
+    full = simulate_battle("embermage", "embermage", seed=2)
+    actions = simulate_battle("embermage", "embermage", seed=2, log_level="actions")
+    none = simulate_battle("embermage", "embermage", seed=2, log_level="none")
+    assert none == {"winner": full["winner"], "turns": full["turns"], "data_version": full["data_version"]}
+    assert actions["actions"] == full["actions"] and "log" not in actions
+    assert full["log"][0].startswith("Battle start:")
+
+def test_compiled_auto_moves():
+    from server.battle_engine import GAME_DATA, build_combatant, choose_move_auto
+    assert choose_move_auto(build_combatant("embermage")) == "Firebolt"
+    assert choose_move_auto(build_combatant("ironknight")) == "Earthquake"
+    npc = GAME_DATA.npc("windblade")
+    assert GAME_DATA.moves[npc.auto_move_id].name == "Backstab"
+    assert [GAME_DATA.moves[m].name for m in npc.move_ids] == GAME_DATA.raw_npcs["windblade"]["moves"]
+
+def test_stream_battle_matches_simulate():
+    from server.battle_engine import stream_battle
+    events = list(stream_battle("embermage", "embermage", seed=4))
+    full = simulate_battle("embermage", "embermage", seed=4)
+    assert events[0]["type"] == "start" and events[-1]["type"] == "end"
+    assert [line for e in events[:-1] for line in e["log"]] == full["log"]
+    assert [a for e in events[1:-1] for a in e["actions"]] == full["actions"]
+    assert events[-1] == {"type": "end", "winner": full["winner"], "turns": full["turns"]}
+
+
+def test_damage_table_matches_formula_with_type_effectiveness():
+    from server.battle_engine import GAME_DATA, build_combatant, move_base_damage
+    from server.gamedata import damage_formula
+
+    knight, mage = build_combatant("ironknight", 37), build_combatant("embermage", 37)
+    quake = GAME_DATA.move("Earthquake")
+    assert GAME_DATA.npc("embermage").type == "Fire"
+    expected = damage_formula(37, quake.power, knight.attack, mage.defense, 1.2)
+    assert move_base_damage(knight, mage, quake) == expected
+    # mixed levels are not tabulated and fall back to the formula
+    mage_60 = build_combatant("embermage", 60)
+    assert move_base_damage(knight, mage_60, quake) == damage_formula(37, quake.power, knight.attack,
+                                                                      mage_60.defense, 1.2)
+    assert GAME_DATA.damage.as_numpy().shape == GAME_DATA.damage.shape
+
+
+def test_crit_multiplies_damage():
+    from server.battle_engine import GAME_DATA, build_combatant, move_base_damage, roll_damage
+
+    class Fixed:
+        def __init__(self, r):
+            self.r = r
+
+        def uniform(self, lo, hi):
+            return 1.0
+
+        def random(self):
+            return self.r
+
+    rogue, mage = build_combatant("windblade"), build_combatant("embermage")
+    backstab = GAME_DATA.move("Backstab")
+    base = move_base_damage(rogue, mage, backstab)
+    assert roll_damage(rogue, mage, backstab, Fixed(0.99)) == int(base)
+    assert roll_damage(rogue, mage, backstab, Fixed(0.0)) == int(base * 1.5)
@@ -0,0 +1,100 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from mcp.shared.memory import create_connected_server_and_client_session
+from mcp.types import CallToolResult, TextContent
+
+from client import ArenaClient, AsyncArenaClient, ToolError
+from server import mcp_server
+from server.battle_engine import simulate_battle
+from server.sim_pool import SimulationPool
+
+
+@pytest.fixture
+def connector(monkeypatch):
+    """In-memory connection to the real server; counts handshakes."""
+    pool = SimulationPool(kind="thread", workers=2, max_queue=16)
+    monkeypatch.setattr(mcp_server, "sim_pool", pool)
+
+    @asynccontextmanager
+    async def connect(message_handler):
+        connect.opened += 1
+        async with create_connected_server_and_client_session(mcp_server.mcp_server,
+                                                              message_handler=message_handler) as session:
+            yield session
+
+    connect.opened = 0
+    yield connect
+    pool.shutdown()
+
+
+def _battle(seed):
+    return ("simulate_battle_tool", {"npc_a": "embermage", "npc_b": "ironknight", "seed": seed, "log_level": "none"})
+
+
+def test_batch_reuses_pooled_sessions(connector):
+    async def scenario():
+        async with AsyncArenaClient(connector, pool_size=2) as client:
+            first = await client.call_tools([_battle(s) for s in range(6)])
+            second = await client.call_tools([_battle(s) for s in range(6)])
+            return first, second, client.stats()
+
+    first, second, stats = asyncio.run(scenario())
+    expected = [simulate_battle("embermage", "ironknight", seed=s, log_level="none") for s in range(6)]
+    assert first == second == expected
+    assert connector.opened == stats["opened"] <= 2 and stats["calls"] == 12
+
+
+def test_tool_errors_are_raised_not_retried(connector):
+    async def scenario():
+        async with AsyncArenaClient(connector, pool_size=1) as client:
+            with pytest.raises(ToolError, match="nobody"):
+                await client.call_tool("simulate_battle_tool", {"npc_a": "nobody", "npc_b": "ironknight"})
+            results = await client.call_tools([_battle(1), ("no_such_tool", {})], return_exceptions=True)
+            return results, client.stats()
+
+    results, stats = asyncio.run(scenario())
+    assert results[0]["winner"] and isinstance(results[1], ToolError)
+    assert stats["opened"] == 1 and stats["reconnects"] == 0
+
+
+class _FlakySession:
+    """First session hangs until its transport is reported broken; later ones answer."""
+
+    def __init__(self, broken: bool, message_handler):
+        self.broken = broken
+        self.message_handler = message_handler
+
+    async def call_tool(self, name, arguments, timeout=None, progress_callback=None):
+        if self.broken:
+            await self.message_handler(ConnectionResetError("server went away"))
+            await asyncio.Event().wait()
+        return CallToolResult(content=[TextContent(type="text", text='{"ok": true}')])
+
+
+def test_reconnects_after_transport_failure():
+    sessions = []
+
+    @asynccontextmanager
+    async def connect(message_handler):
+        sessions.append(_FlakySession(not sessions, message_handler))
+        yield sessions[-1]
+
+    async def scenario():
+        async with AsyncArenaClient(connect, pool_size=1) as client:
+            result = await client.call_tool("anything")
+            return result, client.stats()
+
+    result, stats = asyncio.run(scenario())
+    assert result == {"ok": True}
+    assert len(sessions) == 2 and stats["reconnects"] == 1
+
+
+def test_sync_client_keeps_session_between_calls(connector):
+    with ArenaClient(connector, pool_size=1) as client:
+        assert "simulate_battle_tool" in client.list_tools()
+        assert client.call_tool(*_battle(3))["winner"]
+        assert client.call_tools([_battle(4), _battle(5)])[1]["winner"]
+        assert client.stats()["opened"] == 1
+    assert connector.opened == 1
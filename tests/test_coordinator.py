@@ -0,0 +1,139 @@
+import asyncio
+import random
+import threading
+import time
+
+import httpx
+import pytest
+
+from server.backend import BackendCache, SQLiteBackend, open_backend
+from server.cache import LRUCache, TieredCache
+from server.coordinator import Coordinator, http_runner, merge, run_shard, shard_plan, split_slices
+from server.jobs import expand_spec
+from server.matrix import simulate_cell
+
+SPEC = {"matchups": [{"npc_a": "embermage", "npc_b": "ironknight", "samples": 23},
+                     {"npc_a": "windblade", "npc_b": "mistcaller", "samples": 4, "seed": 7}]}
+
+
+async def _inline(cells, slices):
+    return run_shard(cells, slices)
+
+
+def test_sqlite_backend_speaks_the_redis_subset(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    one, two = SQLiteBackend(path), open_backend(f"sqlite:{path}")
+    assert one.set("k", "v") and two.get("k") == b"v"
+    assert one.set("k", "w", nx=True) is None and two.get("k") == b"v"
+    assert (one.incr("n"), two.incr("n", 5)) == (1, 6)
+    one.set("brief", 1, ex=0.05)
+    assert two.get("brief") == b"1"
+    time.sleep(0.1)
+    assert two.get("brief") is None and two.set("brief", 2, nx=True)
+    assert one.hset("h", 0, "a") == 1 and one.hset("h", mapping={0: "b", 1: "c"}) == 1
+    assert two.hgetall("h") == {b"0": b"b", b"1": b"c"} and two.hget("h", 1) == b"c"
+    assert one.delete("k", "h", "missing") == 2 and two.get("k") is None and two.hgetall("h") == {}
+
+    # expired rows are deleted, not just hidden
+    pruned = SQLiteBackend(str(tmp_path / "pruned.sqlite3"), purge_every=3)
+    pruned.set("old", b"x", ex=0.01)
+    pruned.hset("shards", 0, "rows")
+    assert pruned.expire("shards", 0.01) and not pruned.expire("missing", 1)
+    time.sleep(0.05)
+    assert pruned.hgetall("shards") == {}
+    pruned.set("a", 1)
+    pruned.set("b", 2)
+    assert pruned.conn.execute("SELECT COUNT(*) FROM kv").fetchone()[0] == 2
+    assert pruned.conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0] == 0
+    pruned.close()
+
+    # two workers' caches share entries through the backend tier
+    TieredCache(LRUCache(), BackendCache(one)).set("cell", b"{}")
+    assert TieredCache(LRUCache(), BackendCache(two)).get("cell") == b"{}"
+    one.close()
+    two.close()
+
+
+def test_async_cache_calls_keep_the_shared_tier_off_the_loop(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "results.sqlite3"))
+    threads = []
+
+    class Recording(BackendCache):
+        def get(self, key):
+            threads.append(threading.current_thread())
+            return super().get(key)
+
+    async def scenario():
+        writer, reader = TieredCache(LRUCache(), BackendCache(backend)), TieredCache(LRUCache(), Recording(backend))
+        await writer.aset("cell", b"{}")
+        first, again = await reader.aget("cell"), await reader.aget("cell")
+        return first, again
+
+    assert asyncio.run(scenario()) == (b"{}", b"{}")
+    # the second read is a memory hit and never reaches the backend
+    assert len(threads) == 1 and threads[0] is not threading.main_thread()
+    backend.close()
+
+
+def test_sharded_sweep_matches_one_process():
+    cells = expand_spec(SPEC)
+    plan = shard_plan(cells, 5)
+    assert sum(count for shard in plan for _, _, count in shard) == 27
+    assert [len(shard) for shard in plan] == [1, 2, 2, 2, 2]
+
+    async def sweep(shards):
+        return await Coordinator([_inline] * 3).run(cells, shards=shards)
+
+    five, two = asyncio.run(sweep(5)), asyncio.run(sweep(2))
+    assert five["cells"] == two["cells"] and five["runner_failures"] == 0
+    for cell, agg in zip(cells, five["cells"]):
+        expected = simulate_cell(cell)
+        assert (agg["battles"], agg["wins_a"]) == (cell["samples"], expected["wins_a"])
+        assert agg["mean_turns"] == pytest.approx(expected["mean_turns"])
+
+    # rows from any runner, in any order and at any granularity, merge to the same aggregate
+    rows = [row for shard in plan for group in split_slices(shard, 3) for row in run_shard(cells, group)]
+    random.Random(1).shuffle(rows)
+    assert merge(cells, [rows])["cells"] == five["cells"]
+    with pytest.raises(ValueError):
+        merge(cells, [rows[1:]])
+    with pytest.raises(ValueError):
+        merge(cells, [rows, rows[:1]])
+
+
+def test_failed_runner_hands_shards_back_and_backend_keeps_them(tmp_path):
+    cells = expand_spec(SPEC)
+    backend = SQLiteBackend(str(tmp_path / "results.sqlite3"))
+    calls = []
+
+    async def broken(cells, slices):
+        raise ConnectionError("host down")
+
+    async def counting(cells, slices):
+        calls.append(slices)
+        await asyncio.sleep(0)
+        return run_shard(cells, slices)
+
+    first = asyncio.run(Coordinator([broken, counting], backend).run(cells, shards=4))
+    assert first["runner_failures"] == 1 and len(calls) == 4
+    again = asyncio.run(Coordinator([counting], backend).run(cells, shards=4))
+    assert len(calls) == 4 and again["shards_reused"] == 4 and again["cells"] == first["cells"]
+    with pytest.raises(RuntimeError):
+        asyncio.run(Coordinator([broken]).run(cells, shards=2))
+    backend.close()
+
+
+def test_http_runner_gives_up_on_a_busy_host():
+    posts = []
+
+    def busy(request):
+        posts.append(request)
+        return httpx.Response(503, headers={"Retry-After": "0"})
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(busy)) as client:
+            await http_runner(client, "http://peer:8000/", retries=2)([], [(0, 0, 1)])
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(scenario())
+    assert len(posts) == 3 and str(posts[0].url) == "http://peer:8000/battle/shard"
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from server.battle_engine import simulate_battle, stream_battle
+from server.datastore import DataStore, DataWatcher, STORE
+from server import gamedata
+from server.gamedata import DATA_DIR, DataValidationError, GameData
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    for name in ("npcs.json", "moves.json", "type_chart.json"):
+        shutil.copy(f"{DATA_DIR}/{name}", tmp_path / name)
+    return tmp_path
+
+
+def _store(path):
+    return DataStore(str(path / "npcs.json"), str(path / "moves.json"), str(path / "type_chart.json"))
+
+
+def _edit_moves(path, **changes):
+    moves = json.loads((path / "moves.json").read_text())
+    for name, fields in changes.items():
+        moves[name].update(fields)
+    (path / "moves.json").write_text(json.dumps(moves))
+
+
+def test_reload_swaps_version_and_notifies(data_dir):
+    store = _store(data_dir)
+    old = store.current
+    seen = []
+    store.subscribe(lambda a, b: seen.append((a.version, b.version)))
+    _edit_moves(data_dir, Firebolt={"power": 120})
+    new = store.reload()
+    assert new.version != old.version and store.current is new
+    assert new.move("Firebolt").power == 120 and old.move("Firebolt").power == 85
+    assert seen == [(old.version, new.version)]
+
+
+def test_invalid_data_is_rejected_and_old_snapshot_kept(data_dir):
+    store = _store(data_dir)
+    old = store.current
+    _edit_moves(data_dir, Firebolt={"burn_chance": 2, "category": "Melee"})
+    with pytest.raises(DataValidationError) as err:
+        store.reload()
+    assert len(err.value.problems) == 2
+    assert store.current is old
+
+    (data_dir / "npcs.json").write_text("{ not json")
+    with pytest.raises(DataValidationError):
+        store.reload()
+    assert store.current is old
+
+
+def test_malformed_types_are_rejected_and_watcher_survives(data_dir, monkeypatch):
+    store = _store(data_dir)
+    old = store.current
+    npcs = json.loads((data_dir / "npcs.json").read_text())
+    npcs["embermage"]["level"] = "fifty"
+    npcs["windblade"]["moves"].append(["Gust"])
+    (data_dir / "npcs.json").write_text(json.dumps(npcs))
+    _edit_moves(data_dir, Firebolt={"type": ["Fire"]})
+    with pytest.raises(DataValidationError) as err:
+        store.reload()
+    assert len(err.value.problems) == 3 and store.current is old
+
+    # whatever validate_raw misses is still a validation error, and the watcher keeps polling after it
+    monkeypatch.setattr("server.datastore.validate_raw", lambda *raw: [])
+    with pytest.raises(DataValidationError):
+        store.reload()
+    watcher = DataWatcher(store, interval=60)
+    os.utime(data_dir / "npcs.json", ns=(1, 1))
+    assert watcher.check() is False
+    monkeypatch.setattr(store, "reload", lambda: 1 / 0)
+    os.utime(data_dir / "npcs.json", ns=(2, 2))
+    assert watcher.check() is False and store.current is old
+
+
+def test_watcher_reloads_on_file_change(data_dir):
+    store = _store(data_dir)
+    watcher = DataWatcher(store, interval=60)
+    assert not watcher.check()
+    _edit_moves(data_dir, Backstab={"power": 10})
+    assert watcher.check()
+    assert store.current.move("Backstab").power == 10
+
+
+def test_in_flight_battle_finishes_on_its_snapshot():
+    baseline = simulate_battle("embermage", "ironknight", seed=4, log_level="actions")
+    events = stream_battle("embermage", "ironknight", seed=4)
+    start = next(events)
+    moves = json.loads(json.dumps(STORE.current.raw_moves))
+    moves["Firebolt"]["power"] = 5
+    old = STORE.swap(GameData(STORE.current.raw_npcs, moves, STORE.current.type_chart))
+    try:
+        actions = [a for e in events if e["type"] == "turn" for a in e["actions"]]
+        assert start["data_version"] == baseline["data_version"] == old.version
+        assert actions == baseline["actions"]
+        assert simulate_battle("embermage", "ironknight", seed=4)["data_version"] != old.version
+    finally:
+        STORE.swap(old)
+
+
+def test_compiled_cache_skips_compile_until_sources_change(data_dir, monkeypatch):
+    paths = [str(data_dir / n) for n in ("npcs.json", "moves.json", "type_chart.json")]
+    cache = str(data_dir / "compiled.pickle")
+    first = gamedata.load_compiled(*paths, cache_path=cache)
+
+    def no_compile(*args):
+        raise AssertionError("compiled cache was not used")
+
+    monkeypatch.setattr(gamedata, "load_game_data", no_compile)
+    assert gamedata.load_compiled(*paths, cache_path=cache).version == first.version
+    monkeypatch.undo()
+    _edit_moves(data_dir, Firebolt={"power": 120})
+    assert gamedata.load_compiled(*paths, cache_path=cache).move("Firebolt").power == 120
+    (data_dir / "compiled.pickle").write_bytes(b"garbage")
+    assert gamedata.load_compiled(*paths, cache_path=cache).move("Firebolt").power == 120
+    # new battle rules rebuild the tables even though the JSON is unchanged
+    monkeypatch.setattr(gamedata, "ENGINE_VERSION", gamedata.ENGINE_VERSION + 1)
+    rebuilt = []
+    monkeypatch.setattr(gamedata, "load_game_data", lambda *a: rebuilt.append(a) or gamedata.GameData(
+        *gamedata.read_raw_data(*a)))
+    gamedata.load_compiled(*paths, cache_path=cache)
+    assert len(rebuilt) == 1
+
+
+def test_stdio_import_skips_http_stack():
+    # cold-start guard: stdio sessions must not pay for FastAPI, the HTTP app or the Groq client
+    code = ("import sys, server.mcp_server; print(sorted(m for m in ('fastapi', 'server.http_app', "
+            "'server.groq_client', 'server.models', 'server.jobs', 'server.replay') if m in sys.modules))")
+    root = os.path.dirname(os.path.dirname(gamedata.__file__))
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
+
+
+def test_process_workers_run_on_the_parents_snapshot(data_dir, monkeypatch):
+    from server.sim_pool import SimulationPool
+
+    # the parent runs on edited data while the files on disk say otherwise
+    _edit_moves(data_dir, Firebolt={"power": 120})
+    edited = _store(data_dir).current
+    monkeypatch.setattr(STORE, "_current", edited)
+    pool = SimulationPool(kind="process", workers=1)
+    try:
+        result = asyncio.run(pool.run(simulate_battle, "embermage", "ironknight", seed=1, log_level="none"))
+    finally:
+        pool.shutdown()
+    assert result["data_version"] == edited.version
+
+
+def test_first_load_is_validated(data_dir):
+    _edit_moves(data_dir, Firebolt={"category": "Melee"})
+    with pytest.raises(DataValidationError):
+        _store(data_dir).current
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from server.cache import LRUCache, TieredCache
+from server.groq_client import AsyncGroqClient
+
+
+def test_async_client_caches_completions(groq_stub):
+    base_url, received = groq_stub
+    client = AsyncGroqClient(api_key="test", base_url=base_url, cache=TieredCache(LRUCache()))
+
+    async def scenario():
+        first = await client.complete("narrate battle 1", model="m")
+        again = await client.complete("narrate battle 1", model="m")
+        warmer = await client.complete("narrate battle 1", model="m", temperature=0.9)
+        await client.aclose()
+        return first, again, warmer
+
+    first, again, warmer = asyncio.run(scenario())
+    assert first == again == "narration: narrate battle 1"
+    assert len(received) == 2
+    assert received[1]["temperature"] == 0.9
+
+
+def test_async_client_concurrent_calls_share_pool(groq_stub):
+    base_url, received = groq_stub
+    client = AsyncGroqClient(api_key="test", base_url=base_url, max_concurrency=2)
+
+    async def scenario():
+        out = await asyncio.gather(*(client.complete(f"prompt {i}", model="m") for i in range(6)))
+        await client.aclose()
+        return out
+
+    assert len(set(asyncio.run(scenario()))) == 6
+    assert len(received) == 6
+
+
+def test_async_client_requires_key():
+    with pytest.raises(RuntimeError):
+        asyncio.run(AsyncGroqClient(api_key=None).complete("hi"))
+
+
+def test_async_client_streams_tokens(groq_stub):
+    base_url, received = groq_stub
+    client = AsyncGroqClient(api_key="test", base_url=base_url, cache=TieredCache(LRUCache()))
+
+    async def scenario():
+        chunks = [c async for c in client.stream("tell the story", model="m")]
+        cached = [c async for c in client.stream("tell the story", model="m")]
+        await client.aclose()
+        return chunks, cached
+
+    chunks, cached = asyncio.run(scenario())
+    assert len(chunks) > 1 and received[0]["stream"] is True
+    assert cached == ["".join(chunks)] and len(received) == 1
@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+from server.jobs import JobManager, aggregate, expand_spec, plan_chunks, run_chunk
+from server.matrix import simulate_cell
+
+
+async def _inline(fn, *args):
+    return fn(*args)
+
+
+async def _wait_done(manager, job_id):
+    while (await manager.status(job_id, include_cells=False))["status"] in ("queued", "running"):
+        await manager.wait_update(job_id, timeout=0.5)
+    return await manager.status(job_id)
+
+
+def test_chunks_cover_every_battle_once():
+    cells = expand_spec({"matchups": [{"npc_a": "embermage", "npc_b": "ironknight", "samples": 7},
+                                      {"npc_a": "windblade", "npc_b": "mistcaller", "samples": 5, "seed": 3}]})
+    plan = plan_chunks(cells, 4)
+    assert [sum(s[2] for s in chunk) for chunk in plan] == [4, 4, 4]
+    result = aggregate(cells, [run_chunk(cells, chunk) for chunk in plan])
+    for cell, agg in zip(cells, result["cells"]):
+        expected = simulate_cell(cell)
+        assert (agg["battles"], agg["wins_a"]) == (cell["samples"], expected["wins_a"])
+        assert agg["mean_turns"] == pytest.approx(expected["mean_turns"])
+    with pytest.raises(KeyError):
+        expand_spec({"matchups": [{"npc_a": "nobody", "npc_b": "ironknight"}]})
+    with pytest.raises(ValueError):
+        expand_spec({})
+
+
+def test_job_runs_to_completion(tmp_path):
+    async def scenario():
+        manager = JobManager(str(tmp_path / "jobs.db"), _inline, chunk_size=30)
+        job = await manager.submit({"sweep": {"npcs": ["embermage", "windblade"], "samples": 40}})
+        assert job["total"] == 160
+        result = await _wait_done(manager, job["id"])
+
+        def reread(job_id):
+            raise AssertionError("status re-read the stored chunks")
+
+        # polls read the running totals, not every chunk
+        manager.store.chunks = reread
+        assert await manager.status(job["id"]) == result
+        await manager.shutdown()
+        return result
+
+    result = asyncio.run(scenario())
+    assert result["status"] == "done" and result["done"] == 160 and result["chunks_done"] == 6
+    cell = result["cells"][1]
+    assert (cell["npc_a"], cell["npc_b"]) == ("embermage", "windblade")
+    assert cell["wins_a"] == simulate_cell({k: cell[k] for k in
+                                            ("npc_a", "npc_b", "level", "seed", "samples", "max_turns")})["wins_a"]
+
+
+def test_unfinished_job_resumes_after_restart(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    spec = {"matchups": [{"npc_a": "ironknight", "npc_b": "windblade", "samples": 100}]}
+    calls = []
+
+    async def first_run():
+        gate = asyncio.Event()
+
+        async def stall_after_two(fn, *args):
+            if len(calls) >= 2:
+                await gate.wait()  # the "crash" happens while this chunk is in flight
+            calls.append(args[1])
+            return fn(*args)
+
+        manager = JobManager(path, stall_after_two, chunk_size=25, parallel=1)
+        job = await manager.submit(spec)
+        while (await manager.status(job["id"], include_cells=False))["done"] < 50:
+            await asyncio.sleep(0.01)
+        await manager.shutdown()
+        return job["id"]
+
+    async def second_run(job_id):
+        async def counting(fn, *args):
+            calls.append(args[1])
+            return fn(*args)
+
+        manager = JobManager(path, counting, chunk_size=25)
+        assert (await manager.status(job_id, include_cells=False))["status"] == "running"
+        assert manager.resume() == [job_id]
+        result = await _wait_done(manager, job_id)
+        await manager.shutdown()
+        return result
+
+    job_id = asyncio.run(first_run())
+    result = asyncio.run(second_run(job_id))
+    assert result["status"] == "done" and result["done"] == 100
+    # only the two missing chunks ran after the restart
+    assert len(calls) == 4
+    expected = simulate_cell({"npc_a": "ironknight", "npc_b": "windblade", "level": 50, "seed": 0,
+                              "samples": 100, "max_turns": 200})
+    assert result["cells"][0]["wins_a"] == expected["wins_a"]
+
+
+def test_cancel(tmp_path):
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def blocked(fn, *args):
+            await gate.wait()
+
+        manager = JobManager(str(tmp_path / "jobs.db"), blocked)
+        job = await manager.submit({"matchups": [{"npc_a": "embermage", "npc_b": "windblade"}]})
+        await asyncio.sleep(0)
+        assert await manager.cancel(job["id"]) and not await manager.cancel(job["id"])
+        status = await manager.status(job["id"])
+        await manager.shutdown()
+        assert manager.resume() == []
+        return status
+
+    status = asyncio.run(scenario())
+    assert status["status"] == "cancelled" and status["done"] == 0
+
+
+def test_store_without_running_totals_is_upgraded(tmp_path):
+    import json
+    import sqlite3
+
+    cells = expand_spec({"matchups": [{"npc_a": "embermage", "npc_b": "ironknight", "samples": 10}]})
+    plan = plan_chunks(cells, 5)
+    path = str(tmp_path / "jobs.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE jobs (id TEXT PRIMARY KEY, spec TEXT NOT NULL, cells TEXT NOT NULL, status TEXT NOT NULL,
+                           chunk_size INTEGER NOT NULL, total INTEGER NOT NULL, done INTEGER NOT NULL DEFAULT 0,
+                           created_at REAL NOT NULL, updated_at REAL NOT NULL, error TEXT);
+        CREATE TABLE job_chunks (job_id TEXT NOT NULL, chunk INTEGER NOT NULL, result TEXT NOT NULL,
+                                 PRIMARY KEY (job_id, chunk));
+    """)
+    conn.execute("INSERT INTO jobs VALUES ('old', '{}', ?, 'running', 5, 10, 5, 0, 0, NULL)", (json.dumps(cells),))
+    conn.execute("INSERT INTO job_chunks VALUES ('old', 0, ?)", (json.dumps(run_chunk(cells, plan[0])),))
+    conn.commit()
+    conn.close()
+
+    async def scenario():
+        manager = JobManager(path, _inline, chunk_size=5)
+        partial = await manager.status("old")
+        assert manager.resume() == ["old"]
+        return partial, await _wait_done(manager, "old")
+
+    partial, result = asyncio.run(scenario())
+    assert partial["chunks_done"] == 1 and partial["cells"][0]["battles"] == 5
+    assert result["chunks_done"] == 2 and result["cells"] == aggregate(
+        cells, [run_chunk(cells, chunk) for chunk in plan])["cells"]
@@ -0,0 +1,47 @@
+import asyncio
+import copy
+
+from server import battle_engine, matrix
+from server.cache import DiskCache, LRUCache, TieredCache
+from server.datastore import STORE
+from server.gamedata import GameData
+
+
+async def _inline(fn, *args):
+    return fn(*args)
+
+
+def _run(cache, **kwargs):
+    return asyncio.run(matrix.compute_matrix(_inline, cache, **kwargs))
+
+
+def test_matrix_shape_and_cache_hits(tmp_path):
+    cache = TieredCache(LRUCache(), DiskCache(str(tmp_path)))
+    first = _run(cache, levels=[40, 50], samples=5, chunks=3)
+    n = len(battle_engine.NPCS)
+    assert first["computed"] == 2 * n * n and first["cache_hits"] == 0
+    assert len(first["win_rates"]["50"]) == n
+    # WindBlade outspeeds EmberMage at level 50
+    i, j = first["npcs"].index("windblade"), first["npcs"].index("embermage")
+    assert first["win_rates"]["50"][i][j] == 1.0
+
+    # a fresh memory tier still hits the disk tier
+    second = _run(TieredCache(LRUCache(), DiskCache(str(tmp_path))), levels=[40, 50], samples=5)
+    assert second["computed"] == 0
+    assert second["win_rates"] == first["win_rates"]
+
+
+def test_move_edit_invalidates_only_affected_cells():
+    cache = TieredCache(LRUCache())
+    npcs = ["embermage", "ironknight", "windblade"]
+    _run(cache, npcs=npcs, samples=3)
+
+    moves = copy.deepcopy(battle_engine.MOVES)
+    moves["Earthquake"]["power"] = 110
+    old = STORE.swap(GameData(battle_engine.NPCS, moves, battle_engine.GAME_DATA.type_chart))
+    try:
+        again = _run(cache, npcs=npcs, samples=3)
+    finally:
+        STORE.swap(old)
+    # every cell involving IronKnight (the only Earthquake user) is recomputed
+    assert again["computed"] == 5
@@ -0,0 +1,65 @@
+import random
+import threading
+import time
+
+from server.battle_engine import build_combatant, run_battle
+from server.metrics import Registry
+from server.profiler import SamplingProfiler
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    h = registry.histogram("demo_seconds", "demo", ("route",), buckets=(0.1, 1.0))
+    h.observe(0.05, route="/a")
+    h.observe(0.5, route="/a")
+    h.observe(5.0, route="/a")
+    text = registry.render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{route="/a",le="1.0"} 2' in text
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{route="/a"} 3' in text
+
+
+def test_counter_and_scrape_time_gauge():
+    registry = Registry()
+    c = registry.counter("demo_total", "demo", ("kind",))
+    c.inc(kind="x")
+    c.inc(2, kind="x")
+    depth = [7]
+    registry.gauge("demo_depth", "demo", fn=lambda: depth[0])
+    assert 'demo_total{kind="x"} 3' in registry.render()
+    depth[0] = 9
+    assert "demo_depth 9" in registry.render()
+
+
+def test_profiler_sees_battle_loop():
+    profiler = SamplingProfiler(interval=0.001)
+    done = threading.Event()
+
+    def battles():
+        seed = 0
+        while not done.is_set():
+            a, b = build_combatant("embermage"), build_combatant("ironknight")
+            run_battle(a, b, random.Random(seed), 200)
+            seed += 1
+
+    worker = threading.Thread(target=battles)
+    worker.start()
+    profiler.start()
+    try:
+        deadline = time.time() + 10
+        # sampled from the profiler's thread while the battles run on another
+        while time.time() < deadline:
+            time.sleep(0.05)
+            names = {row["function"] for row in profiler.report(top=100)["top_inclusive"]}
+            if "battle_engine.py:play_turn" in names:
+                break
+    finally:
+        profiler.stop()
+        done.set()
+        worker.join()
+    report = profiler.report(top=100)
+    assert report["samples"] > 0 and not report["running"]
+    assert "battle_engine.py:play_turn" in {row["function"] for row in report["top_inclusive"]}
+    assert "battle_engine.py:run_battle" in {row["function"] for row in report["top_inclusive"]}
@@ -0,0 +1,59 @@
+import asyncio
+
+from server.battle_engine import simulate_battle
+from server.narration import battle_digest, estimate_tokens, narrate_batch, split_batch
+
+
+def _long_battle(turns=120):
+    actions = []
+    for t in range(1, turns + 1):
+        actor, target = ("A", "B") if t % 2 else ("B", "A")
+        actions.append({"turn": t, "actor": actor, "action": "Jab", "target": target, "damage": 3,
+                        "status_applied": "Poison" if t == 60 else None, "actor_hp": 500, "target_hp": 500 - t})
+    actions[-1].update(damage=40, target_hp=0)
+    return {"winner": "B", "turns": turns, "actions": actions}
+
+
+def test_digest_keeps_key_moments_within_budget():
+    digest = battle_digest(_long_battle(), budget_tokens=80)
+    assert estimate_tokens(digest) <= 80
+    lines = digest.splitlines()
+    assert lines[:2] == ["A vs B", "Winner: B after 120 turns"]
+    assert lines[-1] == "T120 B Jab -> A -40 (KO)" and any("+Poison" in line for line in lines)
+    assert "..." in lines
+
+    log = simulate_battle("embermage", "ironknight", seed=1)["log"]
+    digest = battle_digest({"battle_log": log}, budget_tokens=60)
+    assert "--- Turn" not in digest and digest.splitlines()[-1] == log[-1]
+
+
+def test_batch_narration_packs_and_splits():
+    prompts = []
+
+    async def fake_query(prompt, max_tokens=512):
+        prompts.append(prompt)
+        if "[[1]]" not in prompt:
+            return "solo"
+        # answer every battle but the last one of the pack
+        count = prompt.count("[[") - 1
+        return "\n".join(f"[[{n}]] story {n}" for n in range(1, count))
+
+    battles = [simulate_battle("embermage", "ironknight", seed=s) for s in range(5)]
+    result = asyncio.run(narrate_batch(battles, fake_query, batch_size=3))
+    assert result["narrations"] == ["story 1", "story 2", "solo", "story 1", "solo"]
+    # two packed requests, one retry for the dropped answer; the 2-battle pack also dropped its last
+    assert result["requests"] == 4 and len(prompts) == 4
+    assert split_batch("[[2]] b\n[[1]] a\n[[9]] x", 2) == ["a", "b"]
+
+
+def test_digest_opens_with_both_sides_of_a_mirror_match():
+    battle = _long_battle()
+    for act in battle["actions"]:
+        act["side"] = "a" if act["actor"] == "A" else "b"
+        act["actor"] = act["target"] = "EmberMage"
+        if act["turn"] % 10 == 5:
+            act["status_applied"] = "Burn"
+    battle["winner"] = "EmberMage"
+    lines = battle_digest(battle, budget_tokens=60).splitlines()
+    assert any(line.startswith("T1 EmberMage") for line in lines)
+    assert any(line.startswith("T2 EmberMage") for line in lines)
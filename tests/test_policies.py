@@ -0,0 +1,75 @@
+import random
+import threading
+
+import pytest
+
+from server.battle_engine import build_combatant, run_battle, simulate_battle
+from server.policies import ExpectiminimaxPolicy, GreedyPolicy, TranspositionTable, make_policy
+
+
+def test_greedy_policy_matches_default_engine():
+    for seed in range(10):
+        plain = [build_combatant("ironknight"), build_combatant("ironknight")]
+        with_policy = [build_combatant("ironknight"), build_combatant("ironknight")]
+        e1, e2 = [], []
+        run_battle(*plain, random.Random(seed), 200, e1)
+        run_battle(*with_policy, random.Random(seed), 200, e2, (GreedyPolicy(), GreedyPolicy()))
+        assert e1 == e2
+
+
+def test_search_is_reproducible_without_budget_and_uses_transposition_table():
+    table = TranspositionTable()
+    a, b = build_combatant("ironknight"), build_combatant("ironknight")
+    policy = ExpectiminimaxPolicy(depth=3, budget_ms=0, table=table)
+    first = policy.choose(a, b, 0, 1)
+    assert policy.last_depth == 3
+    misses = table.misses
+    assert policy.choose(a, b, 0, 1) == first
+    assert table.misses == misses and table.hits > 0
+    assert first in a.data.npc("ironknight").move_ids
+
+    r1 = simulate_battle("ironknight", "ironknight", seed=3, policy_a="expectiminimax", budget_ms=0)
+    r2 = simulate_battle("ironknight", "ironknight", seed=3, policy_a="expectiminimax", budget_ms=0)
+    assert r1 == r2
+
+
+def test_transposition_table_stays_bounded_across_threads():
+    table = TranspositionTable(max_entries=50)
+    sizes = []
+
+    def search():
+        policy = ExpectiminimaxPolicy(depth=4, budget_ms=0, table=table)
+        a, b = build_combatant("ironknight"), build_combatant("embermage")
+        for turn in range(1, 4):
+            policy.choose(a, b, turn % 2, turn)
+            sizes.append(table.stats()["entries"])
+
+    threads = [threading.Thread(target=search) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = table.stats()
+    assert max(sizes) <= 50 and stats["entries"] <= 50
+    assert stats["misses"] > 50 and stats["hits"] > 0
+
+
+def test_search_respects_time_budget():
+    a, b = build_combatant("ironknight"), build_combatant("ironknight")
+    policy = ExpectiminimaxPolicy(depth=8, budget_ms=0.001, table=TranspositionTable())
+    mid = policy.choose(a, b, 0, 1)
+    assert policy.last_depth < 8
+    assert mid in a.data.npc("ironknight").move_ids
+
+
+def test_search_takes_a_guaranteed_knockout():
+    a, b = build_combatant("windblade"), build_combatant("embermage")
+    b.hp = 1
+    policy = ExpectiminimaxPolicy(depth=2, budget_ms=0, table=TranspositionTable())
+    move = a.data.moves[policy.choose(a, b, 0, 1)]
+    assert move.is_damaging
+
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        make_policy("random-walk")
@@ -0,0 +1,68 @@
+import json
+
+import numpy as np
+import pytest
+
+from server import replay
+from server.battle_engine import build_combatant, play_turn, simulate_battle
+
+
+def test_record_matches_simulate_and_journal_replays():
+    rec = replay.record_battle("embermage", "ironknight", seed=7, log_level="full")
+    assert rec["result"] == simulate_battle("embermage", "ironknight", seed=7)
+    journal = json.loads(json.dumps(rec["journal"]))
+    replayed = replay.replay(journal)
+    assert replayed.pop("verified") is True
+    assert replayed == rec["result"]
+
+
+def test_resume_from_snapshot_finishes_like_the_full_run():
+    full = simulate_battle("ironknight", "windblade", seed=11, log_level="actions")
+    rec = replay.record_battle("ironknight", "windblade", seed=11, snapshot_turns=[1, 3])
+    assert [s["turn"] for s in rec["snapshots"]] == [1, 3]
+    snap = json.loads(json.dumps(rec["snapshots"][1]))
+    resumed = replay.resume(snap, log_level="actions")
+    assert resumed["winner"] == full["winner"] and resumed["turns"] == full["turns"]
+    assert resumed["resumed_from"] == 3
+    # the resumed actions are the tail of the full run
+    assert resumed["actions"] == full["actions"][-len(resumed["actions"]):]
+
+    # replaying the journal to a turn yields the same snapshot
+    assert replay.replay(rec["journal"], until_turn=3)["snapshot"] == {**snap, "policy": {}}
+
+
+def test_search_policy_snapshot_keeps_policy():
+    rec = replay.record_battle("ironknight", "ironknight", seed=3, snapshot_turns=[2],
+                               policy_a="expectiminimax", budget_ms=0)
+    full = simulate_battle("ironknight", "ironknight", seed=3, policy_a="expectiminimax", budget_ms=0,
+                           log_level="none")
+    resumed = replay.resume(rec["snapshots"][0], log_level="none")
+    assert resumed["winner"] == full["winner"] and resumed["turns"] == full["turns"]
+    assert replay.replay(rec["journal"], log_level="none")["verified"]
+
+
+def test_fork_edits_state_without_touching_the_original():
+    snap = replay.record_battle("embermage", "ironknight", seed=5, snapshot_turns=[1])["snapshots"][0]
+    forked = replay.fork(snap, seed=99, b={"hp": 1, "status": "Burn"})
+    assert snap["b"]["hp"] > 1 and forked["b"]["status"] == {"name": "Burn", "turns": 0}
+    result = replay.resume(forked, log_level="none")
+    # the burn tick at the start of the next turn finishes b
+    assert result["winner"] == "EmberMage" and result["turns"] == 2
+    with pytest.raises(replay.SnapshotError):
+        replay.fork(snap, a={"npc_id": 3})
+
+
+def test_version_checks_and_numpy_rng():
+    rng = np.random.default_rng(4)
+    a, b = build_combatant("embermage"), build_combatant("windblade")
+    play_turn(a, b, 1, rng)
+    snap = json.loads(json.dumps(replay.capture(a, b, 1, rng)))
+    a2, b2, turn, rng2 = replay.restore(snap)
+    assert (a2, b2, turn) == (a, b, 1) and rng2.random() == rng.random()
+
+    stale = {**snap, "data_version": "0" * 12}
+    with pytest.raises(replay.SnapshotError, match="data version"):
+        replay.resume(stale)
+    assert replay.resume(stale, strict=False)["resumed_from"] == 1
+    with pytest.raises(replay.SnapshotError, match="malformed"):
+        replay.restore({k: v for k, v in snap.items() if k != "rng"})
@@ -0,0 +1,43 @@
+import json
+import struct
+
+import pytest
+
+from server import serialization
+from server.battle_engine import simulate_battle
+from server.serialization import JSON, MSGPACK, dumps, encode, wants_msgpack
+
+
+def test_dumps_is_compact_json():
+    result = simulate_battle("embermage", "ironknight", seed=1, log_level="actions")
+    body = dumps(result)
+    assert json.loads(body) == result
+    assert b", " not in body and b"\n" not in body
+
+
+def test_fallback_msgpack_encoding(monkeypatch):
+    monkeypatch.setattr(serialization, "msgpack", None)
+    assert serialization.packb({"a": [1, -1, None, True]}) == b"\x81\xa1a\x94\x01\xff\xc0\xc3"
+    assert serialization.packb(300) == b"\xcd\x01\x2c"
+    assert serialization.packb(-200) == b"\xd1\xff\x38"
+    assert serialization.packb(2 ** 40) == b"\xcf" + struct.pack(">Q", 2 ** 40)
+    assert serialization.packb(1.5) == b"\xcb" + struct.pack(">d", 1.5)
+    assert serialization.packb("x" * 40) == b"\xd9\x28" + b"x" * 40
+    assert serialization.packb(list(range(20)))[:3] == b"\xdc\x00\x14"
+    with pytest.raises(TypeError):
+        serialization.packb(object())
+
+
+def test_msgpack_matches_reference_library():
+    msgpack = pytest.importorskip("msgpack")
+    result = simulate_battle("embermage", "ironknight", seed=1)
+    assert msgpack.unpackb(serialization.packb(result)) == result
+
+
+def test_accept_negotiation():
+    assert wants_msgpack("application/msgpack")
+    assert wants_msgpack("text/html, application/x-msgpack;q=0.9")
+    assert not wants_msgpack("application/msgpack;q=0")
+    assert not wants_msgpack(None)
+    assert encode({"a": 1}, "application/json")[1] == JSON
+    assert encode({"a": 1}, "application/msgpack") == (b"\x81\xa1a\x01", MSGPACK)
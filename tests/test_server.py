@@ -0,0 +1,397 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from server import http_app, mcp_server
+from server.analytics import AnalyticsStore
+from server.cache import LRUCache, TieredCache
+from server.sim_pool import PoolSaturated, SimulationPool
+
+
+@pytest.fixture(autouse=True)
+def analytics(monkeypatch):
+    # keep recorded battles out of the working directory's analytics database
+    store = AnalyticsStore(":memory:")
+    monkeypatch.setattr(mcp_server, "analytics", store)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    pool = SimulationPool(kind="thread", workers=2, max_queue=2)
+    monkeypatch.setattr(mcp_server, "sim_pool", pool)
+    monkeypatch.setattr(mcp_server, "result_cache", TieredCache(LRUCache()))
+    yield TestClient(mcp_server.app)
+    pool.shutdown()
+
+
+def test_simulate_endpoint_runs_in_pool(client):
+    r = client.post("/battle/simulate", json={"npc_a": "embermage", "npc_b": "windblade", "seed": 1})
+    assert r.status_code == 200
+    assert r.json()["winner"] == "WindBlade"
+
+
+def test_simulate_endpoint_returns_503_when_saturated(client, monkeypatch):
+    monkeypatch.setattr(SimulationPool, "saturated", property(lambda self: True))
+    r = client.post("/battle/simulate", json={"npc_a": "embermage", "npc_b": "windblade"})
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "1"
+
+
+def test_pool_bounds_in_flight_work():
+    pool = SimulationPool(kind="thread", workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        blocked = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(PoolSaturated):
+            await pool.run(lambda: None)
+        release.set()
+        await asyncio.gather(*blocked)
+        assert pool.pending == 0
+
+    asyncio.run(scenario())
+    pool.shutdown()
+
+
+def test_cancelled_call_keeps_its_slot_until_the_work_ends():
+    pool = SimulationPool(kind="thread", workers=1, max_queue=0)
+    release = threading.Event()
+
+    async def scenario():
+        call = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        call.cancel()
+        await asyncio.sleep(0.05)
+        # the caller gave up but the worker is still busy, so the pool is still full
+        assert pool.pending == 1
+        with pytest.raises(PoolSaturated):
+            await pool.run(lambda: None)
+        release.set()
+        for _ in range(50):
+            if pool.pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert pool.pending == 0
+
+    asyncio.run(scenario())
+    pool.shutdown()
+
+
+def test_simulate_endpoint_log_level(client):
+    r = client.post("/battle/simulate", json={"npc_a": "embermage", "npc_b": "windblade", "seed": 1,
+                                              "log_level": "none"})
+    assert r.status_code == 200
+    assert r.json()["log"] == [] and r.json()["actions"] == []
+
+
+def test_matrix_endpoint(client):
+    r = client.post("/battle/matrix", json={"npcs": ["embermage", "windblade"], "samples": 4})
+    assert r.status_code == 200
+    assert r.json()["win_rates"]["50"][1][0] == 1.0
+    assert client.post("/battle/matrix", json={"npcs": ["nobody"]}).status_code == 404
+
+
+def test_battle_stream_sse(client):
+    with client.stream("GET", "/battle/stream", params={"npc_a": "embermage", "npc_b": "ironknight",
+                                                        "seed": 1}) as r:
+        assert r.headers["content-type"].startswith("text/event-stream")
+        kinds = [line.split(": ", 1)[1] for line in r.iter_lines() if line.startswith("event:")]
+    assert kinds[0] == "start" and kinds[-1] == "end"
+    assert kinds.count("turn") >= 1
+
+
+def test_mcp_simulate_streams_progress(monkeypatch):
+    import json
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    monkeypatch.setattr(mcp_server, "sim_pool", SimulationPool(kind="thread", workers=1, max_queue=0))
+    updates = []
+
+    async def on_progress(progress, total, message):
+        updates.append(json.loads(message))
+
+    async def scenario():
+        async with create_connected_server_and_client_session(mcp_server.mcp_server) as session:
+            return await session.call_tool("simulate_battle_tool", {"npc_a": "embermage", "npc_b": "ironknight",
+                                                                    "seed": 2}, progress_callback=on_progress)
+
+    result = json.loads(asyncio.run(scenario()).content[0].text)
+    assert updates[0]["type"] == "start"
+    assert [u["turn"] for u in updates[1:]] == list(range(1, result["turns"] + 1))
+    assert mcp_server.sim_pool.pending == 0
+
+    async def quiet():
+        async with create_connected_server_and_client_session(mcp_server.mcp_server) as session:
+            return await session.call_tool("simulate_battle_tool", {"npc_a": "embermage", "npc_b": "ironknight",
+                                                                    "seed": 2, "log_level": "actions"},
+                                           progress_callback=on_progress)
+
+    updates.clear()
+    quiet_result = json.loads(asyncio.run(quiet()).content[0].text)
+    assert "log" not in quiet_result and quiet_result["actions"]
+    assert all("log" not in u for u in updates)
+
+
+def test_stream_holds_a_pool_slot(client, monkeypatch):
+    pool = mcp_server.sim_pool
+    seen = []
+    stream_battle = http_app.stream_battle
+
+    def watched(*args, **kwargs):
+        for event in stream_battle(*args, **kwargs):
+            seen.append((threading.current_thread().name, pool.pending))
+            yield event
+
+    monkeypatch.setattr(http_app, "stream_battle", watched)
+    r = client.get("/battle/stream", params={"npc_a": "embermage", "npc_b": "ironknight", "seed": 1,
+                                             "log_level": "none"})
+    assert r.status_code == 200 and '"log"' not in r.text and '"actions"' not in r.text
+    # every turn after the first event is stepped on the pool's own threads, inside the stream's slot
+    assert len(seen) > 2 and all(name.startswith("sim") and pending == 1 for name, pending in seen[1:])
+    assert pool.pending == 0
+    pool.pending = pool.capacity
+    try:
+        r = client.get("/battle/stream", params={"npc_a": "embermage", "npc_b": "ironknight"})
+        assert r.status_code == 503
+    finally:
+        pool.pending = 0
+
+
+def test_metrics_endpoint(client):
+    client.post("/battle/simulate", json={"npc_a": "embermage", "npc_b": "windblade", "seed": 1})
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    text = r.text
+    assert 'route="/battle/simulate",status="200"' in text
+    assert 'arena_sim_battles_total{kind="single"}' in text
+    assert "arena_sim_pool_pending 0" in text
+
+
+def test_profiler_toggle(client):
+    assert client.post("/debug/profiler/start", params={"interval_ms": 1}).json()["running"]
+    client.post("/battle/simulate", json={"npc_a": "embermage", "npc_b": "windblade", "seed": 1})
+    report = client.post("/debug/profiler/stop").json()
+    assert not report["running"] and report["samples"] > 0
+
+
+def test_team_endpoint(client):
+    r = client.post("/battle/team", json={"team_a": ["embermage", "windblade"], "team_b": ["ironknight"],
+                                          "seed": 1, "log_level": "none"})
+    assert r.status_code == 200
+    assert r.json()["winner"] == "team_b" and r.json()["survivors"]["team_b"] == ["IronKnight"]
+    assert client.post("/battle/team", json={"team_a": ["nobody"], "team_b": ["ironknight"]}).status_code == 404
+    assert client.post("/battle/team", json={"team_a": [], "team_b": ["ironknight"]}).status_code == 422
+
+
+def test_data_reload_endpoint(client, monkeypatch):
+    from server.datastore import STORE
+    from server.gamedata import DataValidationError
+
+    version = client.get("/admin/data").json()["version"]
+    r = client.post("/admin/data/reload")
+    assert r.status_code == 200 and r.json()["version"] == r.json()["previous_version"] == version
+    sim = client.post("/battle/simulate", json={"npc_a": "embermage", "npc_b": "windblade", "seed": 1})
+    assert sim.json()["data_version"] == version
+
+    def reject():
+        raise DataValidationError(["move Firebolt: power must be a non-negative number"])
+
+    monkeypatch.setattr(STORE, "reload", reject)
+    r = client.post("/admin/data/reload")
+    assert r.status_code == 422 and r.json()["detail"]["problems"]
+
+
+def test_simulate_endpoint_policy(client):
+    payload = {"npc_a": "ironknight", "npc_b": "ironknight", "seed": 2, "policy_a": "expectiminimax",
+               "budget_ms": 0, "log_level": "none"}
+    assert client.post("/battle/simulate", json=payload).status_code == 200
+    assert client.post("/battle/simulate", json={**payload, "policy_a": "nope"}).status_code == 422
+
+
+def test_record_resume_replay_endpoints(client):
+    r = client.post("/battle/record", json={"npc_a": "ironknight", "npc_b": "windblade", "seed": 11,
+                                            "snapshot_turns": [2], "log_level": "none"})
+    assert r.status_code == 200
+    body = r.json()
+    resumed = client.post("/battle/resume", json={"snapshot": body["snapshots"][0], "log_level": "none"}).json()
+    assert (resumed["winner"], resumed["turns"]) == (body["result"]["winner"], body["result"]["turns"])
+    forked = client.post("/battle/resume", json={"snapshot": body["snapshots"][0], "b": {"hp": 1, "status": "Burn"},
+                                                 "log_level": "none"})
+    assert forked.json()["winner"] == "IronKnight"
+    assert client.post("/battle/resume", json={"snapshot": body["snapshots"][0], "a": {"key": "x"}}).status_code == 422
+    assert client.post("/battle/replay", json={"journal": body["journal"], "log_level": "none"}).json()["verified"]
+    stale = {**body["journal"], "data_version": "stale"}
+    assert client.post("/battle/replay", json={"journal": stale}).status_code == 422
+    # a missing field is a malformed document (422); a journal naming an absent NPC is an unknown NPC (404)
+    no_max = {k: v for k, v in body["snapshots"][0].items() if k != "max_turns"}
+    r = client.post("/battle/resume", json={"snapshot": no_max})
+    assert r.status_code == 422 and "malformed snapshot" in r.json()["detail"]
+    r = client.post("/battle/resume", json={"snapshot": {**body["snapshots"][0], "policy": ["greedy"]}})
+    assert r.status_code == 422
+    r = client.post("/battle/replay", json={"journal": {**body["journal"], "npc_b": "nobody"}})
+    assert r.status_code == 404 and "nobody" in r.json()["detail"]
+    no_seed = {k: v for k, v in body["journal"].items() if k != "seed"}
+    assert client.post("/battle/replay", json={"journal": no_seed}).status_code == 422
+
+
+def test_job_endpoints(monkeypatch, tmp_path):
+    from server.jobs import JobManager
+
+    monkeypatch.setattr(mcp_server, "sim_pool", SimulationPool(kind="thread", workers=2, max_queue=4))
+    monkeypatch.setattr(http_app, "job_manager", JobManager(str(tmp_path / "jobs.db"), http_app.run_job_chunk))
+    with TestClient(mcp_server.app) as client:
+        r = client.post("/battle/jobs", json={"sweep": {"npcs": ["embermage", "ironknight"], "samples": 50},
+                                              "chunk_size": 40})
+        assert r.status_code == 202
+        job_id = r.json()["id"]
+        with client.stream("GET", f"/battle/jobs/{job_id}/events") as stream:
+            body = "".join(stream.iter_text())
+        assert "event: end" in body
+        status = client.get(f"/battle/jobs/{job_id}").json()
+        assert status["status"] == "done" and status["done"] == 200 and len(status["cells"]) == 4
+        assert client.get("/battle/jobs").json()["jobs"][0]["id"] == job_id
+        assert client.delete(f"/battle/jobs/{job_id}").status_code == 409
+        assert client.get("/battle/jobs/nope").status_code == 404
+        bad = client.post("/battle/jobs", json={"matchups": [{"npc_a": "nobody", "npc_b": "ironknight"}]})
+        assert bad.status_code == 404
+        assert client.post("/battle/jobs", json={}).status_code == 422
+
+
+def test_analytics_endpoints(client, groq_stub, monkeypatch):
+    from server import groq_client
+
+    base_url, received = groq_stub
+    monkeypatch.setattr(groq_client, "_async_client",
+                        groq_client.AsyncGroqClient(api_key="test", base_url=base_url, cache=TieredCache(LRUCache())))
+    client.post("/battle/simulate", json={"npc_a": "embermage", "npc_b": "windblade", "seed": 1})
+    r = client.post("/analytics/ingest", json={"npcs": ["embermage", "ironknight"], "samples": 20})
+    assert r.status_code == 200 and r.json()["battles"] == 80
+    rows = client.get("/analytics/win_rate", params={"npc_a": "embermage", "npc_b": "windblade"}).json()["rows"]
+    assert rows[0]["battles"] == 1 and rows[0]["wins_a"] == 0
+    moves = client.get("/analytics/move_damage", params={"npc": "embermage", "opponent": "ironknight"}).json()
+    assert moves["rows"][0]["move"] == "Firebolt" and moves["elapsed_ms"] < 100
+    assert client.get("/analytics/win_rate", params={"move": "Firebolt"}).status_code == 422
+    assert client.post("/analytics/ingest", json={"npcs": ["nobody"]}).status_code == 404
+    r = client.post("/ai/query", params={"question": "How often does embermage beat ironknight?"})
+    assert r.json()["query"] == "win_rate" and r.json()["filters"] == {"npc_a": "embermage", "npc_b": "ironknight"}
+    assert r.json()["answer"].startswith("narration: ")
+    assert "Rows: [{" in received[-1]["messages"][-1]["content"]
+    # a move with no query keyword falls back to the summary, which cannot filter on moves
+    r = client.post("/ai/query", params={"question": "tell me about firebolt"})
+    assert r.status_code == 200 and r.json()["query"] == "summary" and r.json()["filters"] == {}
+
+
+def test_simulate_endpoint_caches_seeded_battles(client, monkeypatch):
+    calls = []
+    simulate = http_app.simulate_battle
+    monkeypatch.setattr(http_app, "simulate_battle", lambda *a, **k: calls.append(a) or simulate(*a, **k))
+    body = {"npc_a": "embermage", "npc_b": "ironknight", "seed": 3}
+    first = client.post("/battle/simulate", json=body)
+    tag = first.headers["etag"]
+    second = client.post("/battle/simulate", json=body)
+    assert second.content == first.content and second.headers["etag"] == tag and len(calls) == 1
+    assert client.post("/battle/simulate", json=body, headers={"If-None-Match": f'W/{tag}'}).status_code == 304
+    assert client.post("/battle/simulate", json={**body, "seed": 4}).headers["etag"] != tag
+    # unseeded battles and time-budgeted searches are not reproducible
+    assert "etag" not in client.post("/battle/simulate", json={**body, "seed": None}).headers
+    assert "etag" not in client.post("/battle/simulate", json={**body, "policy_a": "expectiminimax"}).headers
+    assert "etag" in client.post("/battle/simulate", json={**body, "policy_a": "expectiminimax",
+                                                           "budget_ms": 0}).headers
+    assert len(calls) == 5
+
+
+def test_simulate_endpoint_msgpack(client):
+    body = {"npc_a": "embermage", "npc_b": "ironknight", "seed": 3}
+    as_json = client.post("/battle/simulate", json=body)
+    packed = client.post("/battle/simulate", json=body, headers={"Accept": "application/msgpack"})
+    assert packed.headers["content-type"] == "application/msgpack"
+    assert packed.headers["etag"] != as_json.headers["etag"] and packed.headers["vary"] == "Accept"
+    assert packed.content[:1] == b"\x85"  # fixmap: winner, turns, data_version, log, actions
+    assert as_json.json()["actions"][0]["actor"] == "EmberMage"
+    r = client.post("/battle/matrix", json={"npcs": ["embermage"], "samples": 2},
+                    headers={"Accept": "application/msgpack"})
+    assert r.headers["content-type"] == "application/msgpack"
+
+
+def test_narrate_batch_endpoint(client, groq_stub, monkeypatch):
+    from server import groq_client
+
+    base_url, received = groq_stub
+    monkeypatch.setattr(groq_client, "_async_client",
+                        groq_client.AsyncGroqClient(api_key="test", base_url=base_url, cache=TieredCache(LRUCache())))
+    battles = [client.post("/battle/simulate", json={"npc_a": "embermage", "npc_b": "ironknight", "seed": s}).json()
+               for s in range(2)]
+    r = client.post("/ai/narrate/batch", json={"battles": battles, "budget_tokens": 60})
+    # the stub ignores the [[n]] markers, so each battle is retried on its own
+    assert r.status_code == 200 and r.json()["requests"] == 3 and len(r.json()["narrations"]) == 2
+    assert "[[2]]" in received[0]["messages"][-1]["content"]
+
+
+def test_sweep_and_shard_endpoints(client):
+    matchups = [{"npc_a": "embermage", "npc_b": "windblade", "samples": 12},
+                {"npc_a": "ironknight", "npc_b": "embermage", "samples": 5, "seed": 3}]
+    r = client.post("/battle/sweep", json={"matchups": matchups, "shards": 3})
+    assert r.status_code == 200
+    sweep = r.json()
+    assert sweep["shards"] == 3 and [c["battles"] for c in sweep["cells"]] == [12, 5]
+
+    # what a coordinator on another host sends: each shard's seed ranges, merged back by offset
+    rows = []
+    for slices in ([[0, 0, 7], [1, 0, 2]], [[0, 7, 5], [1, 2, 3]]):
+        r = client.post("/battle/shard", json={"cells": matchups, "slices": slices})
+        assert r.status_code == 200
+        rows += r.json()["rows"]
+    from server.coordinator import merge
+    from server.jobs import expand_spec
+    assert merge(expand_spec({"matchups": matchups}), [rows])["cells"] == sweep["cells"]
+
+    assert client.post("/battle/shard", json={"cells": matchups, "slices": [[1, 4, 2]]}).status_code == 422
+    assert client.post("/battle/sweep", json={"matchups": matchups, "local": False}).status_code == 422
+
+
+def test_sweep_endpoint_only_contacts_configured_peers(client, monkeypatch):
+    matchups = [{"npc_a": "embermage", "npc_b": "windblade", "samples": 4}]
+    monkeypatch.setenv("ARENA_PEERS", "http://10.0.0.2:8000")
+    r = client.post("/battle/sweep", json={"matchups": matchups, "hosts": ["http://169.254.169.254/latest?x="]})
+    assert r.status_code == 422 and "configured peer" in r.json()["detail"]
+    monkeypatch.setattr(http_app, "MAX_SWEEP_BATTLES", 3)
+    r = client.post("/battle/sweep", json={"matchups": matchups})
+    assert r.status_code == 422 and "/battle/jobs" in r.json()["detail"]
+
+
+def test_stdio_main_releases_the_import_time_state(monkeypatch, tmp_path, analytics):
+    import os
+    import sys
+
+    from server.analytics import simulate_records
+    from server.backend import SQLiteBackend
+    from server.datastore import STORE
+
+    backend = SQLiteBackend(str(tmp_path / "import-time.sqlite3"))
+    backend.set("k", "v")
+    pool = SimulationPool(kind="thread", workers=1)
+    analytics.flush_every = 1
+    analytics.add(simulate_records("embermage", "ironknight", 50, [1]))
+    writer = analytics._writer
+    monkeypatch.setattr(mcp_server, "sim_pool", pool)
+    monkeypatch.setattr(mcp_server, "result_backend", backend)
+    monkeypatch.setattr(mcp_server, "result_cache", mcp_server.result_cache)
+    monkeypatch.setattr(STORE, "compiled_path", STORE.compiled_path)
+    monkeypatch.setattr(os, "environ", {**os.environ, "ARENA_ANALYTICS_DB": str(tmp_path / "a.sqlite3"),
+                                        "ARENA_RESULT_BACKEND": f"sqlite:{tmp_path / 'results.sqlite3'}"})
+    monkeypatch.setattr(sys, "argv", ["server.mcp_server", "stdio", "--pool", "thread"])
+    monkeypatch.setattr(mcp_server.asyncio, "run", lambda coro: coro.close())
+    asyncio.run(pool.run(sum, [1, 2]))
+
+    mcp_server.main()
+    assert backend._conn is None and pool._executor is None and analytics._conn is None
+    assert not writer.is_alive()
+    # the replacements are released when the stdio session ends
+    assert mcp_server.result_backend is not backend and mcp_server.result_backend._conn is None
+    assert mcp_server.analytics is not analytics
@@ -0,0 +1,31 @@
+from server.battle_engine import NPCS
+from server.team_battle import TurnScheduler, simulate_team_battle
+
+
+def test_everyone_acts_each_turn_fastest_first():
+    r = simulate_team_battle(["embermage", "windblade"], ["ironknight", "mistcaller"], seed=3, log_level="actions")
+    speed = {c["name"]: c["speed"] for c in NPCS.values()}
+    first_turn = [a["actor"] for a in r["actions"] if a["turn"] == 1]
+    assert len(first_turn) == 4 or any(a["target_hp"] == 0 for a in r["actions"] if a["turn"] == 1)
+    assert first_turn == sorted(first_turn, key=lambda name: -speed[name])
+
+
+def test_scheduler_orders_by_priority_then_speed_and_reschedules():
+    s = TurnScheduler()
+    s.start_turn([(0, 0, 50.0), (1, 1, 10.0), (2, 0, 80.0), (3, 0, 50.0)])
+    assert s.pop() == 1          # priority beats speed
+    s.reschedule(2, 0, 40.0)     # stunned: speed halved, now behind slots 0 and 3
+    s.cancel(3)                  # fainted before acting
+    assert [s.pop(), s.pop(), s.pop()] == [0, 2, None]
+
+
+def test_duplicate_npcs_are_numbered_and_raid_is_deterministic():
+    team_a = ["embermage", "windblade"] * 25
+    team_b = ["ironknight", "mistcaller"] * 25
+    r1 = simulate_team_battle(team_a, team_b, seed=7, log_level="actions")
+    r2 = simulate_team_battle(team_a, team_b, seed=7, log_level="actions")
+    assert r1 == r2
+    actors = {a["actor"] for a in r1["actions"]}
+    assert "EmberMage #1" in actors and "EmberMage #25" in actors
+    loser = "team_b" if r1["winner"] == "team_a" else "team_a"
+    assert r1["survivors"][loser] == [] or r1["turns"] == 200
@@ -0,0 +1,35 @@
+import pytest
+
+from server.battle_engine import simulate_battle
+from server.trace import ACTION_DTYPE, TraceBuilder, read_trace
+
+
+@pytest.mark.parametrize("fmt", ["npy", "parquet"])
+def test_trace_roundtrip(tmp_path, fmt):
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    builder = TraceBuilder()
+    for seed in range(5):
+        builder.add_battle("embermage", "ironknight", seed=seed)
+        builder.add_battle("embermage", "embermage", seed=seed)
+    builder.build().save(str(tmp_path), fmt)
+
+    trace = read_trace(str(tmp_path))
+    assert len(trace) == 10
+    assert ACTION_DTYPE.itemsize == 25
+    for match, (npc_b, seed) in enumerate((b, s) for s in range(5) for b in ("ironknight", "embermage")):
+        expected = simulate_battle("embermage", npc_b, seed=seed, log_level="actions")
+        got = [a.model_dump(exclude_none=True) for a in trace.match_actions(match)]
+        assert got == [{k: v for k, v in a.items() if v is not None} for a in expected["actions"]]
+        assert trace.winner(match) == expected["winner"]
+
+
+def test_trace_keeps_the_sides_of_a_mirror_match_apart():
+    builder = TraceBuilder()
+    builder.add_battle("embermage", "embermage", seed=3)
+    trace = builder.build()
+    actions = list(trace.match_actions(0))
+    assert {a.actor for a in actions} == {"EmberMage"}
+    assert {a.side for a in actions} == {"a", "b"}
+    expected = simulate_battle("embermage", "embermage", seed=3, log_level="actions")
+    assert [a.side for a in actions] == [a["side"] for a in expected["actions"]]